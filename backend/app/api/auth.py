@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -20,15 +21,26 @@ async def login_for_access_token(
   form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
   db: Session = Depends(get_db)
 ):
-  user = db.query(DBUser).filter(DBUser.email == form_data.username).first()
+  user = await run_in_threadpool(
+    lambda: db.query(DBUser).filter(DBUser.email == form_data.username).first()
+  )
   
-  if not user or not AuthService.verify_password(form_data.password, user.hashed_password):
+  # Vérification bcrypt hors de la boucle d'événements
+  verified, new_hash = False, None
+  if user:
+    verified, new_hash = await AuthService.verify_and_update_password(form_data.password, user.hashed_password)
+  if not verified:
     raise HTTPException(
       status_code=status.HTTP_401_UNAUTHORIZED,
       detail="Incorrect username or password",
       headers={"WWW-Authenticate": "Bearer"},
     )
   
+  # Hash d'un autre coût que BCRYPT_ROUNDS : le remplacer
+  if new_hash:
+    user.hashed_password = new_hash
+    await run_in_threadpool(db.commit)
+  
   access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
   access_token = AuthService.create_access_token(
     data={"sub": user.username, "role": user.role}
@@ -46,7 +58,9 @@ async def register_user(
   db: Session = Depends(get_db)
 ):
   # Vérifier si l'utilisateur existe déjà
-  existing_user = db.query(DBUser).filter(DBUser.email == user_data.email).first()
+  existing_user = await run_in_threadpool(
+    lambda: db.query(DBUser).filter(DBUser.email == user_data.email).first()
+  )
   if existing_user:
     raise HTTPException(
       status_code=status.HTTP_400_BAD_REQUEST,
@@ -57,14 +71,14 @@ async def register_user(
   new_user = DBUser(
     username=user_data.username,
     email=user_data.email,
-    hashed_password=AuthService.get_password_hash(user_data.password),
+    hashed_password=await AuthService.get_password_hash_async(user_data.password),
     is_active=True,
     role=user_data.role or 'user'
   )
   
   db.add(new_user)
-  db.commit()
-  db.refresh(new_user)
+  await run_in_threadpool(db.commit)
+  await run_in_threadpool(db.refresh, new_user)
   
   return new_user
 
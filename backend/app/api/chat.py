@@ -1,8 +1,11 @@
 from datetime import datetime, timezone
-from typing import Annotated, List
+from typing import Annotated, List, Tuple
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+import json
 import logging
 import time
 
@@ -13,8 +16,8 @@ from app.models.document import Document
 from app.models.chat import ChatMessage as ChatMessageModel
 from app.schemas.conversation import Conversation
 from app.models.conversation import Conversation as ConversationModel
-from app.db.base import get_db
-from app.services.RagService import rag_service
+from app.db.base import SessionLocal, get_db
+from app.services.RagService import get_rag_service
 from app.services.LLMService import get_llm_service
 
 logger = logging.getLogger(__name__)
@@ -24,6 +27,94 @@ router = APIRouter(prefix="/chat", tags=["Chat"])
 DatabaseSession = Annotated[Session, Depends(get_db)]
 CurrentUser = Annotated[User, Depends(get_current_active_user)]
 
+SYSTEM_MESSAGE = """Tu es un assistant IA expert qui aide à répondre aux questions.
+Base tes réponses uniquement sur le contexte fourni.
+Si tu ne trouves pas l'information dans le contexte, dis-le clairement."""
+
+def _prepare_chat(
+    db: Session,
+    request: ChatRequest,
+    current_user: User
+) -> Tuple[UUID, List[str]]:
+    """Load or create the conversation, save the user message and resolve the vector IDs"""
+    # 1. Gérer la conversation
+    conversation = None
+    if request.conversation_id:
+        conversation = db.query(ConversationModel).filter(
+            ConversationModel.id == request.conversation_id,
+            ConversationModel.user_id == current_user.id
+        ).first()
+        if not conversation:
+            raise HTTPException(status_code=404, detail="Conversation not found")
+    else:
+        conversation = ConversationModel(
+            user_id=current_user.id,
+            title=request.message[:50]
+        )
+        db.add(conversation)
+        db.commit()
+        db.refresh(conversation)
+    conversation_id = conversation.id
+
+    # 2. Sauvegarder le message utilisateur
+    user_message = ChatMessageModel(
+        content=request.message,
+        role="user",
+        user_id=current_user.id,
+        conversation_id=conversation_id,
+        response_time=0,  # temps de réponse = 0 pour les messages utilisateur
+        created_at=datetime.now(timezone.utc)
+    )
+    db.add(user_message)
+    db.commit()
+
+    # 3. Récupérer les IDs vectoriels des documents sélectionnés
+    document_ids = []
+    if request.document_ids:
+        # Seuls les documents de l'utilisateur peuvent être interrogés
+        documents = db.query(Document).filter(
+            Document.id.in_(request.document_ids),
+            Document.user_id == current_user.id
+        ).all()
+        document_ids = [doc.vector_id for doc in documents]
+
+    return conversation_id, document_ids
+
+def _build_references(relevant_context: List[dict]) -> List[dict]:
+    """Build the references returned to the client from the retrieved chunks"""
+    return [{
+        "document_title": chunk.get("metadata", {}).get("doc_title", "Unknown"),
+        "page_content": chunk.get("text", ""),
+        "page_number": chunk.get("metadata", {}).get("page_number")
+    } for chunk in relevant_context] if relevant_context else []
+
+def _format_sse(event: str, data: dict) -> str:
+    """Format a Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _save_assistant_message(
+    db: Session,
+    content: str,
+    user_id: int,
+    conversation_id: UUID,
+    response_time: float,
+    references: List[dict]
+) -> ChatMessageModel:
+    """Persist the assistant answer of a conversation"""
+    assistant_message = ChatMessageModel(
+        content=content,
+        role="assistant",
+        user_id=user_id,
+        conversation_id=conversation_id,
+        response_time=response_time,
+        references=references,
+        created_at=datetime.now(timezone.utc)
+    )
+    db.add(assistant_message)
+    db.commit()
+    db.refresh(assistant_message)
+    return assistant_message
+
 @router.post("/message", response_model=ChatResponse)
 async def chat_with_documents(
     request: ChatRequest,
@@ -33,6 +124,8 @@ async def chat_with_documents(
     try:
         start_time = time.time()
         llm_service = get_llm_service()
+        rag_service = await run_in_threadpool(get_rag_service)
+        user_id = current_user.id
         
         # Validation de conversation_id
         conversation_id = request.conversation_id
@@ -42,49 +135,18 @@ async def chat_with_documents(
             except ValueError:
                 raise HTTPException(status_code=400, detail="Invalid conversation ID")
                 
-        # 1. Gérer la conversation
-        conversation = None
-        if request.conversation_id:
-            conversation = db.query(ConversationModel).filter(
-                ConversationModel.id == request.conversation_id,
-                ConversationModel.user_id == current_user.id
-            ).first()
-            if not conversation:
-                raise HTTPException(status_code=404, detail="Conversation not found")
-        else:
-            conversation = ConversationModel(
-                user_id=current_user.id,
-                title=request.message[:50]
-            )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-
-        # 2. Sauvegarder le message utilisateur
-        user_message = ChatMessageModel(
-            content=request.message,
-            role="user",
-            user_id=current_user.id,
-            conversation_id=conversation.id,
-            response_time=0,  # temps de réponse = 0 pour les messages utilisateur
-            created_at=datetime.now(timezone.utc)
+        # 1-2. Conversation et message utilisateur (SQLAlchemy synchrone, hors de la boucle)
+        conversation_id, document_ids = await run_in_threadpool(
+            _prepare_chat, db, request, current_user
         )
-        db.add(user_message)
-        db.commit()
 
         # 3. Obtenir le contexte pertinent via RAG
-        document_ids = []
-        if request.document_ids:
-            documents = db.query(Document).filter(
-                Document.id.in_(request.document_ids)
-            ).all()
-            document_ids = [doc.vector_id for doc in documents]
-
-        relevant_context = rag_service.get_relevant_context(
+        relevant_context = await rag_service.get_relevant_context_async(
             query=request.message,
             document_ids=document_ids,
             num_chunks=request.model_settings.get('num_chunks', 3),
-            similarity_threshold=request.model_settings.get('similarity_threshold', 0.7)
+            similarity_threshold=request.model_settings.get('similarity_threshold'),
+            user_id=user_id
         )
         print(f"Relevant context: {relevant_context}")
 
@@ -92,52 +154,138 @@ async def chat_with_documents(
         formatted_context = rag_service._format_context(relevant_context)
 
         # 5. Générer la réponse avec le LLM
-        system_message = """Tu es un assistant IA expert qui aide à répondre aux questions.
-        Base tes réponses uniquement sur le contexte fourni.
-        Si tu ne trouves pas l'information dans le contexte, dis-le clairement."""
-
-        llm_response = llm_service.generate_response(
+        llm_response = await llm_service.generate_response_async(
             prompt=request.message,
             context=formatted_context,
-            system_message=system_message
+            system_message=SYSTEM_MESSAGE
         )
 
         # 6. Sauvegarder la réponse
         response_time = time.time() - start_time
-        references = [{
-            "document_title": chunk.get("metadata", {}).get("doc_title", "Unknown"),
-            "page_content": chunk.get("text", ""),
-            "page_number": chunk.get("metadata", {}).get("doc_page_number")
-        } for chunk in relevant_context] if relevant_context else []
-
-        assistant_message = ChatMessageModel(
-            content=llm_response,
-            role="assistant",
-            user_id=current_user.id,
-            conversation_id=conversation.id,
-            response_time=response_time,
-            references=references,
-            created_at=datetime.now(timezone.utc)
+        references = _build_references(relevant_context)
+
+        await run_in_threadpool(
+            _save_assistant_message,
+            db,
+            llm_response,
+            user_id,
+            conversation_id,
+            response_time,
+            references
         )
-        db.add(assistant_message)
-        db.commit()
 
         # 7. Retourner la réponse
         return ChatResponse(
             message=llm_response,
-            conversation_id=str(conversation.id),
-            references=assistant_message.references,
+            conversation_id=str(conversation_id),
+            references=references,
             created_at=datetime.now(timezone.utc)
         )
 
     except Exception as e:
         logger.error(f"Error in chat endpoint: {str(e)}")
-        db.rollback()
+        await run_in_threadpool(db.rollback)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=str(e)
+        )
+
+@router.post("/message/stream")
+async def stream_chat_with_documents(
+    request: ChatRequest,
+    current_user: CurrentUser,
+    db: DatabaseSession
+):
+    """
+    Streaming variant of /message: answers as Server-Sent Events.
+
+    Events: `references` (conversation_id and retrieved references, sent first),
+    `token` (one per LLM delta), then `done` once the assistant message is saved,
+    or `error` if generation fails.
+    """
+    start_time = time.time()
+    llm_service = get_llm_service()
+    rag_service = await run_in_threadpool(get_rag_service)
+    user_id = current_user.id
+
+    if request.conversation_id:
+        try:
+            UUID(request.conversation_id)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid conversation ID")
+
+    try:
+        conversation_id, document_ids = await run_in_threadpool(
+            _prepare_chat, db, request, current_user
+        )
+        relevant_context = await rag_service.get_relevant_context_async(
+            query=request.message,
+            document_ids=document_ids,
+            num_chunks=request.model_settings.get('num_chunks', 3),
+            similarity_threshold=request.model_settings.get('similarity_threshold'),
+            user_id=user_id
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error in chat stream endpoint: {str(e)}")
+        await run_in_threadpool(db.rollback)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=str(e)
         )
 
+    references = _build_references(relevant_context)
+    formatted_context = rag_service._format_context(relevant_context)
+
+    async def event_stream():
+        yield _format_sse("references", {
+            "conversation_id": str(conversation_id),
+            "references": references
+        })
+
+        tokens = []
+        try:
+            async for token in llm_service.stream_response_async(
+                prompt=request.message,
+                context=formatted_context,
+                system_message=SYSTEM_MESSAGE
+            ):
+                tokens.append(token)
+                yield _format_sse("token", {"content": token})
+
+            # La session de la requête est fermée une fois la réponse commencée :
+            # on persiste le message assistant avec une session dédiée
+            response_time = time.time() - start_time
+            with SessionLocal() as stream_db:
+                assistant_message = await run_in_threadpool(
+                    _save_assistant_message,
+                    stream_db,
+                    "".join(tokens),
+                    user_id,
+                    conversation_id,
+                    response_time,
+                    references
+                )
+                message_id = assistant_message.id
+
+            yield _format_sse("done", {
+                "message_id": message_id,
+                "conversation_id": str(conversation_id),
+                "response_time": response_time,
+                "created_at": datetime.now(timezone.utc)
+            })
+
+        except Exception as e:
+            logger.error(f"Error while streaming chat response: {str(e)}")
+            yield _format_sse("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/conversations", response_model=Conversation)
 async def create_conversation(
     current_user: CurrentUser,
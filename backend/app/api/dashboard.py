@@ -1,10 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
 from typing import Dict
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import distinct, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta
 
-from app.db.base import get_db
+from app.db.base import get_async_db
 from app.dependencies import get_current_active_user
 from app.models.document import Document
 from app.models.user import User
@@ -15,7 +15,7 @@ router = APIRouter()
 
 @router.get("/stats")
 async def get_dashboard_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ) -> Dict:
     """
@@ -30,88 +30,43 @@ async def get_dashboard_stats(
     """    
     try:
         # Get total documents
-        total_documents = db.query(Document).filter(Document.status == 'indexed').count()
+        total_documents = await db.scalar(
+            select(func.count(Document.id)).where(Document.status == 'indexed')
+        )
 
         # Get total queries (messages from users)
-        total_queries = db.query(ChatMessage).filter(ChatMessage.role == 'user').count()
+        total_queries = await db.scalar(
+            select(func.count(ChatMessage.id)).where(ChatMessage.role == 'user')
+        )
 
         # Calculate average response time for bot messages
-        avg_response = db.query(func.avg(ChatMessage.response_time))\
-            .filter(ChatMessage.role == 'assistant')\
-            .scalar() or 0        # Get active users (users with conversations in last 30 days)
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        active_users = db.query(User.id)\
-            .join(Conversation)\
-            .filter(Conversation.created_at >= thirty_days_ago)\
-            .distinct()\
-            .count()
-
-        # Get documents by type
-        docs_by_type = (
-            db.query(
-                Document.type,
-                func.count(Document.id).label('count')
-            )
-            .filter(Document.status == 'indexed')
-            .group_by(Document.type)
-            .all()
-        )
-        documents_by_type = {str(t): c for t, c in docs_by_type}
+        avg_response = await db.scalar(
+            select(func.avg(ChatMessage.response_time)).where(ChatMessage.role == 'assistant')
+        ) or 0
 
-        # Get queries by day for the last 7 days
-        seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        daily_queries = (
-            db.query(
-                func.date(ChatMessage.created_at).label('date'),
-                func.count(ChatMessage.id).label('count')
-            )
-            .filter(
-                ChatMessage.created_at >= seven_days_ago,
-                ChatMessage.role == 'user'
-            )
-            .group_by(func.date(ChatMessage.created_at))
-            .order_by('date')
-            .all()
+        # Get active users (users with conversations in last 30 days)
+        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
+        active_users = await db.scalar(
+            select(func.count(distinct(User.id)))
+            .select_from(User)
+            .join(Conversation)
+            .where(Conversation.created_at >= thirty_days_ago)
         )
 
-        # Create a dict with all days (including days with 0 queries)
-        queries_by_day = {}
-        for i in range(7):
-            day = (datetime.utcnow() - timedelta(days=i)).date()
-            queries_by_day[day.isoformat()] = 0
-
-        # Fill in the actual query counts
-        for date, count in daily_queries:
-            queries_by_day[date.isoformat()] = count
-
-        # Calculate total storage used (in MB)
-        total_storage = (
-            db.query(func.sum(Document.file_size))
-            .filter(Document.status == 'indexed')
-            .scalar() or 0
-        ) / (1024 * 1024)  # Convert to MB
-        
-        docs_by_type = (
-            db.query(
-                Document.type,
-                func.count(Document.id).label('count')
-            )
-            .filter(Document.status == 'indexed')
+        # Get documents by type
+        docs_by_type = await db.execute(
+            select(Document.type, func.count(Document.id))
+            .where(Document.status == 'indexed')
             .group_by(Document.type)
-            .all()
         )
         documents_by_type = {t: c for t, c in docs_by_type}
 
         # Get queries for the last 7 days
         seven_days_ago = datetime.utcnow() - timedelta(days=7)
-        daily_queries = (
-            db.query(
-                func.date(ChatMessage.created_at),
-                func.count(ChatMessage.id)
-            )
-            .filter(ChatMessage.created_at >= seven_days_ago)
+        daily_queries = await db.execute(
+            select(func.date(ChatMessage.created_at), func.count(ChatMessage.id))
+            .where(ChatMessage.created_at >= seven_days_ago)
             .group_by(func.date(ChatMessage.created_at))
-            .all()
         )
         queries_by_day = {
             date.strftime('%Y-%m-%d'): count 
@@ -120,8 +75,7 @@ async def get_dashboard_stats(
 
         # Calculate total storage used (in MB)
         total_storage = (
-            db.query(func.sum(Document.file_size))
-            .scalar() or 0
+            await db.scalar(select(func.sum(Document.file_size))) or 0
         ) / (1024 * 1024)  # Convert to MB
 
         return {
@@ -151,26 +105,25 @@ async def get_dashboard_stats(
 @router.get("/popular-queries")
 async def get_popular_queries(
     limit: int = 3,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """Get the most frequently asked queries"""
     try:
         # Get queries from last 30 days
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        popular_queries = (
-            db.query(
+        popular_queries = await db.execute(
+            select(
                 ChatMessage.content,
                 func.count(ChatMessage.id).label('count')
             )
-            .filter(
+            .where(
                 ChatMessage.created_at >= thirty_days_ago,
                 ChatMessage.role == 'user'
             )
             .group_by(ChatMessage.content)
             .order_by(func.count(ChatMessage.id).desc())
             .limit(limit)
-            .all()
         )
         
         return [
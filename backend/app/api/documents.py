@@ -1,22 +1,25 @@
 from datetime import datetime, timezone
-from typing import Annotated, List
+from typing import Annotated, List, Tuple
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import SQLAlchemyError
 import uuid
+import os
+import tempfile
 from pathlib import Path
 import logging
 
+from app.core.config import settings
 from app.dependencies import get_current_active_user
-from app.services.RagService import rag_service
-from app.services.EmbeddingService import get_embedding_service
+from app.services.RagService import get_rag_service
+from app.services.IngestionService import get_ingestion_service
 from app.services.SupabaseStorage import SupabaseStorageService
-from app.utils.file_parser import parse_pdf, parse_docx, parse_txt
-from app.utils.text_processing import create_semantic_chunks
+from app.utils.file_parser import FILE_PARSERS
 from app.models.document import Document
 from app.models.user import User
 from app.db.base import get_db
-from app.schemas.document import DocumentUploadResponse, DocumentResponse
+from app.schemas.document import DocumentUploadResponse, DocumentResponse, IngestionJobResponse
 
 logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/documents", tags=["Documents"])
@@ -25,29 +28,93 @@ router = APIRouter(prefix="/documents", tags=["Documents"])
 DatabaseSession = Annotated[Session, Depends(get_db)]
 CurrentUser = Annotated[User, Depends(get_current_active_user)]
 
-# Mappage des types MIME aux parseurs
-FILE_PARSERS = {
-  'application/pdf': parse_pdf,
-  'application/vnd.openxmlformats-officedocument.wordprocessingml.document': parse_docx,
-  'text/plain': parse_txt
-}
-
 # Types MIME autorisés
 ALLOWED_MIME_TYPES = list(FILE_PARSERS.keys())
 
+# Taille des blocs copiés vers le fichier temporaire
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+def _save_upload(file: UploadFile, file_ext: str, max_size: int) -> Tuple[str, int]:
+  """
+  Copie un fichier uploadé par blocs dans un fichier temporaire
+
+  Returns:
+    Chemin du fichier temporaire et taille du fichier
+  """
+  size = 0
+  with tempfile.NamedTemporaryFile(
+    suffix=file_ext,
+    dir=settings.UPLOAD_TMP_DIR,
+    delete=False
+  ) as tmp_file:
+    try:
+      while True:
+        block = file.file.read(UPLOAD_CHUNK_SIZE)
+        if not block:
+          break
+        size += len(block)
+        if size > max_size:
+          raise HTTPException(
+            status_code=413,
+            detail=f"File too large. Max size: {max_size} bytes"
+          )
+        tmp_file.write(block)
+    except Exception:
+      tmp_file.close()
+      os.remove(tmp_file.name)
+      raise
+
+  return tmp_file.name, size
+
+def _create_document(
+  db: Session,
+  user_id: int,
+  file: UploadFile,
+  file_url: str,
+  vector_id: str,
+  file_size: int,
+  file_ext: str
+) -> Document:
+  """Enregistre le document en base avec le statut "processing" """
+  db_doc = Document(
+    user_id=user_id,
+    original_filename=file.filename,
+    storage_url=file_url,
+    vector_id=vector_id,
+    file_size=file_size,
+    file_type=file.content_type,
+    file_extension=file_ext,
+    status="processing",
+    created_at=datetime.now(timezone.utc),
+    updated_at=datetime.now(timezone.utc)
+  )
+  
+  db.add(db_doc)
+  db.commit()
+  db.refresh(db_doc)
+  return db_doc
+
 @router.post(
   "/",
   response_model=List[DocumentUploadResponse],
-  status_code=status.HTTP_207_MULTI_STATUS
+  status_code=status.HTTP_202_ACCEPTED
 )
 async def upload_files(
   current_user: CurrentUser,
   db: DatabaseSession,
   files: List[UploadFile] = File(...)
 ):
-  """Upload and process documents (PDF, DOCX, TXT) for RAG pipeline"""
+  """
+  Upload documents (PDF, DOCX, TXT) and queue them for the RAG pipeline
+
+  Parsing, embedding and indexing run in the background: each accepted file
+  is returned with its job_id (see GET /documents/jobs/{job_id}) and its
+  document status moves from processing to indexed or error.
+  """
   results = []
-  max_size = 10 * 1024 * 1024  # 10MB
+  max_size = settings.MAX_UPLOAD_SIZE
+  ingestion_service = get_ingestion_service()
+  user_id = current_user.id
 
   for file in files :
     try:
@@ -59,66 +126,68 @@ async def upload_files(
         )
 
       # Validate file size
-      if file.size > max_size:
+      if file.size is not None and file.size > max_size:
         raise HTTPException(
           status_code=413,
           detail=f"File too large. Max size: {max_size} bytes"
         )
       
-      file_content = await file.read()
-      
       # Generate unique filename with original extension
       file_ext = Path(file.filename).suffix.lower()
-      if file_ext : unique_filename = f"documents/{current_user.id}/{uuid.uuid4()}{file_ext}"
+      if file_ext : unique_filename = f"documents/{user_id}/{uuid.uuid4()}{file_ext}"
+      
+      # Stream the upload to disk instead of loading it in memory
+      file_path, file_size = await run_in_threadpool(_save_upload, file, file_ext, max_size)
       
       # 1. Upload vers Supabase Storage
       file_url = "None"
       """ file_url = SupabaseStorageService.upload_file(
-        file_content=file_content,
-        file_path=f"documents/{current_user.id}/{uuid.uuid4()}{file_ext}",
+        file_content=Path(file_path).read_bytes(),
+        file_path=f"documents/{user_id}/{uuid.uuid4()}{file_ext}",
         content_type=file.content_type
       ) """
       
-      # 2. Parse content based on file type
-      parse_func = FILE_PARSERS[file.content_type]
-      parsed_document = parse_func(file_content)
-      
-      # 3. Process text
-      chunks = create_semantic_chunks(parsed_document.get('text'))
-      embeddings = get_embedding_service().get_embeddings(chunks)
-      
-      # 4. Store in vector database
-      doc_id = rag_service.process_document(parsed_document, embeddings)
-      
-      # 5. Save metadata in database
-      db_doc = Document(
-        user_id=current_user.id,
-        original_filename=file.filename,
-        storage_url=file_url,
-        vector_id=doc_id,
-        file_size=len(file_content),
-        file_type=file.content_type,
-        file_extension=file_ext,
-        created_at=datetime.now(timezone.utc),
-        updated_at=datetime.now(timezone.utc)
-      )
-      
-      db.add(db_doc)
-      db.commit()
-      db.refresh(db_doc)
+      try:
+        # 2. Save metadata in database
+        vector_id = f"doc_{uuid.uuid4().hex}"
+        db_doc = await run_in_threadpool(
+          _create_document,
+          db,
+          user_id,
+          file,
+          file_url,
+          vector_id,
+          file_size,
+          file_ext
+        )
+
+        # 3. Queue parsing, embedding and indexing
+        job = await ingestion_service.submit(
+          document_id=db_doc.id,
+          vector_id=vector_id,
+          user_id=user_id,
+          filename=file.filename,
+          content_type=file.content_type,
+          file_path=file_path
+        )
+      except Exception:
+        os.remove(file_path)
+        raise
 
       results.append(DocumentUploadResponse(
         success=True,
-        message=f"Document {file.filename} processed successfully",
+        message=f"Document {file.filename} queued for processing",
+        job_id=job.id,
         document=DocumentResponse(
           id=db_doc.id,
-          user_id=current_user.id,
+          user_id=user_id,
           original_filename=file.filename,
           storage_url=file_url,
-          vector_id=doc_id,
-          file_size=len(file_content),
+          vector_id=vector_id,
+          file_size=file_size,
           file_type=file.content_type,
           file_extension=file_ext,
+          status=db_doc.status,
           created_at=db_doc.created_at,
           updated_at=db_doc.updated_at
         )
@@ -141,8 +210,8 @@ async def upload_files(
       results.append(DocumentUploadResponse(
         success=False,
         message="Database operation failed",
-        error=db_exc.detail,
-        status_code=db_exc.status_code,
+        error=str(db_exc),
+        status_code=500,
         filename=file.filename
       ))
 
@@ -159,6 +228,33 @@ async def upload_files(
 
   return results
 
+@router.get(
+    "/jobs/{job_id}",
+    response_model=IngestionJobResponse,
+    status_code=status.HTTP_200_OK
+)
+async def get_ingestion_job(
+    job_id: str,
+    current_user: CurrentUser
+):
+    """Get the processing status of an uploaded document"""
+    job = get_ingestion_service().get_job(job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
+
+    return IngestionJobResponse(
+        job_id=job.id,
+        document_id=job.document_id,
+        filename=job.filename,
+        status=job.status,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
 @router.get(
     "/",
     response_model=List[DocumentResponse],
@@ -215,9 +311,11 @@ async def delete_document(
                 detail="Document not found"
             )
             
-        # TODO: Delete from vector store
+        # Delete from vector store
         try:
-            rag_service.delete_document(document.vector_id)
+            await run_in_threadpool(
+                get_rag_service().remove_document, document.vector_id, user_id=current_user.id
+            )
         except Exception as e:
             logger.error(f"Error deleting from vector store: {str(e)}")
             
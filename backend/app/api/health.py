@@ -1,7 +1,6 @@
 from fastapi import APIRouter, Depends
 from typing import Dict
 from sqlalchemy.orm import Session
-from chromadb import PersistentClient
 
 from app.db.base import get_db
 from app.dependencies import get_current_active_user
@@ -24,6 +23,7 @@ async def check_health(
     
     try:
         # Test ChromaDB connection
+        from chromadb import PersistentClient
         chroma_client = PersistentClient(path="chroma_test_db")
         collections = chroma_client.list_collections()
         health_status["chromadb"] = True
@@ -0,0 +1,341 @@
+"""
+Indexation en masse d'un répertoire ou d'une archive (zip, tar) de documents
+
+Les fichiers sont analysés en parallèle dans un pool de processus avec les
+parseurs de FILE_PARSERS ; leurs chunks sont embeddés par gros lots, écrits
+dans ChromaDB en quelques appels et les lignes Document de chaque lot sont
+insérées en une seule requête. Le fichier de checkpoint (JSON Lines) liste
+les fichiers déjà indexés : une commande interrompue reprend là où elle
+s'était arrêtée (un lot interrompu est simplement rejoué).
+
+Usage (depuis backend/, avec le même .env que l'API) :
+  python -m app.cli.ingest /srv/partage --user-id 1
+  python -m app.cli.ingest corpus.zip --user-id 1 --checkpoint corpus.checkpoint.jsonl
+"""
+import argparse
+import hashlib
+import json
+import logging
+import mimetypes
+import multiprocessing
+import os
+import tarfile
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import insert, select
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.document import Document
+from app.models.user import User
+from app.services.EmbeddingService import get_embedding_service
+from app.services.RagService import get_rag_service
+from app.utils.file_parser import FILE_PARSERS, FileSource, parse_file
+
+logger = logging.getLogger(__name__)
+
+# Nombre de chunks embeddés et écrits ensemble
+DEFAULT_BATCH_CHUNKS = 2048
+
+@dataclass
+class SourceFile:
+  """Fichier à indexer"""
+  path: str          # Chemin relatif au répertoire ou à l'archive (clé du checkpoint)
+  location: str      # Emplacement complet, enregistré comme storage_url du Document
+  content_type: str
+  size: int
+  source: Optional[FileSource]  # Chemin sur disque ou contenu d'un membre d'archive
+
+def content_type_for(path: str) -> Optional[str]:
+  """Type MIME d'un fichier d'après son extension, None s'il n'a pas de parseur"""
+  content_type, _ = mimetypes.guess_type(path)
+  return content_type if content_type in FILE_PARSERS else None
+
+def iter_directory(root: str, skip: Set[str]) -> Iterator[SourceFile]:
+  """Fichiers indexables d'un répertoire (récursivement), dans un ordre stable"""
+  for dirpath, dirnames, filenames in os.walk(root):
+    dirnames.sort()
+    for filename in sorted(filenames):
+      full_path = os.path.join(dirpath, filename)
+      path = os.path.relpath(full_path, root)
+      content_type = content_type_for(filename)
+      if content_type is None or path in skip:
+        continue
+      yield SourceFile(path, full_path, content_type, os.path.getsize(full_path), full_path)
+
+def iter_archive(archive_path: str, skip: Set[str]) -> Iterator[SourceFile]:
+  """
+  Fichiers indexables d'une archive zip ou tar, lus un par un au fil de
+  l'analyse (sans extraction sur disque)
+  """
+  if zipfile.is_zipfile(archive_path):
+    with zipfile.ZipFile(archive_path) as archive:
+      for info in archive.infolist():
+        content_type = content_type_for(info.filename)
+        if info.is_dir() or content_type is None or info.filename in skip:
+          continue
+        yield SourceFile(
+          info.filename, f"{archive_path}#{info.filename}", content_type,
+          info.file_size, archive.read(info)
+        )
+  elif tarfile.is_tarfile(archive_path):
+    with tarfile.open(archive_path) as archive:
+      for member in archive:
+        content_type = content_type_for(member.name)
+        if not member.isfile() or content_type is None or member.name in skip:
+          continue
+        with archive.extractfile(member) as fp:
+          content = fp.read()
+        yield SourceFile(
+          member.name, f"{archive_path}#{member.name}", content_type, member.size, content
+        )
+  else:
+    raise ValueError(f"Unsupported archive format: {archive_path}")
+
+def iter_sources(source: str, skip: Set[str]) -> Iterator[SourceFile]:
+  """Fichiers indexables d'un répertoire ou d'une archive, hors ceux de skip"""
+  source = os.path.abspath(source)
+  if os.path.isdir(source):
+    return iter_directory(source, skip)
+  return iter_archive(source, skip)
+
+def parse_in_pool(
+  executor: Executor,
+  files: Iterator[SourceFile],
+  max_pending: int
+) -> Iterator[Tuple[SourceFile, Optional[Dict[str, Any]], Optional[Exception]]]:
+  """
+  Analyse des fichiers dans un pool de processus, au plus max_pending à la
+  fois (ce qui borne la mémoire des membres d'archive lus)
+
+  Yields:
+    (fichier, document analysé ou None, erreur ou None), dans l'ordre des fichiers
+  """
+  pending = deque()
+
+  def next_result():
+    file, future = pending.popleft()
+    file.source = None  # Le contenu n'est plus utile une fois analysé
+    try:
+      return file, future.result(), None
+    except Exception as e:
+      return file, None, e
+
+  for file in files:
+    pending.append((file, executor.submit(parse_file, file.content_type, file.source)))
+    if len(pending) >= max_pending:
+      yield next_result()
+  while pending:
+    yield next_result()
+
+class Checkpoint:
+  """
+  Journal (JSON Lines) des fichiers traités, complété après chaque lot ; les
+  fichiers indexés sont ignorés à la reprise, ceux en erreur sont réessayés
+  """
+
+  def __init__(self, path: str):
+    self.path = path
+    self.indexed: Set[str] = set()
+    if os.path.exists(path):
+      with open(path, encoding="utf-8") as fp:
+        for line in fp:
+          try:
+            entry = json.loads(line)
+          except json.JSONDecodeError:
+            continue  # Dernière ligne tronquée par une interruption
+          if entry.get("status") == "indexed":
+            self.indexed.add(entry["path"])
+
+  def record(self, entries: List[Dict[str, Any]]) -> None:
+    """Ajoute des entrées au journal et les écrit sur disque"""
+    with open(self.path, "a", encoding="utf-8") as fp:
+      for entry in entries:
+        fp.write(json.dumps(entry, ensure_ascii=False) + "\n")
+      fp.flush()
+      os.fsync(fp.fileno())
+
+class BulkIngester:
+  """Accumule les documents analysés et les indexe par lots d'au moins batch_chunks chunks"""
+
+  def __init__(self, source: str, user_id: int, checkpoint: Checkpoint, batch_chunks: int):
+    self.source = os.path.abspath(source)
+    self.user_id = user_id
+    self.checkpoint = checkpoint
+    self.batch_chunks = batch_chunks
+    self.embedding_service = get_embedding_service()
+    self.rag_service = get_rag_service()
+    self._batch: List[Tuple[SourceFile, Dict[str, Any], str]] = []
+    self._batch_chunks = 0
+
+    # Compteurs
+    self.files = 0
+    self.chunks = 0
+    self.errors = 0
+
+  def vector_id(self, file: SourceFile) -> str:
+    """
+    ID stable du document dans le stockage vectoriel : un lot rejoué après
+    une interruption réécrit les mêmes chunks
+    """
+    key = f"{self.user_id}\0{self.source}\0{file.path}".encode("utf-8")
+    return f"doc_{hashlib.sha256(key).hexdigest()[:32]}"
+
+  def add(self, file: SourceFile, parsed_document: Dict[str, Any]) -> None:
+    """Ajoute un document analysé au lot courant, indexé dès que le lot est plein"""
+    self._batch.append((file, parsed_document, self.vector_id(file)))
+    self._batch_chunks += len(parsed_document.get("chunks", []))
+    if self._batch_chunks >= self.batch_chunks:
+      self.flush()
+
+  def fail(self, file: SourceFile, error: Exception) -> None:
+    """Consigne un fichier qui n'a pas pu être analysé"""
+    logger.error(f"Parsing of {file.path} failed: {str(error)}")
+    self.errors += 1
+    self.checkpoint.record([{"path": file.path, "status": "error", "error": str(error)}])
+
+  def flush(self) -> None:
+    """Embedde, écrit et enregistre le lot courant, puis le consigne dans le checkpoint"""
+    if not self._batch:
+      return
+    batch, self._batch, self._batch_chunks = self._batch, [], 0
+
+    texts = [chunk["text"] for _, parsed_document, _ in batch for chunk in parsed_document.get("chunks", [])]
+    embeddings = self.embedding_service.get_embeddings(texts)
+    self.rag_service.process_documents(
+      [parsed_document for _, parsed_document, _ in batch],
+      [vector_id for _, _, vector_id in batch],
+      embeddings,
+      user_id=self.user_id
+    )
+    self._register_documents(batch)
+
+    self.checkpoint.record([
+      {
+        "path": file.path,
+        "status": "indexed",
+        "vector_id": vector_id,
+        "chunks": len(parsed_document.get("chunks", []))
+      }
+      for file, parsed_document, vector_id in batch
+    ])
+    self.files += len(batch)
+    self.chunks += len(texts)
+
+  def _register_documents(self, batch: List[Tuple[SourceFile, Dict[str, Any], str]]) -> None:
+    """Insère les lignes Document du lot en une requête (sauf celles d'un lot rejoué)"""
+    now = datetime.now(timezone.utc)
+    rows = [
+      {
+        "user_id": self.user_id,
+        "original_filename": os.path.basename(file.path),
+        "storage_url": file.location,
+        "vector_id": vector_id,
+        "file_size": file.size,
+        "file_type": file.content_type,
+        "file_extension": os.path.splitext(file.path)[1].lower(),
+        "status": "indexed",
+        "created_at": now,
+        "updated_at": now
+      }
+      for file, _, vector_id in batch
+    ]
+    with SessionLocal() as db:
+      existing = set(db.scalars(
+        select(Document.vector_id).where(Document.vector_id.in_([row["vector_id"] for row in rows]))
+      ))
+      rows = [row for row in rows if row["vector_id"] not in existing]
+      if rows:
+        db.execute(insert(Document), rows)
+        db.commit()
+
+def ingest(
+  source: str,
+  user_id: int,
+  checkpoint_path: str,
+  processes: int = settings.PARSER_PROCESSES,
+  batch_chunks: int = DEFAULT_BATCH_CHUNKS
+) -> Dict[str, Any]:
+  """
+  Indexe tous les fichiers d'un répertoire ou d'une archive pour un utilisateur
+
+  Args:
+    source: Répertoire ou archive (zip, tar, tar.gz...)
+    user_id: Propriétaire des documents
+    checkpoint_path: Journal des fichiers traités (créé s'il n'existe pas)
+    processes: Nombre de processus d'analyse
+    batch_chunks: Nombre de chunks embeddés et écrits ensemble
+
+  Returns:
+    Compteurs de l'indexation (fichiers, chunks, erreurs, fichiers déjà indexés, durée)
+  """
+  checkpoint = Checkpoint(checkpoint_path)
+  ingester = BulkIngester(source, user_id, checkpoint, batch_chunks)
+  start = time.perf_counter()
+  last_report = start
+
+  # "spawn" : les workers n'héritent pas des clients (ChromaDB, OpenAI) du processus principal
+  with ProcessPoolExecutor(
+    max_workers=processes,
+    mp_context=multiprocessing.get_context("spawn")
+  ) as executor:
+    files = iter_sources(source, checkpoint.indexed)
+    for file, parsed_document, error in parse_in_pool(executor, files, max_pending=processes * 2):
+      if error is not None:
+        ingester.fail(file, error)
+      else:
+        ingester.add(file, parsed_document)
+
+      if time.perf_counter() - last_report >= 10:
+        last_report = time.perf_counter()
+        logger.info(
+          f"{ingester.files} files ({ingester.chunks} chunks) indexed, "
+          f"{ingester.errors} errors, {ingester.files / (last_report - start):.1f} files/s"
+        )
+    ingester.flush()
+
+  return {
+    "files": ingester.files,
+    "chunks": ingester.chunks,
+    "errors": ingester.errors,
+    "skipped": len(checkpoint.indexed),
+    "seconds": round(time.perf_counter() - start, 1)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("source", help="Répertoire ou archive (zip, tar, tar.gz) à indexer")
+  parser.add_argument("--user-id", type=int, required=True, help="Propriétaire des documents")
+  parser.add_argument(
+    "--checkpoint",
+    help="Journal de reprise (par défaut <nom de la source>.checkpoint.jsonl dans le répertoire courant)"
+  )
+  parser.add_argument("--processes", type=int, default=settings.PARSER_PROCESSES, help="Processus d'analyse")
+  parser.add_argument(
+    "--batch-chunks", type=int, default=DEFAULT_BATCH_CHUNKS,
+    help="Chunks embeddés et écrits ensemble"
+  )
+  args = parser.parse_args()
+
+  logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+  if not os.path.exists(args.source):
+    parser.error(f"{args.source} does not exist")
+  with SessionLocal() as db:
+    if db.get(User, args.user_id) is None:
+      parser.error(f"Unknown user: {args.user_id}")
+
+  checkpoint_path = args.checkpoint or f"{os.path.basename(os.path.normpath(args.source))}.checkpoint.jsonl"
+  stats = ingest(args.source, args.user_id, checkpoint_path, args.processes, args.batch_chunks)
+  print(
+    f"{stats['files']} fichiers ({stats['chunks']} chunks) indexés en {stats['seconds']} s, "
+    f"{stats['errors']} erreurs, {stats['skipped']} déjà indexés (checkpoint {checkpoint_path})"
+  )
+
+if __name__ == "__main__":
+  main()
@@ -1,5 +1,14 @@
 from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.core.config import settings
+
+# Un hash d'un autre coût que BCRYPT_ROUNDS est à mettre à jour (verify_and_update)
+pwd_context = CryptContext(
+  schemes=["bcrypt"],
+  deprecated="auto",
+  bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+  bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+  bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
@@ -1,19 +1,73 @@
+from typing import Any, AsyncIterator, Dict
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from app.core.config import settings
+from app.utils.lazy import LazySingleton
 
 # Déclaration de la base pour les modèles
 Base = declarative_base()
 
+# Pilotes asynchrones des bases supportées
+ASYNC_DRIVERS = {
+  "postgresql": "postgresql+asyncpg",
+  "sqlite": "sqlite+aiosqlite"
+}
+
+def engine_options(url: str) -> Dict[str, Any]:
+  """Options du pool de connexions (SQLite garde le pool par défaut de SQLAlchemy)"""
+  if make_url(url).get_backend_name() == "sqlite":
+    return {}
+  return {
+    "pool_size": settings.DATABASE_POOL_SIZE,
+    "max_overflow": settings.DATABASE_MAX_OVERFLOW,
+    "pool_timeout": settings.DATABASE_POOL_TIMEOUT,
+    "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+    "pool_pre_ping": settings.DATABASE_POOL_PRE_PING
+  }
+
+def async_database_url(url: str) -> str:
+  """URL du moteur asynchrone : même base que url, avec le pilote asynchrone"""
+  parsed = make_url(url)
+  backend = parsed.get_backend_name()
+  if backend not in ASYNC_DRIVERS:
+    raise ValueError(f"No async driver for database backend '{backend}', set DATABASE_ASYNC_URL")
+  # client_encoding est propre à psycopg2 (asyncpg utilise UTF-8)
+  query = {key: value for key, value in parsed.query.items() if key != "client_encoding"}
+  return parsed.set(drivername=ASYNC_DRIVERS[backend], query=query).render_as_string(hide_password=False)
+
 # Configuration de la session SQLAlchemy
-engine = create_engine(settings.DATABASE_URL)
+engine = create_engine(settings.DATABASE_URL, **engine_options(settings.DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def _create_async_sessionmaker():
+  """Moteur asynchrone et fabrique de sessions, créés à la première route async"""
+  # Import différé : le pilote asynchrone n'est requis que si une route l'utilise
+  from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+  
+  url = settings.DATABASE_ASYNC_URL or async_database_url(settings.DATABASE_URL)
+  async_engine = create_async_engine(url, **engine_options(url))
+  # expire_on_commit=False : les objets restent lisibles après commit, sans I/O implicite
+  return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+AsyncSessionLocal = LazySingleton(_create_async_sessionmaker)
+
 def get_db():
   """Générateur de sessions de base de données"""
   db = SessionLocal()
   try:
     yield db
   finally:
-    db.close()
\ No newline at end of file
+    db.close()
+
+async def get_async_db() -> AsyncIterator[Any]:
+  """Générateur de sessions asynchrones (AsyncSession), pour les routes async"""
+  async with AsyncSessionLocal.get()() as db:
+    yield db
+
+async def dispose_engines() -> None:
+  """Ferme les connexions des pools (arrêt de l'application)"""
+  engine.dispose()
+  if AsyncSessionLocal.loaded:
+    await AsyncSessionLocal.get().kw["bind"].dispose()
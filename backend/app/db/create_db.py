@@ -1,21 +1,24 @@
 import psycopg2
+from psycopg2 import sql
 from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+from sqlalchemy.engine import make_url
+from app.core.config import settings
 
 def create_database_if_not_exists():
-    db_name = "ragbot_db"
-    db_user = "postgres"
-    db_password = "toor"
-    db_host = "localhost"
-    db_port = "5432"
+    # Paramètres de connexion lus dans DATABASE_URL
+    url = make_url(settings.DATABASE_URL)
+    if url.get_backend_name() != "postgresql":
+        return
+    db_name = url.database
 
     try:
         # Connexion à la base 'postgres'
         conn = psycopg2.connect(
             dbname="postgres",
-            user=db_user,
-            password=db_password,
-            host=db_host,
-            port=db_port
+            user=url.username,
+            password=url.password,
+            host=url.host or "localhost",
+            port=url.port or 5432
         )
         conn.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
         cursor = conn.cursor()
@@ -26,7 +29,7 @@ def create_database_if_not_exists():
 
         # Si elle n'existe pas, la créer
         if not exists:
-            cursor.execute(f"CREATE DATABASE {db_name}")
+            cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(db_name)))
             print(f"La base '{db_name}' a été créée.")
         else:
             print(f"La base '{db_name}' existe déjà.")
@@ -35,4 +38,4 @@ def create_database_if_not_exists():
         conn.close()
 
     except Exception as e:
-        print("❌ Erreur lors de la création de la base :", e)
\ No newline at end of file
+        print("❌ Erreur lors de la création de la base :", e)
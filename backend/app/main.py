@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -6,15 +7,39 @@ from app.api.documents import router as documents_router
 from app.api.chat import router as chat_router
 from app.api.dashboard import router as dashboard_router
 from app.api.health import router as health_router
+from app.db.base import dispose_engines
 from app.db.init_db import init_db
 from app.db.create_db import create_database_if_not_exists
+from app.core.config import settings
+from app.services.EmbeddingService import get_embedding_service
+from app.services.IngestionService import get_ingestion_service
+from app.services.LLMService import get_llm_service
+from app.services.RagService import get_rag_service
+from app.services.RerankService import get_rerank_service
+from app.utils.text_processing import load_sentence_tokenizer
+
+def preload_services() -> None:
+  """Crée les services chargés sinon à la première requête"""
+  load_sentence_tokenizer()
+  get_embedding_service().warm_up()
+  get_rag_service()
+  get_llm_service()
+  if settings.RERANK_ENABLED:
+    get_rerank_service().load()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
   # Code à exécuter au démarrage
   create_database_if_not_exists()  # Crée la base si elle n'existe pas
   init_db()  # Initialise les tables
+  if settings.PRELOAD_SERVICES:
+    await asyncio.to_thread(preload_services)  # Sinon chargés à la première utilisation
+  elif settings.EMBEDDING_BACKEND == "local":
+    await asyncio.to_thread(get_embedding_service().warm_up)  # Chargement du modèle local
+  await get_ingestion_service().start()  # Démarre les workers d'indexation
   yield
+  await get_ingestion_service().stop()
+  await dispose_engines()  # Ferme les connexions des pools
 
 app = FastAPI(
   title="RAG-Automate",
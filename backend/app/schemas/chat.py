@@ -20,7 +20,6 @@ class ChatRequest(BaseModel):
   conversation_id: Optional[str] = None
   model_settings: Optional[Dict[str, Any]] = {
     "num_chunks": 3,
-    "similarity_threshold": 0.7,
     "model": "gpt-4",
     "temperature": 0.7
   }
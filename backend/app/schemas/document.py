@@ -32,6 +32,16 @@ class DocumentUploadResponse(BaseModel):
     error: Optional[str] = None
     status_code: Optional[int] = None
     filename: Optional[str] = None  # Ajout du champ filename manquant
+    job_id: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+class IngestionJobResponse(BaseModel):
+    job_id: str
+    document_id: int
+    filename: str
+    status: str  # queued, processing, indexed, error, cancelled
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
@@ -1,16 +1,50 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Annotated, Optional
+from typing import Annotated, Optional, Tuple
 
 from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
 
 from app.core.config import settings
 from app.db.base import get_db
 from app.models.user import User as DBUser
 from app.core.security import pwd_context, oauth2_scheme
+from app.utils.cache import TTLCache
+
+# Threads dédiés au hachage bcrypt (~100-300 ms CPU par appel) : une vague de
+# connexions ne bloque ni la boucle d'événements ni le pool de threads de FastAPI
+password_executor = ThreadPoolExecutor(
+  max_workers=settings.PASSWORD_HASH_WORKERS,
+  thread_name_prefix="password-hash"
+)
+
+# Utilisateurs authentifiés récemment, par (nom d'utilisateur, expiration du token) :
+# évite une requête SQL par appel à l'API
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_ENTRIES, ttl=settings.USER_CACHE_TTL)
+
+def invalidate_user(username: str) -> int:
+  """Retire un utilisateur du cache, pour tous ses tokens"""
+  return user_cache.pop_where(lambda key: key[0] == username)
+
+@event.listens_for(DBUser, "after_update")
+def _invalidate_updated_user(mapper, connection, target: DBUser) -> None:
+  """Invalide le cache quand un utilisateur est désactivé, change de rôle ou de nom"""
+  state = inspect(target)
+  if not any(state.attrs[name].history.has_changes() for name in ("is_active", "role", "username")):
+    return
+  invalidate_user(target.username)
+  for username in state.attrs.username.history.deleted:
+    invalidate_user(username)
+
+@event.listens_for(DBUser, "after_delete")
+def _invalidate_deleted_user(mapper, connection, target: DBUser) -> None:
+  invalidate_user(target.username)
 
 class AuthService:
   @staticmethod
@@ -23,6 +57,31 @@ class AuthService:
     """Génère un hash sécurisé du mot de passe"""
     return pwd_context.hash(password)
 
+  @staticmethod
+  async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password, exécuté dans le pool de hachage"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.verify, plain_password, hashed_password)
+
+  @staticmethod
+  async def get_password_hash_async(password: str) -> str:
+    """get_password_hash, exécuté dans le pool de hachage"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, pwd_context.hash, password)
+
+  @staticmethod
+  async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifie le mot de passe dans le pool de hachage
+
+    Returns:
+      (mot de passe valide, nouveau hash si le hash actuel n'a pas le coût configuré, sinon None)
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+      password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
   @staticmethod
   def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Crée un JWT token avec une date d'expiration"""
@@ -70,13 +129,36 @@ class AuthService:
     except JWTError as e:
       raise credentials_exception from e
 
-    user = db.query(DBUser).filter(DBUser.username == username).first()
-    if user is None:
-      raise credentials_exception
+    cache_key = (username, payload.get("exp"))
+    cached = user_cache.get(cache_key)
+    if cached is not None:
+      # Rattacher une copie à la session de la requête, sans requête SQL
+      user = db.merge(cached, load=False)
+    else:
+      user = await run_in_threadpool(
+        lambda: db.query(DBUser).filter(DBUser.username == username).first()
+      )
+      if user is None:
+        raise credentials_exception
+      # Pas au-delà de l'expiration du token
+      ttl = settings.USER_CACHE_TTL
+      if payload.get("exp") is not None:
+        ttl = min(ttl, payload["exp"] - datetime.now(timezone.utc).timestamp())
+      if ttl > 0:
+        user_cache.set(cache_key, cls._detached_copy(user), ttl=ttl)
         
     request.state.user = user
     return user
 
+  @staticmethod
+  def _detached_copy(user: DBUser) -> DBUser:
+    """Copie des colonnes d'un utilisateur, indépendante de toute session"""
+    columns = {column.key: getattr(user, column.key) for column in inspect(DBUser).column_attrs}
+    copy = DBUser(**columns)
+    # Objet "détaché" : peut être rattaché à une session par merge(load=False)
+    make_transient_to_detached(copy)
+    return copy
+
   @classmethod
   async def get_current_active_user(
     cls,
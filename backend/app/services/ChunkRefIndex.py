@@ -0,0 +1,249 @@
+import json
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de paramètres par requête SQL (limite SQLite)
+SQL_BATCH_SIZE = 500
+
+class ChunkRefIndex:
+    """
+    Références des chunks d'une collection, pour la déduplication : chaque
+    occurrence (document, position) d'un chunk est rattachée au hash de son
+    contenu
+
+    Un contenu présent une seule fois est stocké comme un chunk ordinaire de
+    son document ; dès qu'il apparaît une deuxième fois dans la collection,
+    il devient "partagé" : un seul vecteur, référencé par toutes ses
+    occurrences, conservé tant qu'il reste au moins une référence.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        Args:
+            path: Fichier SQLite des références (":memory:" pour un index non persistant)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunk_refs (
+                collection TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                chunk_index INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                metadata TEXT,
+                PRIMARY KEY (collection, document_id, chunk_index)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_chunk_refs_hash ON chunk_refs (collection, content_hash);
+
+            CREATE TABLE IF NOT EXISTS shared_chunks (
+                collection TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                PRIMARY KEY (collection, content_hash)
+            ) WITHOUT ROWID;
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _batches(values: List[Any]) -> Iterable[List[Any]]:
+        for start in range(0, len(values), SQL_BATCH_SIZE):
+            yield values[start:start + SQL_BATCH_SIZE]
+
+    def lookup(
+        self,
+        collection: str,
+        content_hashes: List[str]
+    ) -> Dict[str, Optional[Tuple[str, int]]]:
+        """
+        État des contenus déjà présents dans une collection
+
+        Returns:
+            Pour chaque hash connu : None s'il est partagé, sinon l'occurrence
+            (document_id, chunk_index) qui le stocke ; les hash inconnus sont absents
+        """
+        known: Dict[str, Optional[Tuple[str, int]]] = {}
+        with self._lock:
+            for batch in self._batches(list(set(content_hashes))):
+                placeholders = ",".join("?" * len(batch))
+                for document_id, chunk_index, content_hash in self._conn.execute(
+                    f"SELECT document_id, chunk_index, content_hash FROM chunk_refs "
+                    f"WHERE collection = ? AND content_hash IN ({placeholders})",
+                    [collection, *batch]
+                ):
+                    known.setdefault(content_hash, (document_id, chunk_index))
+                for (content_hash,) in self._conn.execute(
+                    f"SELECT content_hash FROM shared_chunks "
+                    f"WHERE collection = ? AND content_hash IN ({placeholders})",
+                    [collection, *batch]
+                ):
+                    known[content_hash] = None
+        return known
+
+    def add_refs(
+        self,
+        collection: str,
+        refs: List[Tuple[str, int, str, Optional[Dict[str, Any]]]],
+        shared_hashes: Iterable[str] = ()
+    ) -> None:
+        """
+        Enregistre des occurrences (une occurrence déjà connue est remplacée)
+
+        Args:
+            collection: Collection du stockage vectoriel
+            refs: Occurrences (document_id, chunk_index, content_hash, métadonnées du chunk),
+                les métadonnées (titre, page...) étant restituées par references
+            shared_hashes: Contenus devenus partagés
+        """
+        shared_rows = [(collection, content_hash) for content_hash in shared_hashes]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_refs (collection, document_id, chunk_index, content_hash, metadata) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (collection, document_id, chunk_index, content_hash, json.dumps(metadata) if metadata else None)
+                    for document_id, chunk_index, content_hash, metadata in refs
+                ]
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO shared_chunks (collection, content_hash) VALUES (?, ?)",
+                shared_rows
+            )
+            self._conn.commit()
+
+    def remove_refs(
+        self,
+        collection: str,
+        document_id: str,
+        chunk_indexes: Optional[List[int]] = None
+    ) -> List[str]:
+        """
+        Retire des occurrences d'un document (toutes si chunk_indexes est None)
+
+        Les contenus partagés restent marqués comme tels, même sans référence,
+        jusqu'à forget_unreferenced
+
+        Returns:
+            Hash des occurrences retirées
+        """
+        with self._lock:
+            if chunk_indexes is None:
+                hashes = [row[0] for row in self._conn.execute(
+                    "SELECT content_hash FROM chunk_refs WHERE collection = ? AND document_id = ?",
+                    (collection, document_id)
+                )]
+                self._conn.execute(
+                    "DELETE FROM chunk_refs WHERE collection = ? AND document_id = ?",
+                    (collection, document_id)
+                )
+            else:
+                hashes = []
+                for batch in self._batches(list(chunk_indexes)):
+                    placeholders = ",".join("?" * len(batch))
+                    params = [collection, document_id, *batch]
+                    hashes.extend(row[0] for row in self._conn.execute(
+                        f"SELECT content_hash FROM chunk_refs "
+                        f"WHERE collection = ? AND document_id = ? AND chunk_index IN ({placeholders})",
+                        params
+                    ))
+                    self._conn.execute(
+                        f"DELETE FROM chunk_refs "
+                        f"WHERE collection = ? AND document_id = ? AND chunk_index IN ({placeholders})",
+                        params
+                    )
+            self._conn.commit()
+        return hashes
+
+    def forget_unreferenced(self, collection: str, content_hashes: List[str]) -> List[str]:
+        """
+        Oublie les contenus partagés qui n'ont plus aucune référence
+
+        Returns:
+            Hash des contenus partagés oubliés (leur vecteur peut être supprimé)
+        """
+        orphaned = []
+        with self._lock:
+            for batch in self._batches(list(set(content_hashes))):
+                placeholders = ",".join("?" * len(batch))
+                orphaned.extend(row[0] for row in self._conn.execute(
+                    f"SELECT content_hash FROM shared_chunks "
+                    f"WHERE collection = ? AND content_hash IN ({placeholders}) "
+                    f"AND NOT EXISTS (SELECT 1 FROM chunk_refs r "
+                    f"WHERE r.collection = shared_chunks.collection AND r.content_hash = shared_chunks.content_hash)",
+                    [collection, *batch]
+                ))
+            for batch in self._batches(orphaned):
+                self._conn.execute(
+                    f"DELETE FROM shared_chunks WHERE collection = ? AND content_hash IN ({','.join('?' * len(batch))})",
+                    [collection, *batch]
+                )
+            self._conn.commit()
+        return orphaned
+
+    def document_refs(self, collection: str, document_id: str) -> Dict[int, str]:
+        """Occurrences d'un document : position -> hash du contenu"""
+        with self._lock:
+            return dict(self._conn.execute(
+                "SELECT chunk_index, content_hash FROM chunk_refs WHERE collection = ? AND document_id = ?",
+                (collection, document_id)
+            ))
+
+    def shared_hashes(self, collection: str, document_ids: List[str]) -> List[str]:
+        """Contenus partagés référencés par des documents"""
+        hashes = set()
+        with self._lock:
+            for batch in self._batches(list(document_ids)):
+                hashes.update(row[0] for row in self._conn.execute(
+                    f"SELECT DISTINCT r.content_hash FROM chunk_refs r "
+                    f"JOIN shared_chunks s ON s.collection = r.collection AND s.content_hash = r.content_hash "
+                    f"WHERE r.collection = ? AND r.document_id IN ({','.join('?' * len(batch))})",
+                    [collection, *batch]
+                ))
+        return list(hashes)
+
+    def references(
+        self,
+        collection: str,
+        content_hashes: List[str],
+        document_ids: Optional[List[str]] = None
+    ) -> Dict[str, List[Tuple[str, int, Dict[str, Any]]]]:
+        """
+        Occurrences de contenus, éventuellement limitées à certains documents
+
+        Returns:
+            hash -> occurrences (document_id, chunk_index, métadonnées du chunk), triées
+        """
+        allowed = set(document_ids) if document_ids else None
+        references: Dict[str, List[Tuple[str, int, Dict[str, Any]]]] = {}
+        with self._lock:
+            for batch in self._batches(list(set(content_hashes))):
+                for content_hash, document_id, chunk_index, metadata in self._conn.execute(
+                    f"SELECT content_hash, document_id, chunk_index, metadata FROM chunk_refs "
+                    f"WHERE collection = ? AND content_hash IN ({','.join('?' * len(batch))}) "
+                    f"ORDER BY document_id, chunk_index",
+                    [collection, *batch]
+                ):
+                    if allowed is None or document_id in allowed:
+                        references.setdefault(content_hash, []).append(
+                            (document_id, chunk_index, json.loads(metadata) if metadata else {})
+                        )
+        return references
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Nombre d'occurrences et de contenus partagés par collection"""
+        with self._lock:
+            refs = dict(self._conn.execute(
+                "SELECT collection, COUNT(*) FROM chunk_refs GROUP BY collection"
+            ).fetchall())
+            shared = dict(self._conn.execute(
+                "SELECT collection, COUNT(*) FROM shared_chunks GROUP BY collection"
+            ).fetchall())
+        return {"path": self.path, "references": refs, "shared_chunks": shared}
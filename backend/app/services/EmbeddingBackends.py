@@ -0,0 +1,239 @@
+import asyncio
+import base64
+import logging
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+import openai
+
+from app.core.config import settings
+from app.utils.vectors import VECTOR_DTYPE, as_matrix
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying: rate limiting (429) and transient server/network failures
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# Output size of the OpenAI embedding models, known before the first request
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+    "text-embedding-ada-002": 1536,
+}
+
+class EmbeddingBackend(ABC):
+    """
+    Computes the embeddings of one batch of non-empty texts
+
+    Batching across batches, caching and ordering are handled by
+    EmbeddingService; a backend only declares how large and how many
+    concurrent batches it accepts. Vectors are returned as one contiguous
+    float32 matrix (one row per text).
+    """
+
+    # Identifies the vectors in the embedding cache
+    model: str
+    max_batch_tokens: int
+    max_batch_inputs: int
+    max_concurrency: int
+
+    @property
+    def dimension(self) -> Optional[int]:
+        """Size of the vectors, None until it is known"""
+        return None
+
+    @abstractmethod
+    def embed(self, batch: List[str]) -> np.ndarray:
+        """Embed one batch of texts"""
+
+    async def embed_async(self, batch: List[str]) -> np.ndarray:
+        """Async version of embed (runs embed in a worker thread by default)"""
+        return await asyncio.to_thread(self.embed, batch)
+
+    def warm_up(self) -> None:
+        """Load whatever the first request would otherwise wait for"""
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """OpenAI embeddings API, with per-batch retries on rate limits and transient errors"""
+
+    def __init__(self, model: str = settings.EMBEDDING_MODEL):
+        # Retries are handled here so that they apply per batch
+        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        self.async_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY, max_retries=0)
+        self.model = model
+        self.max_batch_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_inputs = settings.EMBEDDING_BATCH_MAX_INPUTS
+        self.max_concurrency = settings.EMBEDDING_MAX_CONCURRENCY
+        self.max_retries = settings.EMBEDDING_MAX_RETRIES
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return OPENAI_EMBEDDING_DIMENSIONS.get(self.model)
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """Backoff before the next attempt, honouring Retry-After when present"""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        # Exponential backoff with jitter
+        return min(60.0, 2 ** attempt) * (0.5 + random.random() / 2)
+
+    @staticmethod
+    def _decode(response) -> np.ndarray:
+        """
+        Decode a base64 response into a float32 matrix
+
+        The API sends little-endian float32 vectors: they are copied straight
+        into the matrix, without building a Python float per component.
+        """
+        vectors = [np.frombuffer(base64.b64decode(data.embedding), dtype="<f4") for data in response.data]
+        matrix = np.empty((len(vectors), len(vectors[0]) if vectors else 0), dtype=VECTOR_DTYPE)
+        for row, vector in enumerate(vectors):
+            matrix[row] = vector
+        return matrix
+
+    def embed(self, batch: List[str]) -> np.ndarray:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.client.embeddings.create(
+                    model=self.model,
+                    input=batch,
+                    encoding_format="base64"
+                )
+                return self._decode(response)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                logger.warning(f"Embedding batch failed ({str(e)}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    async def embed_async(self, batch: List[str]) -> np.ndarray:
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await self.async_client.embeddings.create(
+                    model=self.model,
+                    input=batch,
+                    encoding_format="base64"
+                )
+                return self._decode(response)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                logger.warning(f"Embedding batch failed ({str(e)}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+class SentenceTransformerEmbeddingBackend(EmbeddingBackend):
+    """
+    Local sentence-transformers model, run on CPU
+
+    The model is loaded once, on first use or by warm_up. Inference is
+    serialized (one batch at a time) and parallelized inside the model
+    with `threads` intra-op threads.
+    """
+
+    def __init__(
+        self,
+        model: str = settings.LOCAL_EMBEDDING_MODEL,
+        batch_size: int = settings.LOCAL_EMBEDDING_BATCH_SIZE,
+        threads: int = settings.LOCAL_EMBEDDING_THREADS,
+        runtime: str = settings.LOCAL_EMBEDDING_RUNTIME,
+        quantize: bool = settings.LOCAL_EMBEDDING_QUANTIZE,
+        onnx_file: Optional[str] = settings.LOCAL_EMBEDDING_ONNX_FILE
+    ):
+        """
+        Args:
+            model: Hugging Face model name or local path
+            batch_size: Texts encoded per forward pass
+            threads: CPU threads used by the inference runtime
+            runtime: "torch", "onnx" or "openvino"
+            quantize: Apply dynamic int8 quantization (torch runtime)
+            onnx_file: ONNX file to load from the model repository (e.g. a quantized export)
+        """
+        self.model = model
+        self.batch_size = batch_size
+        self.threads = threads
+        self.runtime = runtime
+        self.quantize = quantize
+        self.onnx_file = onnx_file
+        # EmbeddingService sends one batch at a time: parallelism happens inside the model
+        self.max_batch_tokens = settings.EMBEDDING_BATCH_MAX_TOKENS
+        self.max_batch_inputs = batch_size * 8
+        self.max_concurrency = 1
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """Load the model once and return it"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Deferred imports: torch and sentence-transformers are slow to import
+                    import torch
+                    from sentence_transformers import SentenceTransformer
+
+                    start = time.perf_counter()
+                    torch.set_num_threads(self.threads)
+                    model_kwargs = {"file_name": self.onnx_file} if self.onnx_file else None
+                    model = SentenceTransformer(
+                        self.model,
+                        device="cpu",
+                        backend=self.runtime,
+                        model_kwargs=model_kwargs
+                    )
+                    if self.quantize and self.runtime == "torch":
+                        model = torch.quantization.quantize_dynamic(
+                            model, {torch.nn.Linear}, dtype=torch.qint8
+                        )
+                    self._model = model
+                    logger.info(
+                        f"Local embedding model {self.model} loaded in "
+                        f"{time.perf_counter() - start:.1f}s ({self.runtime}, {self.threads} threads)"
+                    )
+        return self._model
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return self._load().get_sentence_embedding_dimension()
+
+    def embed(self, batch: List[str]) -> np.ndarray:
+        model = self._load()
+        with self._lock:
+            vectors = model.encode(
+                batch,
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+                show_progress_bar=False
+            )
+        return as_matrix(vectors)
+
+    def warm_up(self) -> None:
+        # The first forward pass also initializes the runtime's thread pool
+        self.embed(["warm up"])
+
+def create_embedding_backend(name: str = settings.EMBEDDING_BACKEND) -> EmbeddingBackend:
+    """
+    Build the embedding backend selected in the settings
+
+    Args:
+        name: "openai" or "local" (sentence-transformers)
+    """
+    if name == "openai":
+        return OpenAIEmbeddingBackend()
+    if name == "local":
+        return SentenceTransformerEmbeddingBackend()
+    raise ValueError(f"Unknown embedding backend: {name}")
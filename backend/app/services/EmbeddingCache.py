@@ -0,0 +1,171 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.utils.vectors import VECTOR_DTYPE
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de paramètres par requête SQL (limite SQLite)
+SQL_BATCH_SIZE = 500
+
+class EmbeddingCache:
+    """
+    Cache persistant des embeddings, adressé par contenu (modèle, hash du texte normalisé)
+
+    Les vecteurs sont stockés en float32 dans une table SQLite et évincés
+    selon leur date de dernier accès (LRU) au-delà de max_entries.
+    """
+
+    def __init__(self, path: str = "./embedding_cache.db", max_entries: int = 100000):
+        """
+        Args:
+            path: Fichier SQLite du cache
+            max_entries: Nombre maximal de vecteurs conservés
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT NOT NULL,
+                text_hash BLOB NOT NULL,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL,
+                PRIMARY KEY (model, text_hash)
+            ) WITHOUT ROWID
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings (last_access)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Embedding cache opened at {path} ({self._count} entries)")
+
+    @staticmethod
+    def hash_text(text: str) -> bytes:
+        """Hash SHA-256 du texte normalisé (Unicode NFC, espaces compactés)"""
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        return hashlib.sha256(normalized.encode("utf-8")).digest()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Récupère les embeddings en cache
+
+        Args:
+            model: Nom du modèle d'embedding
+            texts: Textes recherchés
+
+        Returns:
+            Un vecteur float32 par texte (en lecture seule, sur le blob
+            SQLite), None pour les textes absents du cache
+        """
+        hashes = [self.hash_text(text) for text in texts]
+        found: Dict[bytes, np.ndarray] = {}
+
+        with self._lock:
+            unique_hashes = list(set(hashes))
+            for start in range(0, len(unique_hashes), SQL_BATCH_SIZE):
+                batch = unique_hashes[start:start + SQL_BATCH_SIZE]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings "
+                    f"WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    [model, *batch]
+                ).fetchall()
+                for text_hash, blob in rows:
+                    found[text_hash] = np.frombuffer(blob, dtype=VECTOR_DTYPE)
+
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, text_hash) for text_hash in found]
+                )
+                self._conn.commit()
+
+            results = [found.get(text_hash) for text_hash in hashes]
+            hits = sum(1 for result in results if result is not None)
+            self.hits += hits
+            self.misses += len(results) - hits
+
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Ajoute des embeddings au cache
+
+        Args:
+            model: Nom du modèle d'embedding
+            texts: Textes embeddés
+            vectors: Embeddings correspondants (matrice ou liste de vecteurs)
+        """
+        now = time.time()
+        rows = [
+            (model, self.hash_text(text), np.asarray(vector, dtype=VECTOR_DTYPE).tobytes(), now)
+            for text, vector in zip(texts, vectors)
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            cursor = self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model, text_hash, vector, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._count += max(cursor.rowcount, 0)
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Supprime les entrées les moins récemment utilisées (10% de marge)"""
+        target = int(self.max_entries * 0.9)
+        to_delete = self._count - target
+        self._conn.execute(
+            """
+            DELETE FROM embeddings WHERE (model, text_hash) IN (
+                SELECT model, text_hash FROM embeddings ORDER BY last_access LIMIT ?
+            )
+            """,
+            (to_delete,)
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        logger.info(f"Evicted {to_delete} entries from embedding cache")
+
+    def clear(self) -> None:
+        """Vide le cache"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+            self._count = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Récupère les statistiques du cache
+
+        Returns:
+            Nombre d'entrées, hits, misses et taux de hit
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
@@ -1,47 +1,229 @@
-import openai
-from typing import List
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import numpy as np
 from app.core.config import settings
+from app.services.EmbeddingBackends import EmbeddingBackend, create_embedding_backend
+from app.services.EmbeddingCache import EmbeddingCache
+from app.utils.lazy import LazySingleton
+from app.utils.tokens import count_tokens
+from app.utils.vectors import VECTOR_DTYPE, as_matrix
 import logging
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingService:
-    def __init__(self):
-        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        self.model = settings.EMBEDDING_MODEL
+    def __init__(self, backend: Optional[EmbeddingBackend] = None):
+        # OpenAI API or local sentence-transformers model (EMBEDDING_BACKEND)
+        self.backend = backend or create_embedding_backend()
+        self.model = self.backend.model
+        self.max_batch_tokens = self.backend.max_batch_tokens
+        self.max_batch_inputs = self.backend.max_batch_inputs
+        self.max_concurrency = self.backend.max_concurrency
+        self._dimension: Optional[int] = None
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency,
+            thread_name_prefix="embedding"
+        )
+        self._async_semaphore: Optional[asyncio.Semaphore] = None
+        self.cache = EmbeddingCache(
+            path=settings.EMBEDDING_CACHE_PATH,
+            max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES
+        ) if settings.EMBEDDING_CACHE_ENABLED else None
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+    @property
+    def dimension(self) -> Optional[int]:
+        """Size of the vectors: declared by the backend, or learned from the first results"""
+        return self.backend.dimension or self._dimension
+
+    @dimension.setter
+    def dimension(self, value: Optional[int]) -> None:
+        self._dimension = value
+
+    def warm_up(self) -> None:
+        """Load the backend (local model) before the first request"""
+        self.backend.warm_up()
+
+    def _make_batches(self, texts: List[str]) -> List[List[int]]:
+        """
+        Split the non-empty texts into batches bounded by a token budget
+        and a maximum number of inputs
+
+        Args:
+            texts: Cleaned text strings
+
+        Returns:
+            Batches of indices into texts
+        """
+        batches = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            if not text:
+                continue
+            tokens = count_tokens(text, self.model)
+            if current and (
+                current_tokens + tokens > self.max_batch_tokens
+                or len(current) >= self.max_batch_inputs
+            ):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _embed_batch(self, batch: List[str]) -> np.ndarray:
+        """Embed one batch with the backend"""
+        return self.backend.embed(batch)
+
+    async def _embed_batch_async(self, batch: List[str]) -> np.ndarray:
+        """Async version of _embed_batch, bounded by the shared semaphore"""
+        async with self._async_semaphore:
+            return await self.backend.embed_async(batch)
+
+    def _assemble(
+        self,
+        texts: List[str],
+        batches: List[List[int]],
+        batch_results: List[np.ndarray]
+    ) -> np.ndarray:
+        """Put batch results back in input order; empty texts get a zero vector"""
+        if batch_results:
+            self.dimension = batch_results[0].shape[1]
+        embeddings = np.zeros((len(texts), self.dimension or 0), dtype=VECTOR_DTYPE)
+        for batch, vectors in zip(batches, batch_results):
+            embeddings[batch] = vectors
+        return embeddings
+
+    def _lookup_cache(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for texts (None when missing or for empty texts)"""
+        if self.cache is None:
+            return [None] * len(texts)
+        non_empty = [i for i, text in enumerate(texts) if text]
+        found = self.cache.get_many(self.model, [texts[i] for i in non_empty])
+        cached: List[Optional[np.ndarray]] = [None] * len(texts)
+        for i, vector in zip(non_empty, found):
+            cached[i] = vector
+        return cached
+
+    def _store_cache(self, texts: List[str], embeddings: np.ndarray) -> None:
+        """Store freshly computed vectors of non-empty texts"""
+        if self.cache is None:
+            return
+        rows = [i for i, text in enumerate(texts) if text]
+        if rows:
+            self.cache.put_many(self.model, [texts[i] for i in rows], embeddings[rows])
+
+    def _merge_cached(
+        self,
+        cached: List[Optional[np.ndarray]],
+        missing: List[int],
+        computed: np.ndarray
+    ) -> np.ndarray:
+        """Fill the cache misses with the computed vectors"""
+        if self.dimension is None:
+            self.dimension = computed.shape[1] if missing else next(
+                (len(v) for v in cached if v is not None), None
+            )
+        embeddings = np.zeros((len(cached), self.dimension or 0), dtype=VECTOR_DTYPE)
+        for i, vector in enumerate(cached):
+            if vector is not None:
+                embeddings[i] = vector
+        if missing:
+            embeddings[missing] = computed
+        return embeddings
+
+    def _compute_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Embed cleaned texts through the API, batched and in parallel"""
+        batches = self._make_batches(texts)
+
+        if len(batches) <= 1:
+            batch_results = [self._embed_batch([texts[i] for i in batch]) for batch in batches]
+        else:
+            batch_results = list(self._executor.map(
+                lambda batch: self._embed_batch([texts[i] for i in batch]),
+                batches
+            ))
+
+        return self._assemble(texts, batches, batch_results)
+
+    async def _compute_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        """Async version of _compute_embeddings"""
+        if self._async_semaphore is None:
+            self._async_semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        batches = self._make_batches(texts)
+        batch_results = await asyncio.gather(*(
+            self._embed_batch_async([texts[i] for i in batch])
+            for batch in batches
+        ))
+
+        return self._assemble(texts, batches, list(batch_results))
+
+    def get_embeddings(self, texts: List[str]) -> np.ndarray:
         """
         Get embeddings for a list of text strings
-        
+
+        Vectors already in the persistent cache are reused; the others are
+        split into token-bounded batches sent concurrently. The result always
+        has one vector per input, in the same order (empty strings are not
+        sent and get a zero vector)
+
         Args:
             texts: List of text strings to embed
-            
+
         Returns:
-            List of embedding vectors (each vector is a list of floats)
+            Contiguous float32 matrix, one row per text
         """
         try:
-            # Clean empty strings
-            texts = [text.strip() for text in texts if text.strip()]
-            
-            if not texts:
-                return []
-                
-            response = self.client.embeddings.create(
-                model=self.model,
-                input=texts,
-                encoding_format="float"
-            )
-            
-            # Return embeddings in order
-            return [data.embedding for data in response.data]
-            
+            texts = [text.strip() for text in texts]
+            cached = self._lookup_cache(texts)
+            missing = [i for i, text in enumerate(texts) if text and cached[i] is None]
+
+            computed = self._compute_embeddings([texts[i] for i in missing]) if missing else as_matrix([])
+            self._store_cache([texts[i] for i in missing], computed)
+
+            return self._merge_cached(cached, missing, computed)
+
+        except Exception as e:
+            logger.error(f"Error getting embeddings: {str(e)}")
+            raise
+
+    async def get_embeddings_async(self, texts: List[str]) -> np.ndarray:
+        """
+        Async version of get_embeddings, backed by AsyncOpenAI
+
+        Args:
+            texts: List of text strings to embed
+
+        Returns:
+            Contiguous float32 matrix, one row per text
+        """
+        try:
+            texts = [text.strip() for text in texts]
+            cached = await asyncio.to_thread(self._lookup_cache, texts)
+            missing = [i for i, text in enumerate(texts) if text and cached[i] is None]
+
+            computed = await self._compute_embeddings_async([texts[i] for i in missing]) if missing else as_matrix([])
+            await asyncio.to_thread(self._store_cache, [texts[i] for i in missing], computed)
+
+            return self._merge_cached(cached, missing, computed)
+
         except Exception as e:
             logger.error(f"Error getting embeddings: {str(e)}")
             raise
 
-# Singleton instance
-embedding_service = EmbeddingService()
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the persistent embedding cache"""
+        return self.cache.get_stats() if self.cache is not None else {"enabled": False}
+
+# Singleton instance, created on first use (opens the cache and the API clients)
+embedding_service = LazySingleton(EmbeddingService)
 
 def get_embedding_service() -> EmbeddingService:
-    return embedding_service
+    return embedding_service.get()
@@ -0,0 +1,256 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.models.document import Document
+from app.services.EmbeddingService import get_embedding_service
+from app.services.RagService import get_rag_service
+from app.utils.cache import TTLCache
+from app.utils.file_parser import parse_file_batches
+
+logger = logging.getLogger(__name__)
+
+# Durée de conservation du statut des jobs terminés (secondes)
+JOB_HISTORY_TTL = 24 * 3600
+
+@dataclass
+class IngestionJob:
+    """Job d'indexation d'un fichier uploadé"""
+    document_id: int
+    vector_id: str
+    user_id: int
+    filename: str
+    content_type: str
+    file_path: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued, processing, indexed, error, cancelled
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+
+class IngestionService:
+    """
+    File d'attente d'indexation en mémoire : les uploads sont traités en
+    arrière-plan (analyse dans un pool de processus, embeddings et
+    indexation asynchrones ; les PDF sont répartis par plages de pages
+    entre les processus et indexés au fil des pages) et le statut du
+    Document est mis à jour
+    """
+
+    def __init__(
+        self,
+        workers: int = settings.INGESTION_WORKERS,
+        parser_processes: Optional[int] = settings.PARSER_PROCESSES
+    ):
+        self.workers = workers
+        self.parser_processes = parser_processes
+        self.jobs = TTLCache(maxsize=10000, ttl=JOB_HISTORY_TTL)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    async def start(self) -> None:
+        """Démarre le pool de processus et les workers"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        # "spawn" : les workers ne doivent pas hériter des threads et clients de l'API
+        self._process_pool = ProcessPoolExecutor(
+            max_workers=self.parser_processes,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"ingestion-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info(f"Ingestion service started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """Arrête les workers et le pool de processus"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        logger.info("Ingestion service stopped")
+
+    async def submit(
+        self,
+        document_id: int,
+        vector_id: str,
+        user_id: int,
+        filename: str,
+        content_type: str,
+        file_path: str
+    ) -> IngestionJob:
+        """
+        Ajoute un fichier à la file d'indexation
+
+        Args:
+            document_id: ID de la ligne Document (statut "processing")
+            vector_id: ID du document dans le stockage vectoriel
+            user_id: Propriétaire du document
+            filename: Nom du fichier
+            content_type: Type MIME du fichier
+            file_path: Fichier temporaire uploadé, supprimé à la fin du job
+
+        Returns:
+            Le job créé
+        """
+        if self._queue is None:
+            raise RuntimeError("Ingestion service is not started")
+
+        job = IngestionJob(
+            document_id=document_id,
+            vector_id=vector_id,
+            user_id=user_id,
+            filename=filename,
+            content_type=content_type,
+            file_path=file_path
+        )
+        self.jobs.set(job.id, job)
+        await self._queue.put(job)
+        return job
+
+    def get_job(self, job_id: str) -> Optional[IngestionJob]:
+        """Retourne un job par son ID (None s'il est inconnu ou expiré)"""
+        return self.jobs.get(job_id)
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._process(job)
+            finally:
+                self._queue.task_done()
+
+    async def _process(self, job: IngestionJob) -> None:
+        """
+        Analyse, embedde et indexe le fichier d'un job
+
+        Les lots produits par parse_file_batches (plages de pages pour les PDF)
+        sont embeddés et indexés au fur et à mesure, sans attendre la fin de
+        l'analyse du document. Si le Document est supprimé pendant le job,
+        l'indexation s'arrête et les lots déjà indexés sont retirés
+        """
+        if not await asyncio.to_thread(self._document_exists, job.document_id):
+            self._update_job(job, "cancelled")
+            await self._discard_file(job)
+            return
+        self._update_job(job, "processing")
+        batches = parse_file_batches(
+            self._process_pool,
+            job.content_type,
+            job.file_path,
+            pages_per_task=settings.PDF_PAGES_PER_TASK,
+            max_pending=self.parser_processes
+        )
+        try:
+            # Création éventuelle du service (ouverture de ChromaDB) hors de la boucle d'événements
+            rag_service = await asyncio.to_thread(get_rag_service)
+            chunk_count = 0
+            while True:
+                parsed_document = await asyncio.to_thread(next, batches, None)
+                if parsed_document is None:
+                    break
+
+                # Les chunks du parseur sont la seule liste : ceux-là sont embeddés et stockés
+                chunks = [chunk["text"] for chunk in parsed_document.get("chunks", [])]
+                if not chunks:
+                    continue
+                if not await asyncio.to_thread(self._document_exists, job.document_id):
+                    await self._cancel(job, rag_service)
+                    return
+                embeddings = await get_embedding_service().get_embeddings_async(chunks)
+
+                await asyncio.to_thread(
+                    rag_service.process_document,
+                    parsed_document,
+                    embeddings,
+                    job.vector_id,
+                    chunk_count,
+                    user_id=job.user_id
+                )
+                chunk_count += len(chunks)
+
+            # Une suppression pendant le dernier lot a pu précéder son indexation
+            if not await asyncio.to_thread(self._document_exists, job.document_id):
+                await self._cancel(job, rag_service)
+                return
+            await asyncio.to_thread(self._set_document_status, job.document_id, "indexed")
+            self._update_job(job, "indexed")
+            logger.info(f"Document {job.filename} indexed ({job.vector_id}, {chunk_count} chunks)")
+
+        except Exception as e:
+            logger.error(f"Ingestion of {job.filename} failed: {str(e)}", exc_info=True)
+            self._update_job(job, "error", str(e))
+            try:
+                # Retirer les lots déjà indexés
+                await asyncio.to_thread(
+                    get_rag_service().remove_document, job.vector_id, user_id=job.user_id
+                )
+                await asyncio.to_thread(self._set_document_status, job.document_id, "error")
+            except Exception as cleanup_exc:
+                logger.error(f"Could not clean up document {job.document_id}: {str(cleanup_exc)}")
+
+        finally:
+            try:
+                batches.close()
+            except ValueError:
+                pass  # Job annulé pendant l'analyse d'un lot
+            await self._discard_file(job)
+
+    async def _cancel(self, job: IngestionJob, rag_service) -> None:
+        """Abandonne un job dont le Document a été supprimé"""
+        logger.info(f"Document {job.document_id} deleted during ingestion, job {job.id} cancelled")
+        self._update_job(job, "cancelled")
+        try:
+            await asyncio.to_thread(rag_service.remove_document, job.vector_id, user_id=job.user_id)
+        except Exception as e:
+            logger.error(f"Could not clean up document {job.document_id}: {str(e)}")
+
+    @staticmethod
+    async def _discard_file(job: IngestionJob) -> None:
+        # Le fichier temporaire n'est plus utile une fois le job terminé
+        try:
+            await asyncio.to_thread(os.remove, job.file_path)
+        except OSError:
+            pass
+
+    @staticmethod
+    def _update_job(job: IngestionJob, status: str, error: Optional[str] = None) -> None:
+        job.status = status
+        job.error = error
+        job.updated_at = datetime.now(timezone.utc)
+
+    @staticmethod
+    def _document_exists(document_id: int) -> bool:
+        with SessionLocal() as db:
+            return db.get(Document, document_id) is not None
+
+    @staticmethod
+    def _set_document_status(document_id: int, status: str) -> None:
+        """Met à jour le statut d'un Document (processing, indexed, error)"""
+        with SessionLocal() as db:
+            document = db.get(Document, document_id)
+            if document is None:
+                return
+            document.status = status
+            document.updated_at = datetime.now(timezone.utc)
+            db.commit()
+
+# Singleton instance
+ingestion_service = IngestionService()
+
+def get_ingestion_service() -> IngestionService:
+    return ingestion_service
@@ -1,6 +1,7 @@
 import openai
-from typing import  Optional
+from typing import AsyncIterator, Dict, List, Optional
 from app.core.config import settings
+from app.utils.lazy import LazySingleton
 import logging
 
 logger = logging.getLogger(__name__)
@@ -8,10 +9,30 @@ logger = logging.getLogger(__name__)
 class LLMService:
     def __init__(self):
         self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
+        self.async_client = openai.AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
         self.model = settings.OPENAI_MODEL
         self.temperature = settings.LLM_TEMPERATURE
         self.max_tokens = settings.LLM_MAX_TOKENS
 
+    def _build_messages(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        system_message: Optional[str] = None
+    ) -> List[Dict[str, str]]:
+        """Build the chat completion messages for a prompt and its context"""
+        messages = []
+        
+        if system_message:
+            messages.append({"role": "system", "content": system_message})
+        
+        if context:
+            messages.append({"role": "user", "content": f"Context: {context}\n\nQuestion: {prompt}"})
+        else:
+            messages.append({"role": "user", "content": prompt})
+
+        return messages
+
     def generate_response(
         self,
         prompt: str,
@@ -29,15 +50,7 @@ class LLMService:
         Returns:
             Generated text response
         """
-        messages = []
-        
-        if system_message:
-            messages.append({"role": "system", "content": system_message})
-        
-        if context:
-            messages.append({"role": "user", "content": f"Context: {context}\n\nQuestion: {prompt}"})
-        else:
-            messages.append({"role": "user", "content": prompt})
+        messages = self._build_messages(prompt, context, system_message)
 
         try:
             response = self.client.chat.completions.create(
@@ -51,14 +64,77 @@ class LLMService:
             logger.error(f"Error generating response: {str(e)}")
             raise
 
-    async def generate_response_async(self, prompt: str, context: Optional[str] = None) -> str:
-        """Async version of generate_response"""
-        # Implementation similar to generate_response but using await
-        # Requires openai>=1.0.0 with async support
-        pass
+    async def generate_response_async(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        system_message: Optional[str] = None
+    ) -> str:
+        """
+        Async version of generate_response, backed by AsyncOpenAI so the
+        event loop stays free while the completion is generated
+        
+        Args:
+            prompt: User input/question
+            context: Additional context for the model
+            system_message: System instructions
+            
+        Returns:
+            Generated text response
+        """
+        messages = self._build_messages(prompt, context, system_message)
+
+        try:
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens
+            )
+            return response.choices[0].message.content
+        except Exception as e:
+            logger.error(f"Error generating response: {str(e)}")
+            raise
+
+    async def stream_response_async(
+        self,
+        prompt: str,
+        context: Optional[str] = None,
+        system_message: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a response from OpenAI's API token by token
+        
+        Args:
+            prompt: User input/question
+            context: Additional context for the model
+            system_message: System instructions
+            
+        Yields:
+            Text deltas as they are produced by the model
+        """
+        messages = self._build_messages(prompt, context, system_message)
+
+        try:
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+                stream=True
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    yield delta
+        except Exception as e:
+            logger.error(f"Error streaming response: {str(e)}")
+            raise
 
-# Singleton instance
-llm_service = LLMService()
+# Singleton instance, created on first use
+llm_service = LazySingleton(LLMService)
 
 def get_llm_service() -> LLMService:
-    return llm_service
\ No newline at end of file
+    return llm_service.get()
\ No newline at end of file
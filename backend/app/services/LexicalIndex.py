@@ -0,0 +1,223 @@
+import json
+import logging
+import re
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Nombre maximal de paramètres par requête SQL (limite SQLite)
+SQL_BATCH_SIZE = 500
+
+# Nombre maximal de termes retenus dans une requête
+MAX_QUERY_TERMS = 32
+
+# Termes de la requête : lettres/chiffres, avec les mêmes séparateurs internes que le tokenizer ("-", "_")
+TERM_RE = re.compile(r"\w[\w\-]*", re.UNICODE)
+
+class LexicalIndex:
+    """
+    Index lexical (BM25) des chunks, stocké dans une table SQLite FTS5
+
+    Le tokenizer unicode61 ignore les accents et garde "-" et "_" dans les
+    termes, pour retrouver les identifiants et codes tels qu'ils sont écrits.
+    Les chunks sont rangés par collection et par document pour suivre le
+    stockage vectoriel (ajouts et suppressions incrémentaux).
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        """
+        Args:
+            path: Fichier SQLite de l'index (":memory:" pour un index non persistant)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE doit déclencher le trigger de suppression de l'index plein texte
+        self._conn.execute("PRAGMA recursive_triggers=ON")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL,
+                collection TEXT NOT NULL,
+                document_id TEXT NOT NULL,
+                text TEXT NOT NULL,
+                UNIQUE (collection, chunk_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_document ON chunks (collection, document_id);
+
+            CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
+                text,
+                content='chunks',
+                content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2 tokenchars '-_'"
+            );
+
+            -- Synchronisation de l'index plein texte avec la table des chunks
+            CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
+                INSERT INTO chunks_fts (rowid, text) VALUES (new.id, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
+                INSERT INTO chunks_fts (chunks_fts, rowid, text) VALUES ('delete', old.id, old.text);
+            END;
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def build_query(text: str) -> Optional[str]:
+        """
+        Requête FTS5 : union (OR) des termes du texte, chacun entre guillemets
+        pour ne pas être interprété comme un opérateur
+
+        Returns:
+            Requête MATCH, ou None si le texte ne contient aucun terme
+        """
+        terms = list(dict.fromkeys(term.lower() for term in TERM_RE.findall(text)))
+        if not terms:
+            return None
+        return " OR ".join(f'"{term}"' for term in terms[:MAX_QUERY_TERMS])
+
+    def add_chunks(
+        self,
+        collection: str,
+        document_id: str,
+        chunk_ids: List[str],
+        texts: List[str]
+    ) -> None:
+        """
+        Indexe des chunks (un chunk déjà indexé est remplacé)
+
+        Args:
+            collection: Collection du stockage vectoriel
+            document_id: Document parent des chunks
+            chunk_ids: IDs des chunks
+            texts: Textes des chunks
+        """
+        rows = [
+            (chunk_id, collection, document_id, text)
+            for chunk_id, text in zip(chunk_ids, texts)
+        ]
+        if not rows:
+            return
+
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (chunk_id, collection, document_id, text) "
+                "VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def delete_document(self, collection: str, document_id: str) -> int:
+        """
+        Retire tous les chunks d'un document
+
+        Returns:
+            Nombre de chunks retirés
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM chunks WHERE collection = ? AND document_id = ?",
+                (collection, document_id)
+            )
+            self._conn.commit()
+            return max(cursor.rowcount, 0)
+
+    def delete_chunks(self, collection: str, chunk_ids: List[str]) -> int:
+        """
+        Retire des chunks d'une collection par leur ID
+
+        Returns:
+            Nombre de chunks retirés
+        """
+        deleted = 0
+        with self._lock:
+            for start in range(0, len(chunk_ids), SQL_BATCH_SIZE):
+                batch = chunk_ids[start:start + SQL_BATCH_SIZE]
+                cursor = self._conn.execute(
+                    f"DELETE FROM chunks WHERE collection = ? AND chunk_id IN ({','.join('?' * len(batch))})",
+                    [collection, *batch]
+                )
+                deleted += max(cursor.rowcount, 0)
+            self._conn.commit()
+        return deleted
+
+    def clear_collection(self, collection: str) -> None:
+        """Retire tous les chunks d'une collection"""
+        with self._lock:
+            self._conn.execute("DELETE FROM chunks WHERE collection = ?", (collection,))
+            self._conn.commit()
+
+    def count(self, collection: str) -> int:
+        """Nombre de chunks indexés dans une collection"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM chunks WHERE collection = ?", (collection,)
+            ).fetchone()[0]
+
+    def search(
+        self,
+        collection: str,
+        query: str,
+        k: int = 5,
+        document_ids: Optional[List[str]] = None,
+        chunk_ids: Optional[List[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Recherche BM25 dans une collection
+
+        Args:
+            collection: Collection du stockage vectoriel
+            query: Texte de la requête
+            k: Nombre de résultats
+            document_ids: Documents auxquels limiter la recherche
+            chunk_ids: Chunks retenus en plus de ceux de document_ids
+
+        Returns:
+            (ID du chunk, score BM25) du plus au moins pertinent ; SQLite
+            renvoie des scores négatifs, ils sont inversés pour que les
+            meilleurs soient les plus grands
+        """
+        match = self.build_query(query)
+        if match is None:
+            return []
+
+        sql = (
+            "SELECT chunks.chunk_id, bm25(chunks_fts) AS score FROM chunks_fts "
+            "JOIN chunks ON chunks.id = chunks_fts.rowid "
+            "WHERE chunks_fts MATCH ? AND chunks.collection = ?"
+        )
+        params: List[Any] = [match, collection]
+        if document_ids:
+            # Listes JSON : un seul paramètre, quel que soit le nombre de documents ou de chunks
+            condition = "chunks.document_id IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps(list(document_ids)))
+            if chunk_ids:
+                condition += " OR chunks.chunk_id IN (SELECT value FROM json_each(?))"
+                params.append(json.dumps(list(chunk_ids)))
+            sql += f" AND ({condition})"
+        sql += " ORDER BY score LIMIT ?"
+        params.append(k)
+
+        try:
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.error(f"Lexical search failed: {str(e)}")
+            return []
+
+        return [(chunk_id, -score) for chunk_id, score in rows]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Nombre de chunks indexés par collection"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT collection, COUNT(*) FROM chunks GROUP BY collection"
+            ).fetchall()
+        return {"path": self.path, "collections": dict(rows)}
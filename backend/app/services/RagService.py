@@ -1,31 +1,74 @@
+import asyncio
 import logging
 from typing import Any, Dict, List, Optional
-from app.services.VectorStore import ChromaVectorStoreService
+import numpy as np
+from app.core.config import settings
+from app.services.VectorStore import ChromaVectorStoreService, chunk_content_hash
+from app.services.EmbeddingCache import EmbeddingCache
 from app.services.EmbeddingService import get_embedding_service
+from app.services.RerankService import get_rerank_service
+from app.utils.cache import TTLCache
+from app.utils.lazy import LazySingleton
+from app.utils.vectors import as_matrix
 
 logger = logging.getLogger(__name__)
 
+def is_blank_chunk(chunk: Any) -> bool:
+    """Chunk sans texte (ou seulement des espaces) : son embedding serait un vecteur nul"""
+    text = chunk.get("text", "") if isinstance(chunk, dict) else chunk
+    return not str(text or "").strip()
+
+def drop_blank_chunks(chunks: List[Any], embeddings: np.ndarray) -> tuple:
+    """Retire les chunks vides et leurs lignes d'embeddings (chunks, embeddings)"""
+    kept = [i for i, chunk in enumerate(chunks) if not is_blank_chunk(chunk)]
+    if len(kept) == len(chunks):
+        return chunks, embeddings
+    logger.info(f"Dropping {len(chunks) - len(kept)} blank chunks")
+    return [chunks[i] for i in kept], as_matrix(embeddings)[kept]
+
 class RAGService:
     def __init__(
         self,
         vector_store: Optional[ChromaVectorStoreService] = None,
-        embedding_dimension: int = 768,
+        embedding_dimension: Optional[int] = None,
         persist_directory: str = "./chroma_rag_db"
     ):
+        self.embedding_service = get_embedding_service()
+        # La dimension de la collection est celle du backend d'embedding configuré
+        self.embedding_dimension = embedding_dimension or self.embedding_service.dimension
         self.vector_store = vector_store or ChromaVectorStoreService(
             persist_directory=persist_directory,
-            embedding_dimension=embedding_dimension
+            embedding_dimension=self.embedding_dimension,
+            routing=settings.VECTOR_COLLECTION_ROUTING,
+            max_open_collections=settings.VECTOR_MAX_OPEN_COLLECTIONS,
+            deduplicate=settings.CHUNK_DEDUP_ENABLED
         )
-        self.embedding_service = get_embedding_service()
-        self.embedding_dimension = embedding_dimension
         self.processed_documents = 0
         self.processed_chunks = 0
+        self.hybrid_search = settings.HYBRID_SEARCH_ENABLED
+        self.hybrid_candidates = settings.HYBRID_CANDIDATES
+        self.rrf_k = settings.RRF_K
+        self.min_similarity = settings.RETRIEVAL_MIN_SIMILARITY
+        self.rerank_service = get_rerank_service() if settings.RERANK_ENABLED else None
+        self.rerank_candidates = settings.RERANK_CANDIDATES
+
+        # Caches des requêtes répétées : embedding de la requête et résultats de recherche
+        self.query_embedding_cache = TTLCache(
+            maxsize=settings.QUERY_CACHE_MAX_ENTRIES,
+            ttl=settings.QUERY_CACHE_TTL
+        )
+        self.retrieval_cache = TTLCache(
+            maxsize=settings.QUERY_CACHE_MAX_ENTRIES,
+            ttl=settings.QUERY_CACHE_TTL
+        )
 
     def process_document(
         self,
         parsed_document: Dict[str, Any],
-        embeddings: List[List[float]],
-        document_id: Optional[str] = None
+        embeddings: np.ndarray,
+        document_id: Optional[str] = None,
+        start_index: int = 0,
+        user_id: Optional[int] = None
       ) -> str:
         """
         Traite un document pour l'indexation RAG
@@ -34,6 +77,8 @@ class RAGService:
           parsed_document: Document analysé (depuis les fonctions d'extraction)
           embeddings: Embeddings des chunks du document
           document_id: ID optionnel du document
+          start_index: Index du premier chunk, quand le document est indexé par lots
+          user_id: Propriétaire du document (détermine sa collection)
             
         Returns:
           ID du document indexé
@@ -49,6 +94,7 @@ class RAGService:
         # Vérifier que nous avons le bon nombre d'embeddings
         if len(chunks) != len(embeddings):
           raise ValueError(f"Number of chunks ({len(chunks)}) must match number of embeddings ({len(embeddings)})")
+        chunks, embeddings = drop_blank_chunks(chunks, embeddings)
         
         # Extraire les métadonnées du document
         metadata = parsed_document.get("metadata", {})
@@ -59,25 +105,82 @@ class RAGService:
           chunks=chunks,
           embeddings=embeddings,
           document_id=document_id,
-          document_metadata=metadata
+          document_metadata=metadata,
+          start_index=start_index,
+          collection_name=self.vector_store.collection_for(user_id)
         )
         
         # Mettre à jour les statistiques
-        self.processed_documents += 1
+        if start_index == 0:
+          self.processed_documents += 1
         self.processed_chunks += len(chunks)
         
         # Retourner l'ID du document (extrait du premier chunk ID)
-        if chunk_ids:
-          doc_id = chunk_ids[0].split("_chunk_")[0]
-          return doc_id
+        doc_id = chunk_ids[0].split("_chunk_")[0] if chunk_ids else document_id
+        self.invalidate_documents([doc_id])
         
-        return document_id or "unknown_doc"
+        return doc_id or "unknown_doc"
+
+    def process_documents(
+        self,
+        parsed_documents: List[Dict[str, Any]],
+        document_ids: List[str],
+        embeddings: np.ndarray,
+        user_id: Optional[int] = None
+      ) -> int:
+        """
+        Indexe plusieurs documents en un lot (indexation en masse)
+
+        Args:
+          parsed_documents: Documents analysés (depuis les fonctions d'extraction)
+          document_ids: ID de chaque document dans le stockage vectoriel
+          embeddings: Embeddings des chunks de tous les documents, dans l'ordre
+          user_id: Propriétaire des documents (détermine leur collection)
+
+        Returns:
+          Nombre de chunks indexés
+        """
+        documents = []
+        kept_rows = []  # Lignes de embeddings des chunks non vides
+        row = 0
+        for parsed_document, document_id in zip(parsed_documents, document_ids):
+          metadata = dict(parsed_document.get("metadata") or {})
+          metadata["file_type"] = parsed_document.get("file_type", "unknown")
+          chunks = []
+          for chunk in parsed_document.get("chunks", []):
+            if not is_blank_chunk(chunk):
+              chunks.append(chunk)
+              kept_rows.append(row)
+            row += 1
+          documents.append({
+            "document_id": document_id,
+            "chunks": chunks,
+            "metadata": metadata
+          })
+        if row != len(embeddings):
+          raise ValueError(f"Number of chunks ({row}) must match number of embeddings ({len(embeddings)})")
+        if len(kept_rows) < row:
+          embeddings = as_matrix(embeddings)[kept_rows]
+
+        chunk_count = self.vector_store.add_documents_bulk(
+          documents,
+          embeddings,
+          collection_name=self.vector_store.collection_for(user_id)
+        )
+
+        # Mettre à jour les statistiques
+        self.processed_documents += len(documents)
+        self.processed_chunks += chunk_count
+        self.invalidate_documents(document_ids)
+
+        return chunk_count
       
     def query(
       self,
-      query_embedding: List[float],
+      query_embedding: np.ndarray,
       k: int = 5,
-      filters: Optional[Dict[str, Any]] = None
+      filters: Optional[Dict[str, Any]] = None,
+      user_id: Optional[int] = None
     ) -> List[Dict[str, Any]]:
       """
       Interroge le système RAG
@@ -86,16 +189,21 @@ class RAGService:
         query_embedding: Embedding de la requête
         k: Nombre de résultats à retourner
         filters: Filtres à appliquer à la recherche
+        user_id: Utilisateur dont la collection est interrogée
           
       Returns:
         Contextes pertinents pour la requête
       """
       # Effectuer la recherche
+      collection_name = self.vector_store.collection_for(user_id)
       results = self.vector_store.search(
         query_embedding=query_embedding,
         k=k,
-        filter_criteria=filters
+        filter_criteria=filters,
+        collection_name=collection_name
       )
+      # Contenus partagés : rattacher chaque résultat aux documents qui le contiennent
+      results = self.vector_store.resolve_references(results, collection_name)
       
       # Enrichir les résultats avec des informations utiles pour le RAG
       for result in results:
@@ -118,40 +226,59 @@ class RAGService:
       return {
         "processed_documents": self.processed_documents,
         "processed_chunks": self.processed_chunks,
-        "vector_store": vector_store_stats
+        "vector_store": vector_store_stats,
+        "embedding_cache": self.embedding_service.get_cache_stats(),
+        "query_embedding_cache": self.query_embedding_cache.get_stats(),
+        "retrieval_cache": self.retrieval_cache.get_stats(),
+        "reranker": self.rerank_service.get_stats() if self.rerank_service else {"enabled": False}
       }
     
-    def remove_document(self, document_id: str) -> bool:
+    def remove_document(self, document_id: str, user_id: Optional[int] = None) -> bool:
       """
       Supprime un document du système RAG
       
       Args:
         document_id: ID du document à supprimer
+        user_id: Propriétaire du document (détermine sa collection)
           
       Returns:
         Succès de l'opération
       """
-      return self.vector_store.delete_document(document_id)
+      deleted = self.vector_store.delete_document(
+        document_id, self.vector_store.collection_for(user_id)
+      )
+      self.invalidate_documents([document_id])
+      return deleted
     
     def update_document(
       self,
       document_id: str,
       parsed_document: Dict[str, Any],
-      embeddings: List[List[float]]
+      embeddings: Optional[np.ndarray] = None,
+      user_id: Optional[int] = None
     ) -> str:
       """
       Met à jour un document existant
       
+      Seuls les chunks modifiés sont réécrits (voir
+      ChromaVectorStoreService.update_document) ; sans embeddings fournis,
+      seuls les contenus nouveaux sont embeddés
+      
       Args:
         document_id: ID du document à mettre à jour
         parsed_document: Nouveau document analysé
-        embeddings: Nouveaux embeddings
+        embeddings: Nouveaux embeddings de tous les chunks (calculés à la demande si None)
+        user_id: Propriétaire du document (détermine sa collection)
           
       Returns:
         ID du document mis à jour
       """
-      # Extraire les chunks et métadonnées
+      # Extraire les chunks (non vides) et métadonnées
       chunks = parsed_document.get("chunks", [])
+      if embeddings is not None and len(embeddings) == len(chunks):
+        chunks, embeddings = drop_blank_chunks(chunks, embeddings)
+      else:
+        chunks = [chunk for chunk in chunks if not is_blank_chunk(chunk)]
       metadata = parsed_document.get("metadata", {})
       metadata["file_type"] = parsed_document.get("file_type", "unknown")
       
@@ -160,8 +287,11 @@ class RAGService:
         document_id=document_id,
         chunks=chunks,
         embeddings=embeddings,
-        document_metadata=metadata
+        document_metadata=metadata,
+        collection_name=self.vector_store.collection_for(user_id),
+        embed_texts=self.embedding_service.get_embeddings
       )
+      self.invalidate_documents([document_id])
       
       return document_id
     
@@ -174,35 +304,283 @@ class RAGService:
       """
       return self.vector_store.persist()
 
+    def invalidate_documents(self, document_ids: List[Optional[str]]) -> int:
+      """
+      Invalide les résultats de recherche en cache concernés par des documents
+      modifiés : recherches sans filtre et recherches filtrant sur ces documents
+      
+      Args:
+        document_ids: IDs des documents ajoutés, mis à jour ou supprimés
+          
+      Returns:
+        Nombre d'entrées invalidées
+      """
+      changed = set(document_ids)
+      return self.retrieval_cache.pop_where(
+        lambda key: key[1] is None or not changed.isdisjoint(key[1])
+      )
+
+    def _retrieval_key(
+        self,
+        query_hash: bytes,
+        document_ids: Optional[List[str]],
+        num_chunks: int,
+        similarity_threshold: float,
+        collection_name: str
+    ) -> tuple:
+        """Clé du cache de recherche : (hash de la requête, filtre, k, seuil, collection)"""
+        document_filter = tuple(sorted(document_ids)) if document_ids else None
+        return (query_hash, document_filter, num_chunks, similarity_threshold, collection_name)
+
+    def _reciprocal_rank_fusion(
+        self,
+        result_lists: List[List[Dict[str, Any]]],
+        num_chunks: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Fusionne des listes de chunks classées (reciprocal-rank fusion) :
+        chaque chunk reçoit la somme des 1 / (rrf_k + rang) de ses listes
+        """
+        scores: Dict[str, float] = {}
+        chunks: Dict[str, Dict[str, Any]] = {}
+        for results in result_lists:
+            for rank, chunk in enumerate(results, 1):
+                scores[chunk["id"]] = scores.get(chunk["id"], 0.0) + 1.0 / (self.rrf_k + rank)
+                # Conserver la distance et le score BM25 quand le chunk est dans les deux listes
+                chunks.setdefault(chunk["id"], {}).update(chunk)
+
+        ranked = sorted(scores, key=scores.get, reverse=True)[:num_chunks]
+        return [{**chunks[chunk_id], "rrf_score": scores[chunk_id]} for chunk_id in ranked]
+
+    def _search_relevant_chunks(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        document_ids: Optional[List[str]],
+        num_chunks: int,
+        similarity_threshold: float,
+        collection_name: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Recherche les chunks pertinents : recherche vectorielle limitée aux
+        chunks dont la similarité normalisée atteint le seuil, fusionnée avec la recherche BM25 si la recherche
+        hybride est activée, puis reclassée par le cross-encoder s'il est activé
+        """
+        filter_criteria = self.vector_store.document_filter(document_ids, collection_name)
+        pool_size, candidates = self._candidate_counts(num_chunks)
+        # k adaptatif : num_chunks d'abord, davantage seulement si tous dépassent le seuil
+        dense_chunks = self.vector_store.search_adaptive(
+            query_embedding=query_embedding,
+            min_score=similarity_threshold,
+            k=num_chunks,
+            max_k=candidates,
+            filter_criteria=filter_criteria,
+            collection_name=collection_name
+        )
+        return self._fuse_and_rerank(
+            query, dense_chunks, document_ids, num_chunks, pool_size, candidates, collection_name
+        )
+
+    def _candidate_counts(self, num_chunks: int) -> tuple:
+        """
+        (pool_size, candidates) : nombre de chunks avant reclassement
+        (sur-échantillonnage si le reranker est activé) et nombre de
+        candidats demandés à chaque recherche
+        """
+        pool_size = max(num_chunks, self.rerank_candidates) if self.rerank_service else num_chunks
+        candidates = max(pool_size, self.hybrid_candidates) if self.hybrid_search else pool_size
+        return pool_size, candidates
+
+    def _fuse_and_rerank(
+        self,
+        query: str,
+        dense_chunks: List[Dict[str, Any]],
+        document_ids: Optional[List[str]],
+        num_chunks: int,
+        pool_size: int,
+        candidates: int,
+        collection_name: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Fusion avec la recherche BM25 (recherche hybride) puis reclassement,
+        un seul résultat par contenu
+        """
+        dense_chunks = self._collapse_duplicates(dense_chunks)
+        if self.hybrid_search:
+            lexical_chunks = self._collapse_duplicates(self.vector_store.lexical_search(
+                query, k=candidates, document_ids=document_ids, collection_name=collection_name
+            ))
+            chunks = self._reciprocal_rank_fusion([dense_chunks, lexical_chunks], pool_size)
+        else:
+            chunks = dense_chunks
+
+        if self.rerank_service is not None and len(chunks) > 1:
+            try:
+                chunks = self.rerank_service.rerank(query, chunks, num_chunks)
+            except Exception as e:
+                logger.error(f"Reranking failed, keeping retrieval order: {str(e)}")
+        # Contenus partagés : rattacher chaque résultat aux documents qui le contiennent
+        return self.vector_store.resolve_references(chunks[:num_chunks], collection_name, document_ids)
+
+    @staticmethod
+    def _collapse_duplicates(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Garde le premier (mieux classé) des chunks de même contenu, par exemple
+        des chunks indexés avant la déduplication ou avec CHUNK_DEDUP_ENABLED=false
+        """
+        seen = set()
+        collapsed = []
+        for chunk in chunks:
+            content_hash = (chunk.get("metadata") or {}).get("content_hash") or chunk_content_hash(chunk.get("text") or "")
+            if content_hash in seen:
+                continue
+            seen.add(content_hash)
+            collapsed.append(chunk)
+        return collapsed
+
+    def search_many(
+        self,
+        queries: List[str],
+        document_ids: Optional[List[str]] = None,
+        num_chunks: int = 3,
+        similarity_threshold: Optional[float] = None,
+        user_id: Optional[int] = None
+    ) -> List[List[Dict[str, Any]]]:
+        """
+        Récupère le contexte pertinent de plusieurs requêtes en un lot
+        (expansion de requêtes, évaluations, questions-réponses hors ligne)
+
+        Les embeddings des requêtes sont calculés en lots et la recherche
+        vectorielle est faite en un seul appel à ChromaDB ; la recherche BM25
+        et le reclassement restent par requête. Les caches de requêtes ne sont
+        pas utilisés, pour ne pas évincer ceux des conversations.
+
+        Returns:
+            Pour chaque requête, dans l'ordre, les chunks retenus (comme get_relevant_context)
+        """
+        if not queries:
+            return []
+        if similarity_threshold is None:
+            similarity_threshold = self.min_similarity
+        # Recherche limitée à la collection de l'utilisateur
+        collection_name = self.vector_store.collection_for(user_id)
+        try:
+            # 1. Générer les embeddings des requêtes
+            query_embeddings = self.embedding_service.get_embeddings(queries)
+
+            # 2. Recherche vectorielle de toutes les requêtes, filtrée par seuil de similarité
+            filter_criteria = self.vector_store.document_filter(document_ids, collection_name)
+            pool_size, candidates = self._candidate_counts(num_chunks)
+            dense_results = self.vector_store.search_many(
+                query_embeddings,
+                k=candidates,
+                filter_criteria=filter_criteria,
+                collection_name=collection_name
+            )
+
+            # 3. Fusion BM25 et reclassement, requête par requête
+            return [
+                self._fuse_and_rerank(
+                    query,
+                    [chunk for chunk in dense_chunks if chunk.get("score", 0.0) >= similarity_threshold],
+                    document_ids, num_chunks, pool_size, candidates, collection_name
+                )
+                for query, dense_chunks in zip(queries, dense_results)
+            ]
+
+        except Exception as e:
+            logger.error(f"Error getting contexts: {str(e)}")
+            return [[] for _ in queries]
+
     def get_relevant_context(
         self,
         query: str,
         document_ids: Optional[List[str]] = None,
         num_chunks: int = 3,
-        similarity_threshold: float = 0.7
+        similarity_threshold: Optional[float] = None,
+        user_id: Optional[int] = None
     ) -> List[Dict[str, Any]]:
         """
         Récupère le contexte pertinent pour une requête
+        
+        Les requêtes répétées sont servies par les caches : résultats de
+        recherche, puis embedding de la requête
+
+        similarity_threshold est une similarité minimale normalisée (cosinus,
+        quelle que soit la distance de la collection) ; RETRIEVAL_MIN_SIMILARITY
+        par défaut
         """
+        if similarity_threshold is None:
+            similarity_threshold = self.min_similarity
+        # Recherche limitée à la collection de l'utilisateur
+        collection_name = self.vector_store.collection_for(user_id)
         try:
+            query_hash = EmbeddingCache.hash_text(query)
+            retrieval_key = self._retrieval_key(
+                query_hash, document_ids, num_chunks, similarity_threshold, collection_name
+            )
+            cached_chunks = self.retrieval_cache.get(retrieval_key)
+            if cached_chunks is not None:
+                return list(cached_chunks)
+
             # 1. Générer l'embedding de la requête
-            query_embedding = self.embedding_service.get_embeddings([query])[0]
+            query_embedding = self.query_embedding_cache.get(query_hash)
+            if query_embedding is None:
+                query_embedding = self.embedding_service.get_embeddings([query])[0]
+                self.query_embedding_cache.set(query_hash, query_embedding)
             
-            # 2. Rechercher les chunks pertinents
-            filter_criteria = {"document_id": {"$in": document_ids}} if document_ids else None
-            relevant_chunks = self.vector_store.search(
-                query_embedding=query_embedding,
-                k=num_chunks,
-                filter_criteria=filter_criteria
+            # 2-3. Rechercher les chunks pertinents (vecteurs + BM25) et filtrer par seuil de similarité
+            filtered_chunks = self._search_relevant_chunks(
+                query, query_embedding, document_ids, num_chunks, similarity_threshold, collection_name
             )
 
-            # 3. Filtrer par seuil de similarité
-            filtered_chunks = [
-                chunk for chunk in relevant_chunks
-                if chunk.get("distance", 1) <= similarity_threshold
-            ]
+            self.retrieval_cache.set(retrieval_key, filtered_chunks)
+            return list(filtered_chunks)
 
-            return filtered_chunks
+        except Exception as e:
+            logger.error(f"Error getting context: {str(e)}")
+            return []
+
+    async def get_relevant_context_async(
+        self,
+        query: str,
+        document_ids: Optional[List[str]] = None,
+        num_chunks: int = 3,
+        similarity_threshold: Optional[float] = None,
+        user_id: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Version asynchrone de get_relevant_context : l'embedding passe par le
+        client OpenAI asynchrone et la recherche ChromaDB (bloquante) est
+        déportée dans un thread pour ne pas bloquer la boucle d'événements
+        """
+        if similarity_threshold is None:
+            similarity_threshold = self.min_similarity
+        # Recherche limitée à la collection de l'utilisateur
+        collection_name = self.vector_store.collection_for(user_id)
+        try:
+            query_hash = EmbeddingCache.hash_text(query)
+            retrieval_key = self._retrieval_key(
+                query_hash, document_ids, num_chunks, similarity_threshold, collection_name
+            )
+            cached_chunks = self.retrieval_cache.get(retrieval_key)
+            if cached_chunks is not None:
+                return list(cached_chunks)
+
+            # 1. Générer l'embedding de la requête
+            query_embedding = self.query_embedding_cache.get(query_hash)
+            if query_embedding is None:
+                query_embedding = (await self.embedding_service.get_embeddings_async([query]))[0]
+                self.query_embedding_cache.set(query_hash, query_embedding)
+
+            # 2-3. Rechercher les chunks pertinents (vecteurs + BM25) et filtrer par seuil de similarité
+            filtered_chunks = await asyncio.to_thread(
+                self._search_relevant_chunks,
+                query, query_embedding, document_ids, num_chunks, similarity_threshold, collection_name
+            )
+
+            self.retrieval_cache.set(retrieval_key, filtered_chunks)
+            return list(filtered_chunks)
 
         except Exception as e:
             logger.error(f"Error getting context: {str(e)}")
@@ -220,5 +598,8 @@ class RAGService:
         
         return "\n\n".join(formatted_chunks)
 
-# Singleton instance
-rag_service = RAGService(persist_directory="./chroma_test_db")
+# Singleton instance, created on first use (ouvre ChromaDB)
+rag_service = LazySingleton(lambda: RAGService(persist_directory="./chroma_test_db"))
+
+def get_rag_service() -> RAGService:
+    return rag_service.get()
@@ -0,0 +1,118 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.utils.lazy import LazySingleton
+
+logger = logging.getLogger(__name__)
+
+class RerankService:
+    """
+    Reclassement des chunks candidats par un cross-encoder local (CPU)
+
+    Le modèle sentence-transformers est chargé une seule fois par processus,
+    au premier appel ; les paires (requête, chunk) sont évaluées par lots.
+    """
+
+    def __init__(
+        self,
+        model_name: str = settings.RERANK_MODEL,
+        batch_size: int = settings.RERANK_BATCH_SIZE,
+        max_length: int = settings.RERANK_MAX_LENGTH
+    ):
+        """
+        Args:
+            model_name: Modèle CrossEncoder (Hugging Face ou chemin local)
+            batch_size: Nombre de paires évaluées par lot
+            max_length: Longueur maximale (en tokens) d'une paire requête + chunk
+        """
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self._model = None
+        self._lock = threading.Lock()
+
+        # Métriques
+        self.load_seconds: Optional[float] = None
+        self.calls = 0
+        self.pairs = 0
+        self.total_seconds = 0.0
+
+    def load(self):
+        """Charge le modèle (une seule fois) et le retourne"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    # Import différé : sentence-transformers (torch) est lourd à importer
+                    from sentence_transformers import CrossEncoder
+
+                    start = time.perf_counter()
+                    self._model = CrossEncoder(
+                        self.model_name,
+                        max_length=self.max_length,
+                        device="cpu"
+                    )
+                    self.load_seconds = time.perf_counter() - start
+                    logger.info(f"Reranker {self.model_name} loaded in {self.load_seconds:.1f}s")
+        return self._model
+
+    def rerank(
+        self,
+        query: str,
+        chunks: List[Dict[str, Any]],
+        top_k: int
+    ) -> List[Dict[str, Any]]:
+        """
+        Reclasse des chunks selon leur pertinence pour la requête
+
+        Args:
+            query: Texte de la requête
+            chunks: Chunks candidats (avec leur "text")
+            top_k: Nombre de chunks à conserver
+
+        Returns:
+            Les top_k meilleurs chunks, avec leur "rerank_score"
+        """
+        if not chunks:
+            return []
+
+        model = self.load()
+        start = time.perf_counter()
+        scores = model.predict(
+            [(query, chunk.get("text", "")) for chunk in chunks],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self.calls += 1
+            self.pairs += len(chunks)
+            self.total_seconds += elapsed
+
+        ranked = sorted(
+            ({**chunk, "rerank_score": float(score)} for chunk, score in zip(chunks, scores)),
+            key=lambda chunk: chunk["rerank_score"],
+            reverse=True
+        )
+        return ranked[:top_k]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Latence moyenne et débit (paires par seconde) du reranker"""
+        return {
+            "model": self.model_name,
+            "loaded": self._model is not None,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "calls": self.calls,
+            "pairs": self.pairs,
+            "avg_latency_ms": round(self.total_seconds / self.calls * 1000, 2) if self.calls else 0.0,
+            "pairs_per_second": round(self.pairs / self.total_seconds, 1) if self.total_seconds else 0.0
+        }
+
+# Singleton instance, created on first use (le modèle est chargé au premier reclassement)
+rerank_service = LazySingleton(RerankService)
+
+def get_rerank_service() -> RerankService:
+    return rerank_service.get()
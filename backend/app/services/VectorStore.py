@@ -1,37 +1,79 @@
-import chromadb
+import hashlib
+import os
+import threading
 import uuid
-from typing import List, Dict, Any, Optional
+from typing import Callable, List, Dict, Any, Optional
 import logging
 
+import numpy as np
+
+from app.services.ChunkRefIndex import ChunkRefIndex
+from app.services.LexicalIndex import LexicalIndex
+from app.utils.cache import TTLCache
+from app.utils.vectors import as_matrix
+
 # Configuration du logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Nombre maximal de requêtes envoyées dans un même appel query de ChromaDB
+QUERY_BATCH_SIZE = 256
+
+# Nombre maximal de chunks écrits par un même appel à ChromaDB (borné aussi par le client)
+ADD_BATCH_SIZE = 5000
+
+# document_id des vecteurs partagés par plusieurs chunks (voir ChunkRefIndex)
+SHARED_DOCUMENT_ID = "__shared__"
+
+def chunk_content_hash(text: str) -> str:
+  """Hash SHA-256 (hexadécimal) du texte d'un chunk, stocké dans ses métadonnées ("content_hash")"""
+  return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def shared_chunk_id(content_hash: str) -> str:
+  """ID du vecteur partagé d'un contenu"""
+  return f"shared_{content_hash}"
+
 class ChromaVectorStoreService:
   """
   Service de stockage de vecteurs optimisé pour RAG utilisant ChromaDB
+  
+  Les documents peuvent être répartis entre plusieurs collections (une par
+  utilisateur, voir collection_for) : chaque opération reçoit le nom de sa
+  collection, dont le handle est ouvert (et la collection créée) à la
+  première utilisation puis gardé dans un cache LRU. Aucune opération ne
+  modifie de collection "active" partagée : un même processus peut servir
+  plusieurs collections en parallèle.
   """
   
   def __init__(
     self,
     collection_name: str = "rag_collection",
     persist_directory: Optional[str] = "./chroma_db",
-    embedding_dimension: int = 768,
-    distance_func: str = "cosine"
+    embedding_dimension: Optional[int] = 768,
+    distance_func: str = "cosine",
+    lexical_index: Optional[LexicalIndex] = None,
+    routing: str = "shared",
+    max_open_collections: int = 256,
+    deduplicate: bool = True
   ):
     """
     Initialise le service de stockage vectoriel avec ChromaDB
     
     Args:
-      collection_name: Nom de la collection ChromaDB
+      collection_name: Nom de la collection ChromaDB par défaut (préfixe des collections par utilisateur)
       persist_directory: Répertoire où persister la base de données (None pour mémoire uniquement)
-      embedding_dimension: Dimension des embeddings (768 par défaut pour la plupart des modèles)
+      embedding_dimension: Dimension des embeddings (768 par défaut pour la plupart des modèles, None si inconnue)
       distance_func: Fonction de distance à utiliser ("cosine", "l2", ou "ip")
+      lexical_index: Index BM25 tenu à jour avec les collections (créé à côté de la base si non fourni)
+      routing: "user" pour une collection par utilisateur, "shared" pour la collection par défaut
+      max_open_collections: Nombre de handles de collections gardés en cache (LRU)
+      deduplicate: Stocker une seule fois les chunks de contenu identique (voir ChunkRefIndex)
     """
     self.embedding_dimension = embedding_dimension
     self.distance_func = distance_func
     self.persist_directory = persist_directory
     self.collection_name = collection_name
+    self.routing = routing
 
     # Métadonnées supplémentaires pour le suivi et les statistiques
     self.stats = {
@@ -40,13 +82,30 @@ class ChromaVectorStoreService:
       "collections": {}
     }
     
+    # Handles des collections ouvertes avec la distance de leur index (LRU, sans expiration)
+    self._collections = TTLCache(maxsize=max_open_collections, ttl=float("inf"))
+    self._collections_lock = threading.Lock()
+    self._open_locks: Dict[str, threading.Lock] = {}
+    
+    # Index lexical (BM25) à côté des collections
+    self.lexical_index = lexical_index or LexicalIndex(
+      os.path.join(persist_directory, "lexical_index.db") if persist_directory else ":memory:"
+    )
+    
+    # Références des chunks dédupliqués, à côté de l'index lexical
+    self.chunk_refs = ChunkRefIndex(
+      os.path.join(persist_directory, "chunk_refs.db") if persist_directory else ":memory:"
+    ) if deduplicate else None
+    
     # Initialisation de ChromaDB
     self._initialize_chroma_client()
-    
       
   def _initialize_chroma_client(self):
-    """Initialise le client et la collection ChromaDB"""
+    """Initialise le client et la collection ChromaDB par défaut"""
     try:
+      # Import différé : chromadb est lourd à importer et n'est utile qu'à la première requête
+      import chromadb
+
       # Créer le client ChromaDB - Using the new client initialization approach
       if self.persist_directory:
         logger.info(f"Initializing persistent ChromaDB at {self.persist_directory}")
@@ -55,80 +114,190 @@ class ChromaVectorStoreService:
         logger.info("Initializing in-memory ChromaDB")
         self.client = chromadb.Client()
       
-      # Vérifier si la collection existe déjà
-      collection_exists = False
-      try:
-        # Check if the collection exists
-        collections = self.client.list_collections()
-        collection_exists = any(collection.name == self.collection_name for collection in collections)
-      except Exception as e:
-        logger.warning(f"Failed to check existing collections: {str(e)}")
-          
-      # Créer ou récupérer la collection
-      if collection_exists:
-        # Si la collection existe, la récupérer
-        self.collection = self.client.get_collection(
-          name=self.collection_name
-        )
-        logger.info(f"Retrieved existing collection '{self.collection_name}'")
-      else:
-        # Si la collection n'existe pas, la créer
-        self.collection = self.client.create_collection(
-          name=self.collection_name,
-          embedding_function=None,  # Nous fournissons nos propres embeddings
-          metadata={"dimension": self.embedding_dimension, "distance_func": self.distance_func}
-        )
-        logger.info(f"Created new collection '{self.collection_name}'")
-              
+      collection = self.get_collection(self.collection_name)
+      
       # Mettre à jour les statistiques
-      self.stats["document_count"] = self.collection.count()
-      self.stats["chunk_count"] = self.collection.count()
-              
-      # Initialiser les statistiques de la collection
-      self.stats["collections"][self.collection_name] = {
-        "count": self.collection.count(),
-        "metadata": self.collection.metadata
-      }
+      self.stats["document_count"] = collection.count()
+      self.stats["chunk_count"] = collection.count()
+      
+      # Les chunks de la collection par défaut ne sont plus cherchés avec une collection par utilisateur
+      if self.routing == "user" and self.stats["chunk_count"] > 0:
+        logger.warning(
+          f"Collection '{self.collection_name}' still holds {self.stats['chunk_count']} chunks indexed before "
+          f"per-user routing: they are not searched until their documents are re-indexed"
+        )
             
     except Exception as e:
       logger.error(f"Failed to initialize ChromaDB: {str(e)}")
       raise RuntimeError(f"ChromaDB initialization failed: {str(e)}")
   
-  def add_documents(
-    self, 
-    chunks: List[Dict[str, Any]], 
-    embeddings: List[List[float]], 
-    document_id: Optional[str] = None,
-    document_metadata: Optional[Dict[str, Any]] = None
-  ) -> List[str]:
+  def collection_for(self, tenant_id: Optional[Any]) -> str:
     """
-    Ajoute des documents (chunks) avec leurs embeddings à la base de données vectorielle
+    Nom de la collection d'un utilisateur (ou tenant)
     
     Args:
-      chunks: Liste de dictionnaires contenant le texte et les métadonnées des chunks
-      embeddings: Liste des vecteurs d'embedding correspondants
-      document_id: ID du document parent (généré automatiquement si non fourni)
-      document_metadata: Métadonnées du document parent
+      tenant_id: ID de l'utilisateur, None pour la collection par défaut
         
     Returns:
-      Liste des IDs des chunks ajoutés
+      Nom de la collection
     """
-    if not chunks or not embeddings:
-      logger.warning("No chunks or embeddings provided to add_documents")
-      return []
+    if tenant_id is None or self.routing != "user":
+      return self.collection_name
+    return f"{self.collection_name}_{tenant_id}"
+  
+  def get_collection(self, name: Optional[str] = None):
+    """
+    Handle d'une collection, créée si elle n'existe pas encore
+    
+    Args:
+      name: Nom de la collection (collection par défaut si None)
         
-    if len(chunks) != len(embeddings):
-      raise ValueError(f"Number of chunks ({len(chunks)}) must match number of embeddings ({len(embeddings)})")
+    Returns:
+      Collection ChromaDB
+    """
+    return self._get_handle(name or self.collection_name)[0]
+  
+  def _get_handle(self, name: str) -> tuple:
+    """(collection, distance de l'index) depuis le cache LRU, ouverte si absente"""
+    handle = self._collections.get(name)
+    if handle is not None:
+      return handle
+      
+    # Un seul thread ouvre (ou crée) une collection donnée ; l'ouverture et la
+    # synchronisation lexicale ne bloquent pas l'accès aux autres collections
+    with self._collections_lock:
+      open_lock = self._open_locks.setdefault(name, threading.Lock())
+    with open_lock:
+      handle = self._collections.get(name)
+      if handle is None:
+        handle = self._open_collection(name)
+        with self._collections_lock:
+          self._collections.set(name, handle)
+          self._open_locks.pop(name, None)
+      return handle
+  
+  def _open_collection(self, name: str) -> tuple:
+    """Récupère ou crée une collection, puis la synchronise avec l'index lexical"""
+    # Vérifier si la collection existe déjà
+    collection_exists = False
+    try:
+      collections = self.client.list_collections()
+      collection_exists = any(getattr(collection, "name", collection) == name for collection in collections)
+    except Exception as e:
+      logger.warning(f"Failed to check existing collections: {str(e)}")
     
-    # Générer un ID de document si non fourni
-    doc_id = document_id or f"doc_{uuid.uuid4().hex}"
+    if collection_exists:
+      collection = self.client.get_collection(name=name)
+      logger.info(f"Retrieved existing collection '{name}'")
+      self._reconcile_dimension(name, collection)
+    else:
+      self.create_collection(name)
+      collection = self.client.get_collection(name=name)
+    
+    # Distance réellement utilisée par l'index (l2 pour les collections créées sans "hnsw:space")
+    space = (collection.metadata or {}).get("hnsw:space", "l2")
+    self._sync_lexical_index(name, collection)
+    
+    # Initialiser les statistiques de la collection
+    self.stats["collections"][name] = {
+      "count": collection.count(),
+      "metadata": collection.metadata
+    }
+    return collection, space
+  
+  def _collection_metadata(self) -> Dict[str, Any]:
+    """Métadonnées d'une nouvelle collection (la dimension est omise si elle n'est pas encore connue)"""
+    # "hnsw:space" est la clé lue par ChromaDB pour choisir la distance de l'index
+    metadata = {"distance_func": self.distance_func, "hnsw:space": self.distance_func}
+    if self.embedding_dimension:
+      metadata["dimension"] = self.embedding_dimension
+    return metadata
+  
+  def distance_to_score(self, distance: float, collection_name: Optional[str] = None) -> float:
+    """
+    Convertit une distance ChromaDB en similarité normalisée
+    
+    Pour des embeddings normalisés (OpenAI, sentence-transformers avec
+    normalisation), les trois distances donnent la similarité cosinus :
+    cosine et ip renvoient 1 - cos, l2 renvoie la distance au carré 2 - 2 cos
     
+    Args:
+      distance: Distance renvoyée par la collection
+      collection_name: Collection interrogée (collection par défaut si None)
+        
+    Returns:
+      Similarité entre -1 et 1 (1 = identique)
+    """
+    _, space = self._get_handle(collection_name or self.collection_name)
+    if space == "l2":
+      return 1.0 - distance / 2.0
+    return 1.0 - distance
+  
+  def _reconcile_dimension(self, name: str, collection) -> None:
+    """
+    Vérifie que les vecteurs de la collection ont la dimension des embeddings
+    configurés, et met à jour la dimension enregistrée dans ses métadonnées
+    """
+    if not self.embedding_dimension:
+      return
+      
+    sample = collection.get(limit=1, include=["embeddings"])
+    embeddings = sample.get("embeddings")
+    if embeddings is not None and len(embeddings) > 0:
+      stored_dimension = len(embeddings[0])
+      if stored_dimension != self.embedding_dimension:
+        raise ValueError(
+          f"Collection '{name}' contains {stored_dimension}-dimensional vectors "
+          f"but the embedding backend produces {self.embedding_dimension}: "
+          f"use another collection or re-index the documents"
+        )
+        
+    metadata = dict(collection.metadata or {})
+    if metadata.get("dimension") != self.embedding_dimension:
+      metadata["dimension"] = self.embedding_dimension
+      try:
+        collection.modify(metadata=metadata)
+      except Exception as e:
+        logger.warning(f"Could not update the dimension of collection '{name}': {str(e)}")
+  
+  def _sync_lexical_index(self, name: str, collection, batch_size: int = 1000) -> None:
+    """Reconstruit l'index lexical d'une collection s'il n'a pas le même nombre de chunks"""
+    count = collection.count()
+    if self.lexical_index.count(name) == count:
+      return
+      
+    logger.info(f"Rebuilding lexical index for collection '{name}' ({count} chunks)")
+    self.lexical_index.clear_collection(name)
+    for offset in range(0, count, batch_size):
+      results = collection.get(
+        include=["documents", "metadatas"],
+        limit=batch_size,
+        offset=offset
+      )
+      # Regrouper les chunks par document
+      by_document: Dict[str, tuple] = {}
+      for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"]):
+        document_id = (metadata or {}).get("document_id") or chunk_id.split("_chunk_")[0]
+        ids, texts = by_document.setdefault(document_id, ([], []))
+        ids.append(chunk_id)
+        texts.append(text or "")
+      for document_id, (ids, texts) in by_document.items():
+        self.lexical_index.add_chunks(name, document_id, ids, texts)
+  
+  def _prepare_chunks(
+    self,
+    chunks: List[Dict[str, Any]],
+    doc_id: str,
+    document_metadata: Optional[Dict[str, Any]],
+    start_index: int
+  ) -> tuple:
+    """IDs, textes et métadonnées enrichies des chunks d'un document, au format ChromaDB"""
     # Préparer les données pour ChromaDB
     ids = []
     documents = []
     metadatas = []
     
-    for i, (chunk, embedding) in enumerate(zip(chunks, embeddings)):
+    for i, chunk in enumerate(chunks, start=start_index):
       # Générer un ID unique pour le chunk
       chunk_id = f"{doc_id}_chunk_{i}"
       ids.append(chunk_id)
@@ -161,36 +330,351 @@ class ChromaVectorStoreService:
           if key != "text" and isinstance(value, (str, int, float, bool)):
             chunk_metadata[key] = value
       
+      # Hash du contenu : permet de ne réécrire que les chunks modifiés (voir update_document)
+      chunk_metadata["content_hash"] = chunk_content_hash(chunk_text)
+      
       metadatas.append(chunk_metadata)
     
+    return ids, documents, metadatas
+  
+  def add_documents(
+    self, 
+    chunks: List[Dict[str, Any]], 
+    embeddings: np.ndarray, 
+    document_id: Optional[str] = None,
+    document_metadata: Optional[Dict[str, Any]] = None,
+    start_index: int = 0,
+    collection_name: Optional[str] = None
+  ) -> List[str]:
+    """
+    Ajoute des documents (chunks) avec leurs embeddings à la base de données vectorielle
+    
+    Un chunk dont le contenu est déjà présent dans la collection n'est pas
+    stocké une deuxième fois : il référence le vecteur partagé de ce contenu
+    (voir ChunkRefIndex)
+    
+    Args:
+      chunks: Liste de dictionnaires contenant le texte et les métadonnées des chunks
+      embeddings: Vecteurs d'embedding correspondants (matrice float32, une ligne par chunk ; les listes sont converties)
+      document_id: ID du document parent (généré automatiquement si non fourni)
+      document_metadata: Métadonnées du document parent
+      start_index: Index du premier chunk, pour ajouter un document par lots
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
+        
+    Returns:
+      Liste des IDs des chunks ajoutés
+    """
+    if not chunks or embeddings is None or len(embeddings) == 0:
+      logger.warning("No chunks or embeddings provided to add_documents")
+      return []
+    # Matrice float32 contiguë, transmise telle quelle à ChromaDB (sans conversion en listes Python)
+    embeddings = as_matrix(embeddings)
+        
+    if len(chunks) != len(embeddings):
+      raise ValueError(f"Number of chunks ({len(chunks)}) must match number of embeddings ({len(embeddings)})")
+    
+    # Générer un ID de document si non fourni
+    doc_id = document_id or f"doc_{uuid.uuid4().hex}"
+    ids, documents, metadatas = self._prepare_chunks(chunks, doc_id, document_metadata, start_index)
+    
+    collection_name = collection_name or self.collection_name
     try:
       # Ajouter les données à ChromaDB
-      self.collection.add(
-        ids=ids,
-        embeddings=embeddings,
-        documents=documents,
-        metadatas=metadatas
-      )
+      collection = self.get_collection(collection_name)
+      entries = [
+        (doc_id, start_index + i, ids[i], documents[i], metadatas[i])
+        for i in range(len(ids))
+      ]
+      written = self._store_chunks(collection_name, collection, entries, embeddings=embeddings)
       
       # Mettre à jour les statistiques
-      self.stats["document_count"] += 1
+      if start_index == 0:
+        self.stats["document_count"] += 1
       self.stats["chunk_count"] += len(chunks)
-      self.stats["collections"][self.collection_name]["count"] = self.collection.count()
+      self.stats["collections"][collection_name]["count"] = collection.count()
       
-      logger.info(f"Added {len(chunks)} chunks from document {doc_id} to ChromaDB")
+      logger.info(
+        f"Added {len(chunks)} chunks from document {doc_id} to collection '{collection_name}' "
+        f"({len(chunks) - len(written)} deduplicated)"
+      )
       return ids
         
     except Exception as e:
       logger.error(f"Failed to add documents to ChromaDB: {str(e)}")
       raise RuntimeError(f"Adding documents to ChromaDB failed: {str(e)}")
+
+  def add_documents_bulk(
+    self,
+    documents: List[Dict[str, Any]],
+    embeddings: np.ndarray,
+    collection_name: Optional[str] = None
+  ) -> int:
+    """
+    Ajoute les chunks de plusieurs documents en quelques gros appels à ChromaDB
+    (indexation en masse)
+
+    Les chunks sont écrits par upsert : un lot rejoué après une interruption
+    remplace ses propres chunks au lieu de les dupliquer. Les contenus
+    répétés (dans le lot ou déjà présents dans la collection) sont stockés
+    une seule fois.
+
+    Args:
+      documents: Documents {"document_id", "chunks", "metadata"}
+      embeddings: Embeddings des chunks de tous les documents, dans l'ordre (matrice float32)
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
+
+    Returns:
+      Nombre de chunks écrits
+    """
+    entries = []
+    for document in documents:
+      ids, texts, metadatas = self._prepare_chunks(
+        document["chunks"], document["document_id"], document.get("metadata"), 0
+      )
+      entries.extend(
+        (document["document_id"], i, ids[i], texts[i], metadatas[i]) for i in range(len(ids))
+      )
+
+    embeddings = as_matrix(embeddings)
+    if len(entries) != len(embeddings):
+      raise ValueError(f"Number of chunks ({len(entries)}) must match number of embeddings ({len(embeddings)})")
+    if not entries:
+      return 0
+
+    collection_name = collection_name or self.collection_name
+    try:
+      collection = self.get_collection(collection_name)
+      written = self._store_chunks(collection_name, collection, entries, embeddings=embeddings)
+
+      # Mettre à jour les statistiques
+      self.stats["document_count"] += len(documents)
+      self.stats["chunk_count"] += len(entries)
+      self.stats["collections"][collection_name]["count"] = collection.count()
+
+      logger.info(
+        f"Added {len(entries)} chunks from {len(documents)} documents to collection '{collection_name}' "
+        f"({len(entries) - len(written)} deduplicated)"
+      )
+      return len(entries)
+
+    except Exception as e:
+      logger.error(f"Failed to add documents to ChromaDB: {str(e)}")
+      raise RuntimeError(f"Adding documents to ChromaDB failed: {str(e)}")
+
+  def _plan_dedup(self, collection_name: str, entries: List[tuple]) -> tuple:
+    """
+    Répartit des chunks à écrire entre chunks ordinaires et contenus partagés
+
+    Args:
+      collection_name: Collection cible
+      entries: Chunks (document_id, chunk_index, chunk_id, texte, métadonnées)
+
+    Returns:
+      (positions des chunks ordinaires, hash -> position d'un contenu à stocker
+      comme vecteur partagé, hash -> ID du chunk ordinaire qu'il remplace) ;
+      les autres chunks référencent un vecteur partagé existant
+    """
+    if self.chunk_refs is None:
+      return list(range(len(entries))), {}, {}
+
+    known = self.chunk_refs.lookup(collection_name, [entry[4]["content_hash"] for entry in entries])
+    regular: Dict[int, None] = {}  # Ensemble ordonné
+    first: Dict[str, int] = {}
+    shared: Dict[str, int] = {}
+    promoted: Dict[str, str] = {}
+    for position, (document_id, chunk_index, _, _, metadata) in enumerate(entries):
+      content_hash = metadata["content_hash"]
+      if content_hash in shared:
+        continue
+      if content_hash in known and known[content_hash] is None:
+        continue  # Contenu déjà partagé : simple référence
+      stored = known.get(content_hash)
+      if content_hash in first:
+        # Deuxième occurrence dans ce lot (la première a pu être déjà stockée, lot rejoué)
+        del regular[first[content_hash]]
+        if stored is not None:
+          promoted[content_hash] = f"{stored[0]}_chunk_{stored[1]}"
+        shared[content_hash] = position
+      elif stored is not None and stored != (document_id, chunk_index):
+        # Deuxième occurrence d'un contenu stocké par un autre chunk : il devient partagé
+        promoted[content_hash] = f"{stored[0]}_chunk_{stored[1]}"
+        shared[content_hash] = position
+      else:
+        first[content_hash] = position
+        regular[position] = None
+    return list(regular), shared, promoted
+
+  def _store_chunks(
+    self,
+    collection_name: str,
+    collection,
+    entries: List[tuple],
+    embeddings: Optional[np.ndarray] = None,
+    reuse_ids: Optional[Dict[str, str]] = None,
+    embed_texts: Optional[Callable[[List[str]], np.ndarray]] = None
+  ) -> List[str]:
+    """
+    Écrit des chunks en dédupliquant leur contenu, et enregistre leurs références
+
+    Args:
+      collection_name: Collection cible
+      collection: Collection ChromaDB
+      entries: Chunks (document_id, chunk_index, chunk_id, texte, métadonnées)
+      embeddings: Embeddings des chunks (une ligne par entrée), ou None pour les
+        réutiliser (reuse_ids, chunks remplacés) ou les calculer avec embed_texts
+      reuse_ids: hash -> ID d'un chunk stocké dont le vecteur peut être réutilisé
+      embed_texts: Fonction d'embedding des textes, requise si embeddings est None
+
+    Returns:
+      IDs des chunks écrits comme chunks ordinaires (les autres référencent un vecteur partagé)
+    """
+    regular, shared, promoted = self._plan_dedup(collection_name, entries)
+    positions = regular + list(shared.values())
+
+    if embeddings is not None:
+      vectors = embeddings[positions]
+    else:
+      reuse = dict(reuse_ids or {})
+      reuse.update(promoted)
+      vectors = self._collect_vectors(
+        collection,
+        [entries[p][4]["content_hash"] for p in positions],
+        [entries[p][3] for p in positions],
+        reuse,
+        embed_texts
+      )
+
+    ids = [entries[p][2] for p in regular]
+    texts = [entries[p][3] for p in positions]
+    metadatas = [entries[p][4] for p in regular]
+    for content_hash in shared:
+      ids.append(shared_chunk_id(content_hash))
+      metadatas.append({"document_id": SHARED_DOCUMENT_ID, "content_hash": content_hash, "shared": True})
+    self._upsert(collection, ids, vectors, texts, metadatas)
+
+    # Index lexical : chunks ordinaires par document, contenus partagés à part
+    by_document: Dict[str, tuple] = {}
+    for chunk_id, text, metadata in zip(ids, texts, metadatas):
+      document_ids, document_texts = by_document.setdefault(metadata["document_id"], ([], []))
+      document_ids.append(chunk_id)
+      document_texts.append(text)
+    for document_id, (document_ids, document_texts) in by_document.items():
+      self.lexical_index.add_chunks(collection_name, document_id, document_ids, document_texts)
+
+    # Les chunks ordinaires devenus partagés sont remplacés par le vecteur partagé
+    written = set(ids[:len(regular)])
+    promoted_ids = [chunk_id for chunk_id in promoted.values() if chunk_id not in written]
+    if promoted_ids:
+      collection.delete(ids=promoted_ids)
+      self.lexical_index.delete_chunks(collection_name, promoted_ids)
+
+    if self.chunk_refs is not None:
+      self.chunk_refs.add_refs(
+        collection_name,
+        [(entry[0], entry[1], entry[4]["content_hash"], self._reference_metadata(entry[4])) for entry in entries],
+        shared_hashes=shared
+      )
+    return ids[:len(regular)]
+
+  def _upsert(
+    self,
+    collection,
+    ids: List[str],
+    embeddings: np.ndarray,
+    documents: List[str],
+    metadatas: List[Dict[str, Any]]
+  ) -> None:
+    """Écrit des chunks par lots, dans la limite de taille de lot du client ChromaDB"""
+    # Taille de lot maximale acceptée par le client ChromaDB
+    get_max_batch_size = getattr(self.client, "get_max_batch_size", None)
+    batch_size = min(ADD_BATCH_SIZE, get_max_batch_size()) if get_max_batch_size else ADD_BATCH_SIZE
+    for start in range(0, len(ids), batch_size):
+      end = start + batch_size
+      collection.upsert(
+        ids=ids[start:end],
+        embeddings=embeddings[start:end],
+        documents=documents[start:end],
+        metadatas=metadatas[start:end]
+      )
+
+  def document_filter(
+    self,
+    document_ids: Optional[List[str]],
+    collection_name: Optional[str] = None
+  ) -> Optional[Dict[str, Any]]:
+    """
+    Filtre ChromaDB limitant une recherche à des documents, y compris aux
+    contenus partagés qu'ils référencent
+
+    Returns:
+      Filtre "where", None si document_ids est vide
+    """
+    if not document_ids:
+      return None
+    where: Dict[str, Any] = {"document_id": {"$in": list(document_ids)}}
+    if self.chunk_refs is not None:
+      shared = self.chunk_refs.shared_hashes(collection_name or self.collection_name, document_ids)
+      if shared:
+        where = {"$or": [where, {"content_hash": {"$in": shared}}]}
+    return where
+
+  @staticmethod
+  def _reference_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Métadonnées propres à une occurrence (titre, page...), gardées par ChunkRefIndex"""
+    return {
+      key: value for key, value in metadata.items()
+      if key not in ("document_id", "chunk_index", "content_hash")
+    }
+
+  def resolve_references(
+    self,
+    chunks: List[Dict[str, Any]],
+    collection_name: Optional[str] = None,
+    document_ids: Optional[List[str]] = None
+  ) -> List[Dict[str, Any]]:
+    """
+    Rattache les contenus partagés de résultats de recherche à leurs documents
+
+    Chaque chunk partagé reçoit ses "references" (document_id, chunk_index et
+    métadonnées de l'occurrence), limitées à document_ids si fourni, et les
+    métadonnées de la première (document_id, titre, page...)
+
+    Returns:
+      Les chunks, dans le même ordre
+    """
+    shared = [chunk for chunk in chunks if (chunk.get("metadata") or {}).get("shared")]
+    if not shared or self.chunk_refs is None:
+      return chunks
+    references = self.chunk_refs.references(
+      collection_name or self.collection_name,
+      [chunk["metadata"]["content_hash"] for chunk in shared],
+      document_ids
+    )
+    resolved = []
+    for chunk in chunks:
+      metadata = chunk.get("metadata") or {}
+      if metadata.get("shared"):
+        refs = [
+          {**ref_metadata, "document_id": document_id, "chunk_index": index}
+          for document_id, index, ref_metadata in references.get(metadata["content_hash"], [])
+        ]
+        chunk = {
+          **chunk,
+          # Métadonnées (titre, page...) de la première occurrence retenue
+          "metadata": {**metadata, **refs[0]} if refs else metadata,
+          "references": refs
+        }
+      resolved.append(chunk)
+    return resolved
   
   def search(
     self, 
-    query_embedding: List[float], 
+    query_embedding: np.ndarray, 
     k: int = 5,
     filter_criteria: Optional[Dict[str, Any]] = None,
     include_embeddings: bool = False,
-    include_distances: bool = True
+    include_distances: bool = True,
+    collection_name: Optional[str] = None
   ) -> List[Dict[str, Any]]:
     """
     Recherche les chunks les plus similaires à un embedding de requête
@@ -201,68 +685,244 @@ class ChromaVectorStoreService:
       filter_criteria: Critères de filtrage des résultats (par métadonnées)
       include_embeddings: Inclure les embeddings dans les résultats
       include_distances: Inclure les scores de distance dans les résultats
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
         
     Returns:
       Liste des chunks les plus similaires avec leurs métadonnées
     """
+    results = self.search_many(
+      as_matrix(query_embedding),
+      k=k,
+      filter_criteria=filter_criteria,
+      include_embeddings=include_embeddings,
+      include_distances=include_distances,
+      collection_name=collection_name
+    )[0]
+    if not results:
+      logger.warning("No results found for query")
+    return results
+  
+  def search_many(
+    self,
+    query_embeddings: np.ndarray,
+    k: int = 5,
+    filter_criteria: Optional[Dict[str, Any]] = None,
+    include_embeddings: bool = False,
+    include_distances: bool = True,
+    collection_name: Optional[str] = None,
+    batch_size: int = QUERY_BATCH_SIZE
+  ) -> List[List[Dict[str, Any]]]:
+    """
+    Recherche les chunks les plus similaires pour plusieurs requêtes à la fois
+    
+    Les requêtes sont envoyées à ChromaDB par lots de batch_size, en un seul
+    appel par lot, au lieu d'un appel par requête
+    
+    Args:
+      query_embeddings: Vecteurs d'embedding des requêtes (matrice float32, une ligne par requête)
+      k: Nombre de résultats par requête
+      filter_criteria: Critères de filtrage des résultats (par métadonnées), communs aux requêtes
+      include_embeddings: Inclure les embeddings dans les résultats
+      include_distances: Inclure les scores de distance dans les résultats
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
+      batch_size: Nombre maximal de requêtes par appel à ChromaDB
+        
+    Returns:
+      Pour chaque requête, dans l'ordre, la liste des chunks les plus similaires
+    """
+    all_results: List[List[Dict[str, Any]]] = []
+    query_embeddings = as_matrix(query_embeddings)
+    include = ["documents", "metadatas", "distances", "embeddings"] if include_embeddings else ["documents", "metadatas", "distances"]
+    
     try:
-      # Effectuer la recherche avec ChromaDB
-      results = self.collection.query(
-        query_embeddings=[query_embedding],
-        n_results=k,
-        where=filter_criteria,  # Filtrage par métadonnées
-        include=["documents", "metadatas", "distances", "embeddings"] if include_embeddings else ["documents", "metadatas", "distances"]
-      )
+      collection = self.get_collection(collection_name)
+      for start in range(0, len(query_embeddings), batch_size):
+        batch = query_embeddings[start:start + batch_size]
+        # Effectuer la recherche avec ChromaDB
+        results = collection.query(
+          query_embeddings=batch,
+          n_results=k,
+          where=filter_criteria,  # Filtrage par métadonnées
+          include=include
+        )
+        for query_index in range(len(batch)):
+          all_results.append(self._format_query_results(
+            results, query_index, include_embeddings, include_distances, collection_name
+          ))
+          
+      logger.info(f"Found results for {len(all_results)} queries")
+      return all_results
+        
+    except Exception as e:
+      logger.error(f"Search failed: {str(e)}")
+      # Résultats vides pour les requêtes non traitées
+      return all_results + [[] for _ in range(len(query_embeddings) - len(all_results))]
+  
+  def _format_query_results(
+    self,
+    results: Dict[str, Any],
+    query_index: int,
+    include_embeddings: bool,
+    include_distances: bool,
+    collection_name: Optional[str]
+  ) -> List[Dict[str, Any]]:
+    """Formate les résultats d'une requête d'un appel query de ChromaDB"""
+    if not results or not results["ids"] or not results["ids"][query_index]:
+      return []
       
-      # Formater les résultats pour une utilisation plus facile
-      formatted_results = []
+    # Formater les résultats pour une utilisation plus facile
+    formatted_results = []
+    ids = results["ids"][query_index]
+    # Embeddings des résultats en une matrice float32 : chaque chunk en reçoit une ligne
+    embeddings = None
+    if include_embeddings and results.get("embeddings") is not None:
+      embeddings = as_matrix(results["embeddings"][query_index])
+    for i in range(len(ids)):
+      result = {
+        "id": ids[i],
+        "text": results["documents"][query_index][i],
+        "metadata": results["metadatas"][query_index][i] if results["metadatas"] else {}
+      }
       
-      if not results or not results["ids"] or not results["ids"][0]:
-        logger.warning("No results found for query")
-        return []
+      if include_distances and "distances" in results:
+        result["distance"] = results["distances"][query_index][i]
+        result["score"] = self.distance_to_score(result["distance"], collection_name)
           
-      for i in range(len(results["ids"][0])):
-        result = {
-          "id": results["ids"][0][i],
-          "text": results["documents"][0][i],
-          "metadata": results["metadatas"][0][i] if results["metadatas"] else {}
-        }
-        
-        if include_distances and "distances" in results:
-          result["distance"] = results["distances"][0][i]
-            
-        if include_embeddings and "embeddings" in results:
-          result["embedding"] = results["embeddings"][0][i]
-            
-        formatted_results.append(result)
+      if embeddings is not None:
+        result["embedding"] = embeddings[i]
           
-      logger.info(f"Found {len(formatted_results)} results for query")
+      formatted_results.append(result)
+    return formatted_results
+  
+  def search_adaptive(
+    self,
+    query_embedding: np.ndarray,
+    min_score: float,
+    k: int = 5,
+    max_k: int = 50,
+    filter_criteria: Optional[Dict[str, Any]] = None,
+    collection_name: Optional[str] = None
+  ) -> List[Dict[str, Any]]:
+    """
+    Recherche les chunks dont la similarité normalisée atteint min_score
+    
+    La recherche commence avec k résultats et double k tant que tous les
+    résultats atteignent le seuil (il peut en rester d'autres), sans dépasser
+    max_k : le seuil est atteint dès que le dernier résultat est en dessous.
+    
+    Args:
+      query_embedding: Vecteur d'embedding de la requête
+      min_score: Similarité minimale (voir distance_to_score)
+      k: Nombre de résultats de la première recherche
+      max_k: Nombre maximal de résultats
+      filter_criteria: Critères de filtrage des résultats (par métadonnées)
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
+        
+    Returns:
+      Chunks au-dessus du seuil, du plus au moins similaire (au plus max_k)
+    """
+    k = max(1, min(k, max_k))
+    while True:
+      results = self.search(
+        query_embedding,
+        k=k,
+        filter_criteria=filter_criteria,
+        collection_name=collection_name
+      )
+      relevant = [result for result in results if result.get("score", -1.0) >= min_score]
+      if len(relevant) < len(results) or len(results) < k or k >= max_k:
+        return relevant
+      k = min(k * 2, max_k)
+  
+  def lexical_search(
+    self,
+    query: str,
+    k: int = 5,
+    document_ids: Optional[List[str]] = None,
+    collection_name: Optional[str] = None
+  ) -> List[Dict[str, Any]]:
+    """
+    Recherche BM25 des chunks contenant les termes de la requête
+    
+    Args:
+      query: Texte de la requête
+      k: Nombre de résultats à retourner
+      document_ids: Documents auxquels limiter la recherche
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
+        
+    Returns:
+      Liste des chunks (même format que search) avec leur score "bm25", du plus au moins pertinent
+    """
+    try:
+      collection_name = collection_name or self.collection_name
+      if document_ids and self.chunk_refs is not None:
+        # Les contenus partagés sont indexés à part : ne garder que ceux des documents demandés
+        allowed = [
+          shared_chunk_id(content_hash)
+          for content_hash in self.chunk_refs.shared_hashes(collection_name, document_ids)
+        ]
+        hits = self.lexical_index.search(
+          collection_name, query, k=k, document_ids=document_ids, chunk_ids=allowed
+        )
+      else:
+        hits = self.lexical_index.search(collection_name, query, k=k, document_ids=document_ids)
+      if not hits:
+        return []
+      
+      results = self.get_collection(collection_name).get(
+        ids=[chunk_id for chunk_id, _ in hits],
+        include=["documents", "metadatas"]
+      )
+      chunks = {
+        chunk_id: (text, metadata)
+        for chunk_id, text, metadata in zip(results["ids"], results["documents"], results["metadatas"])
+      }
+      
+      formatted_results = []
+      for chunk_id, score in hits:
+        if chunk_id not in chunks:
+          continue
+        text, metadata = chunks[chunk_id]
+        formatted_results.append({
+          "id": chunk_id,
+          "text": text,
+          "metadata": metadata or {},
+          "bm25": score
+        })
       return formatted_results
         
     except Exception as e:
-      logger.error(f"Search failed: {str(e)}")
+      logger.error(f"Lexical search failed: {str(e)}")
       return []
   
-  def delete_document(self, document_id: str) -> bool:
+  def delete_document(self, document_id: str, collection_name: Optional[str] = None) -> bool:
     """
     Supprime un document et tous ses chunks
     
     Args:
       document_id: ID du document à supprimer
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
         
     Returns:
       Succès de l'opération
     """
+    collection_name = collection_name or self.collection_name
     try:
       # Supprimer tous les chunks associés au document
-      self.collection.delete(
+      collection = self.get_collection(collection_name)
+      collection.delete(
         where={"document_id": document_id}
       )
-      logger.info(f"Deleted document {document_id} from ChromaDB")
+      self.lexical_index.delete_document(collection_name, document_id)
+      if self.chunk_refs is not None:
+        # Supprimer les contenus partagés dont c'était la dernière référence
+        released = self.chunk_refs.remove_refs(collection_name, document_id)
+        self._delete_orphaned(collection_name, collection, released)
+      logger.info(f"Deleted document {document_id} from collection '{collection_name}'")
       
       # Mettre à jour les statistiques
       self.stats["document_count"] = max(0, self.stats["document_count"] - 1)
-      self.stats["collections"][self.collection_name]["count"] = self.collection.count()
+      self.stats["collections"][collection_name]["count"] = collection.count()
       
       return True
     except Exception as e:
@@ -273,53 +933,196 @@ class ChromaVectorStoreService:
     self, 
     document_id: str,
     chunks: List[Dict[str, Any]], 
-    embeddings: List[List[float]],
-    document_metadata: Optional[Dict[str, Any]] = None
+    embeddings: Optional[np.ndarray] = None,
+    document_metadata: Optional[Dict[str, Any]] = None,
+    collection_name: Optional[str] = None,
+    embed_texts: Optional[Callable[[List[str]], np.ndarray]] = None
   ) -> List[str]:
     """
-    Met à jour un document existant (supprimer puis réinsérer)
+    Met à jour un document existant de façon incrémentale
+    
+    Les anciens chunks sont comparés aux nouveaux par leur ID (position) et
+    leurs métadonnées, qui contiennent le hash de leur contenu : seuls les
+    chunks modifiés sont réécrits (upsert) et seuls les chunks en trop sont
+    supprimés. Une occurrence d'un contenu partagé reste inchangée tant que
+    son contenu l'est. Sans embeddings fournis, les vecteurs d'un contenu
+    déjà présent dans le document (chunk simplement déplacé) sont réutilisés
+    et seuls les contenus nouveaux sont embeddés, avec embed_texts.
     
     Args:
       document_id: ID du document à mettre à jour
       chunks: Nouveaux chunks
-      embeddings: Nouveaux embeddings
+      embeddings: Nouveaux embeddings de tous les chunks (calculés à la demande si None)
       document_metadata: Nouvelles métadonnées
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
+      embed_texts: Fonction d'embedding des textes, requise si embeddings est None
         
     Returns:
-      Liste des IDs des nouveaux chunks
+      Liste des IDs des chunks du document
     """
-    # Supprimer l'ancien document
-    self.delete_document(document_id)
+    if embeddings is None and embed_texts is None:
+      raise ValueError("update_document needs either embeddings or embed_texts")
+    if embeddings is not None and len(embeddings) != len(chunks):
+      raise ValueError(f"Number of chunks ({len(chunks)}) must match number of embeddings ({len(embeddings)})")
     
-    # Ajouter le nouveau document
-    return self.add_documents(
-      chunks=chunks,
-      embeddings=embeddings,
-      document_id=document_id,
-      document_metadata=document_metadata
-    )
+    ids, documents, metadatas = self._prepare_chunks(chunks, document_id, document_metadata, 0)
+    collection_name = collection_name or self.collection_name
+    try:
+      collection = self.get_collection(collection_name)
+      
+      # Métadonnées (dont le hash du contenu) des chunks actuels
+      current = collection.get(where={"document_id": document_id}, include=["metadatas"])
+      current_metadatas = dict(zip(current["ids"], current["metadatas"] or []))
+      
+      # Occurrences actuelles du document, dont celles de contenus partagés
+      old_refs: Dict[int, str] = {}
+      shared = set()
+      if self.chunk_refs is not None:
+        old_refs = self.chunk_refs.document_refs(collection_name, document_id)
+        known = self.chunk_refs.lookup(collection_name, list(old_refs.values()))
+        shared = {content_hash for content_hash, state in known.items() if state is None}
+      
+      # Chunks à réécrire : nouveaux, ou dont le contenu ou les métadonnées ont changé
+      unchanged = [
+        i for i, chunk_id in enumerate(ids)
+        if current_metadatas.get(chunk_id) == metadatas[i]
+        or (old_refs.get(i) == metadatas[i]["content_hash"] and old_refs[i] in shared)
+      ]
+      kept = set(unchanged)
+      changed = [i for i in range(len(ids)) if i not in kept]
+      
+      released = []
+      if self.chunk_refs is not None:
+        # Retirer les occurrences réécrites ou disparues avant de replanifier la déduplication
+        stale_refs = [i for i in old_refs if i not in kept]
+        if stale_refs:
+          released = self.chunk_refs.remove_refs(collection_name, document_id, stale_refs)
+      
+      written: List[str] = []
+      if changed:
+        entries = [(document_id, i, ids[i], documents[i], metadatas[i]) for i in changed]
+        # Vecteurs réutilisables : chunks actuels du document, par contenu
+        reuse_ids: Dict[str, str] = {}
+        for chunk_id, metadata in current_metadatas.items():
+          content_hash = (metadata or {}).get("content_hash")
+          if content_hash:
+            reuse_ids.setdefault(content_hash, chunk_id)
+        written = self._store_chunks(
+          collection_name,
+          collection,
+          entries,
+          embeddings=as_matrix(embeddings)[changed] if embeddings is not None else None,
+          reuse_ids=reuse_ids,
+          embed_texts=embed_texts
+        )
+      
+      # Chunks actuels ni conservés ni réécrits
+      keep_ids = set(written) | {ids[i] for i in unchanged}
+      removed = [chunk_id for chunk_id in current_metadatas if chunk_id not in keep_ids]
+      if removed:
+        collection.delete(ids=removed)
+        self.lexical_index.delete_chunks(collection_name, removed)
+      self._delete_orphaned(collection_name, collection, released)
+      
+      # Mettre à jour les statistiques
+      if not current_metadatas and not old_refs:
+        self.stats["document_count"] += 1
+      previous = max(len(current_metadatas), len(old_refs))
+      self.stats["chunk_count"] = max(0, self.stats["chunk_count"] + len(ids) - previous)
+      self.stats["collections"][collection_name]["count"] = collection.count()
+      
+      logger.info(
+        f"Updated document {document_id} in collection '{collection_name}': "
+        f"{len(changed)} chunks written, {len(removed)} removed, {len(unchanged)} unchanged"
+      )
+      return ids
+    
+    except Exception as e:
+      logger.error(f"Failed to update document {document_id}: {str(e)}")
+      raise RuntimeError(f"Updating document in ChromaDB failed: {str(e)}")
+  
+  def _delete_orphaned(self, collection_name: str, collection, content_hashes: List[str]) -> None:
+    """Supprime les vecteurs partagés qui ne sont plus référencés par aucun chunk"""
+    if self.chunk_refs is None or not content_hashes:
+      return
+    orphaned = [
+      shared_chunk_id(content_hash)
+      for content_hash in self.chunk_refs.forget_unreferenced(collection_name, content_hashes)
+    ]
+    if orphaned:
+      collection.delete(ids=orphaned)
+      self.lexical_index.delete_chunks(collection_name, orphaned)
+  
+  def _collect_vectors(
+    self,
+    collection,
+    content_hashes: List[str],
+    texts: List[str],
+    reuse_ids: Dict[str, str],
+    embed_texts: Optional[Callable[[List[str]], np.ndarray]]
+  ) -> np.ndarray:
+    """
+    Embeddings de chunks à écrire : vecteurs déjà stockés pour le même
+    contenu (reuse_ids, hash -> ID du chunk), embed_texts pour les contenus
+    nouveaux
+    """
+    reused_ids = list({reuse_ids[h] for h in content_hashes if h in reuse_ids})
+    reused: Dict[str, np.ndarray] = {}
+    if reused_ids:
+      stored = collection.get(ids=reused_ids, include=["embeddings"])
+      for chunk_id, vector in zip(stored["ids"], as_matrix(stored["embeddings"])):
+        reused[chunk_id] = vector
+    
+    # Embeddings des contenus sans vecteur réutilisable
+    to_embed = [i for i, h in enumerate(content_hashes) if reuse_ids.get(h) not in reused]
+    if to_embed and embed_texts is None:
+      raise ValueError("No stored vector to reuse and no embed_texts function to compute it")
+    computed = as_matrix(embed_texts([texts[i] for i in to_embed])) if to_embed else None
+    
+    if computed is not None:
+      dimension = computed.shape[1]
+    elif reused:
+      dimension = len(next(iter(reused.values())))
+    else:
+      dimension = self.embedding_dimension or 0
+    vectors = np.empty((len(content_hashes), dimension), dtype=np.float32)
+    for i, content_hash in enumerate(content_hashes):
+      chunk_id = reuse_ids.get(content_hash)
+      if chunk_id in reused:
+        vectors[i] = reused[chunk_id]
+    if to_embed:
+      vectors[to_embed] = computed
+    return vectors
   
-  def get_document_chunks(self, document_id: str) -> List[Dict[str, Any]]:
+  def get_document_chunks(
+    self,
+    document_id: str,
+    collection_name: Optional[str] = None
+  ) -> List[Dict[str, Any]]:
     """
     Récupère tous les chunks d'un document
     
     Args:
         document_id: ID du document
+        collection_name: Collection cible (collection par défaut si None, voir collection_for)
         
     Returns:
         Liste des chunks du document
     """
     try:
-      results = self.collection.get(
+      results = self.get_collection(collection_name).get(
         where={"document_id": document_id},
         include=["documents", "metadatas", "embeddings"]
       )
       
       if not results or not results["ids"]:
-        logger.warning(f"No chunks found for document {document_id}")
-        return []
+        if self.chunk_refs is None or not self.chunk_refs.document_refs(collection_name or self.collection_name, document_id):
+          logger.warning(f"No chunks found for document {document_id}")
+          return []
           
       formatted_results = []
+      # Embeddings en une matrice float32 : chaque chunk en reçoit une ligne
+      embeddings = as_matrix(results["embeddings"]) if results.get("embeddings") is not None else None
       for i in range(len(results["ids"])):
         result = {
           "id": results["ids"][i],
@@ -327,10 +1130,14 @@ class ChromaVectorStoreService:
           "metadata": results["metadatas"][i] if results["metadatas"] else {}
         }
         
-        if "embeddings" in results:
-          result["embedding"] = results["embeddings"][i]
+        if embeddings is not None:
+          result["embedding"] = embeddings[i]
             
         formatted_results.append(result)
+      
+      # Occurrences du document stockées comme contenus partagés
+      formatted_results.extend(self._shared_occurrences(document_id, collection_name))
+      formatted_results.sort(key=lambda chunk: chunk["metadata"].get("chunk_index", 0))
           
       return formatted_results
         
@@ -338,11 +1145,52 @@ class ChromaVectorStoreService:
       logger.error(f"Failed to get chunks for document {document_id}: {str(e)}")
       return []
   
+  def _shared_occurrences(self, document_id: str, collection_name: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Chunks d'un document stockés comme contenus partagés, avec leur position dans le document"""
+    if self.chunk_refs is None:
+      return []
+    collection_name = collection_name or self.collection_name
+    refs = self.chunk_refs.document_refs(collection_name, document_id)
+    known = self.chunk_refs.lookup(collection_name, list(refs.values()))
+    shared = [content_hash for content_hash, state in known.items() if state is None]
+    if not shared:
+      return []
+    # Occurrences du document, avec leurs métadonnées (titre, page...)
+    references = self.chunk_refs.references(collection_name, shared, [document_id])
+    
+    results = self.get_collection(collection_name).get(
+      ids=[shared_chunk_id(content_hash) for content_hash in shared],
+      include=["documents", "metadatas", "embeddings"]
+    )
+    embeddings = as_matrix(results["embeddings"]) if results.get("embeddings") is not None else None
+    stored = {
+      chunk_id: (results["documents"][i], results["metadatas"][i] or {}, embeddings[i] if embeddings is not None else None)
+      for i, chunk_id in enumerate(results["ids"])
+    }
+    
+    occurrences = []
+    for content_hash, refs in references.items():
+      chunk_id = shared_chunk_id(content_hash)
+      if chunk_id not in stored:
+        continue
+      text, metadata, embedding = stored[chunk_id]
+      for _, index, ref_metadata in refs:
+        occurrence = {
+          "id": chunk_id,
+          "text": text,
+          "metadata": {**metadata, **ref_metadata, "document_id": document_id, "chunk_index": index}
+        }
+        if embedding is not None:
+          occurrence["embedding"] = embedding
+        occurrences.append(occurrence)
+    return occurrences
+  
   def filter_search(
     self, 
-    query_embedding: List[float],
+    query_embedding: np.ndarray,
     filters: Dict[str, Any],
-    k: int = 5
+    k: int = 5,
+    collection_name: Optional[str] = None
   ) -> List[Dict[str, Any]]:
     """
     Recherche avec filtrage avancé sur les métadonnées
@@ -351,6 +1199,7 @@ class ChromaVectorStoreService:
       query_embedding: Vecteur d'embedding de la requête
       filters: Critères de filtrage des résultats
       k: Nombre de résultats à retourner
+      collection_name: Collection cible (collection par défaut si None, voir collection_for)
         
     Returns:
         Liste des chunks correspondants
@@ -358,7 +1207,8 @@ class ChromaVectorStoreService:
     return self.search(
       query_embedding=query_embedding,
       k=k,
-      filter_criteria=filters
+      filter_criteria=filters,
+      collection_name=collection_name
     )
   
   def get_stats(self) -> Dict[str, Any]:
@@ -370,8 +1220,13 @@ class ChromaVectorStoreService:
     """
     # Mettre à jour les statistiques avant de les retourner
     try:
-      self.stats["collections"][self.collection_name]["count"] = self.collection.count()
-      self.stats["chunk_count"] = self.collection.count()
+      collection = self.get_collection(self.collection_name)
+      self.stats["collections"][self.collection_name]["count"] = collection.count()
+      self.stats["chunk_count"] = sum(stats["count"] for stats in self.stats["collections"].values())
+      self.stats["open_collections"] = self._collections.get_stats()
+      self.stats["lexical_index"] = self.lexical_index.get_stats()
+      if self.chunk_refs is not None:
+        self.stats["chunk_refs"] = self.chunk_refs.get_stats()
     except Exception:
       pass
         
@@ -410,7 +1265,7 @@ class ChromaVectorStoreService:
       Succès de l'opération
     """
     try:
-      collection_metadata = metadata or {"dimension": self.embedding_dimension}
+      collection_metadata = metadata or self._collection_metadata()
       
       # Créer la collection
       self.client.create_collection(
@@ -433,7 +1288,9 @@ class ChromaVectorStoreService:
   
   def use_collection(self, name: str) -> bool:
     """
-    Change la collection active
+    Change la collection par défaut (utilisée quand une opération ne précise
+    pas de collection) ; à réserver à la configuration : les requêtes
+    concurrentes doivent passer collection_name à chaque opération
     
     Args:
       name: Nom de la collection
@@ -442,17 +1299,9 @@ class ChromaVectorStoreService:
       Succès de l'opération
     """
     try:
-      self.collection = self.client.get_collection(name=name)
+      self.get_collection(name)
       self.collection_name = name
-      
-      # Mettre à jour les statistiques
-      if name not in self.stats["collections"]:
-        self.stats["collections"][name] = {
-          "count": self.collection.count(),
-          "metadata": self.collection.metadata
-        }
-          
-      logger.info(f"Switched to collection '{name}'")
+      logger.info(f"Default collection set to '{name}'")
       return True
     except Exception as e:
       logger.error(f"Failed to switch to collection '{name}': {str(e)}")
@@ -467,7 +1316,8 @@ class ChromaVectorStoreService:
     """
     try:
       collections = self.client.list_collections()
-      return [collection.name for collection in collections]
+      # Objets Collection ou noms selon la version de ChromaDB
+      return [getattr(collection, "name", collection) for collection in collections]
     except Exception as e:
       logger.error(f"Failed to list collections: {str(e)}")
       return []
@@ -0,0 +1,85 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+class TTLCache:
+  """
+  Cache mémoire borné (LRU) avec expiration des entrées, utilisable entre threads
+  """
+
+  def __init__(self, maxsize: int = 1024, ttl: float = 300.0):
+    """
+    Args:
+      maxsize: Nombre maximal d'entrées
+      ttl: Durée de vie d'une entrée en secondes
+    """
+    self.maxsize = maxsize
+    self.ttl = ttl
+    self.hits = 0
+    self.misses = 0
+    self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key: Hashable, default: Any = None) -> Any:
+    """Retourne la valeur associée à la clé si elle existe et n'a pas expiré"""
+    with self._lock:
+      item = self._data.get(key)
+      if item is None:
+        self.misses += 1
+        return default
+      value, expires_at = item
+      if expires_at < time.monotonic():
+        del self._data[key]
+        self.misses += 1
+        return default
+      self._data.move_to_end(key)
+      self.hits += 1
+      return value
+
+  def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+    """Ajoute ou remplace une entrée, en évinçant la plus ancienne si le cache est plein"""
+    with self._lock:
+      self._data[key] = (value, time.monotonic() + (ttl if ttl is not None else self.ttl))
+      self._data.move_to_end(key)
+      while len(self._data) > self.maxsize:
+        self._data.popitem(last=False)
+
+  def pop(self, key: Hashable) -> Any:
+    """Supprime une entrée et retourne sa valeur (None si absente)"""
+    with self._lock:
+      item = self._data.pop(key, None)
+      return item[0] if item else None
+
+  def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+    """
+    Supprime les entrées dont la clé vérifie le prédicat
+
+    Returns:
+      Nombre d'entrées supprimées
+    """
+    with self._lock:
+      keys = [key for key in self._data if predicate(key)]
+      for key in keys:
+        del self._data[key]
+      return len(keys)
+
+  def clear(self) -> None:
+    """Vide le cache"""
+    with self._lock:
+      self._data.clear()
+
+  def __len__(self) -> int:
+    return len(self._data)
+
+  def get_stats(self) -> Dict[str, Any]:
+    """Statistiques du cache"""
+    lookups = self.hits + self.misses
+    return {
+      "entries": len(self._data),
+      "maxsize": self.maxsize,
+      "ttl": self.ttl,
+      "hits": self.hits,
+      "misses": self.misses,
+      "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+    }
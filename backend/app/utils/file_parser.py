@@ -1,64 +1,201 @@
 import os
-from pdfminer.high_level import extract_text as extract_pdf_text
-from pdfminer.layout import LAParams
+from collections import deque
+from concurrent.futures import Executor
+from contextlib import contextmanager
+from itertools import count, islice
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams, LTContainer, LTText, LTTextBox
+from pdfminer.pdfpage import PDFPage
 from docx import Document as DocxDocument
 from io import BytesIO
 import re
 import chardet
-from typing import Dict, List, Any, Optional
+from typing import BinaryIO, Dict, Iterator, List, Any, Optional, Tuple, Union
 
-from app.utils.text_processing import create_semantic_chunks
+from app.utils.text_processing import create_chunk_spans
 
-def parse_pdf(file_content: bytes, extract_metadata: bool = True) -> Dict[str, Any]:
+# Source d'un fichier à analyser : contenu binaire ou chemin sur disque
+FileSource = Union[bytes, str, os.PathLike]
+
+@contextmanager
+def _open_source(source: FileSource) -> Iterator[BinaryIO]:
+  """Ouvre une source de fichier (contenu binaire ou chemin) en lecture binaire"""
+  if isinstance(source, bytes):
+    yield BytesIO(source)
+  else:
+    with open(source, 'rb') as fp:
+      yield fp
+
+def _read_source(source: FileSource) -> bytes:
+  """Lit le contenu complet d'une source de fichier"""
+  with _open_source(source) as fp:
+    return fp.read()
+
+def _pdf_laparams() -> LAParams:
+  """Paramètres améliorés pour l'extraction"""
+  return LAParams(
+    line_margin=0.5,      # Meilleure détection des lignes
+    word_margin=0.1,      # Espacement des mots optimisé
+    char_margin=2.0,      # Meilleure détection des caractères
+    detect_vertical=True, # Détecte le texte en orientation verticale
+    all_texts=True        # Récupérer tout le texte
+  )
+
+def count_pdf_pages(source: FileSource) -> int:
+  """
+  Compte les pages d'un fichier PDF sans en extraire le texte
+  
+  Args:
+    source: Contenu binaire ou chemin du fichier PDF
+      
+  Returns:
+    Nombre de pages
+  """
+  with _open_source(source) as fp:
+    return sum(1 for _ in PDFPage.get_pages(fp))
+
+def _layout_text(item: Any) -> str:
+  """Texte d'un élément de mise en page pdfminer (comme TextConverter)"""
+  if isinstance(item, LTTextBox):
+    return item.get_text() + "\n"
+  if isinstance(item, LTText):
+    return item.get_text()
+  if isinstance(item, LTContainer):
+    return "".join(_layout_text(child) for child in item)
+  return ""
+
+def iter_pdf_pages(
+  source: FileSource,
+  page_numbers: Optional[List[int]] = None
+) -> Iterator[Tuple[int, str]]:
+  """
+  Extrait le texte d'un PDF page par page, sans charger tout le document
+  
+  Args:
+    source: Contenu binaire ou chemin du fichier PDF
+    page_numbers: Numéros des pages à extraire (à partir de 0), toutes si None
+      
+  Yields:
+    (numéro de page à partir de 1, texte brut de la page)
+  """
+  # pdfminer numérote les pages traitées et non les pages du document
+  page_indexes = sorted(page_numbers) if page_numbers is not None else count()
+  with _open_source(source) as fp:
+    layouts = extract_pages(fp, page_numbers=page_numbers, laparams=_pdf_laparams())
+    for page_index, page_layout in zip(page_indexes, layouts):
+      yield page_index + 1, _layout_text(page_layout)
+
+def clean_pdf_text(text: str) -> str:
+  """
+  Prétraitement du texte brut extrait d'un PDF
+  
+  Args:
+    text: Texte brut d'une page
+      
+  Returns:
+    Texte normalisé, avec paragraphes et titres marqués
+  """
+  # Prétraitement avancé
+  # Conserver les sauts de paragraphes significatifs
+  text = re.sub(r'\n\s*\n', '[PARA]', text)  # Marquer les paragraphes
+  text = re.sub(r'\s+', ' ', text)           # Normaliser les espaces
+  text = text.replace('[PARA]', '\n\n')      # Restaurer les paragraphes
+  
+  # Détecter et préserver les titres potentiels 
+  # (texte court suivi d'un saut de ligne)
+  return re.sub(r'([A-Z][^.!?]{0,60})\n\n', r'[TITLE]\1[/TITLE]\n\n', text)
+
+def _text_chunks(text: str, **chunk_metadata: Any) -> List[Dict[str, Any]]:
+  """
+  Chunks {"text", "start_offset", "end_offset", ...} d'un texte, avec des
+  métadonnées communes (page, etc.) ; les positions sont relatives à ce texte
+  """
+  return [
+    {"text": text[start:end], "start_offset": start, "end_offset": end, **chunk_metadata}
+    for start, end in create_chunk_spans(text)
+    if not text[start:end].isspace()
+  ]
+
+def iter_pdf_chunks(
+  source: FileSource,
+  page_numbers: Optional[List[int]] = None
+) -> Iterator[Dict[str, Any]]:
+  """
+  Découpe un PDF en chunks au fil des pages : la mémoire utilisée dépend de
+  la taille d'une page et non de celle du document
+  
+  Args:
+    source: Contenu binaire ou chemin du fichier PDF
+    page_numbers: Numéros des pages à traiter (à partir de 0), toutes si None
+      
+  Yields:
+    Chunks {"text", "page_number"} dans l'ordre du document
+  """
+  for page_number, page_text in iter_pdf_pages(source, page_numbers):
+    yield from _text_chunks(clean_pdf_text(page_text), page_number=page_number)
+
+def parse_pdf_pages(source: FileSource, page_numbers: List[int]) -> Dict[str, Any]:
+  """
+  Analyse une plage de pages d'un PDF (tâche d'un ProcessPoolExecutor)
+  
+  Args:
+    source: Contenu binaire ou chemin du fichier PDF
+    page_numbers: Numéros des pages à traiter (à partir de 0)
+      
+  Returns:
+    Document partiel contenant les chunks des pages demandées
+  """
+  try:
+    chunks = list(iter_pdf_chunks(source, page_numbers))
+  except Exception as e:
+    raise ValueError(f"PDF parsing failed: {str(e)}")
+  
+  return {
+    "chunks": chunks,
+    "file_type": "pdf"
+  }
+
+def parse_pdf(
+  source: FileSource,
+  extract_metadata: bool = True,
+  include_structure: bool = False
+) -> Dict[str, Any]:
   """
   Extraction améliorée de texte depuis un fichier PDF
   
   Args:
-    file_content: Contenu binaire du fichier PDF
+    source: Contenu binaire ou chemin du fichier PDF
     extract_metadata: Extraire les métadonnées du document
+    include_structure: Calculer aussi "structured_text" (non utilisé par l'indexation)
       
   Returns:
     Dict contenant le texte structuré et les métadonnées
   """
   try:
-    # Paramètres améliorés pour l'extraction
-    laparams = LAParams(
-      line_margin=0.5,  # Meilleure détection des lignes
-      word_margin=0.1,  # Espacement des mots optimisé
-      char_margin=2.0,  # Meilleure détection des caractères
-      all_texts=True    # Récupérer tout le texte
-    )
-    
-    # Extraction avec gestion de la mise en page
-    text = extract_pdf_text(
-      BytesIO(file_content),
-      laparams=laparams,
-      detect_vertical=True  # Détecte le texte en orientation verticale
-    )
+    pages = []
+    chunks = []
     
-    # Prétraitement avancé
-    # Conserver les sauts de paragraphes significatifs
-    text = re.sub(r'\n\s*\n', '[PARA]', text)  # Marquer les paragraphes
-    text = re.sub(r'\s+', ' ', text)           # Normaliser les espaces
-    text = text.replace('[PARA]', '\n\n')      # Restaurer les paragraphes
+    # Extraction page par page avec gestion de la mise en page
+    for page_number, page_text in iter_pdf_pages(source):
+      page_text = clean_pdf_text(page_text)
+      pages.append(page_text)
+      chunks.extend(_text_chunks(page_text, page_number=page_number))
     
-    # Détecter et préserver les titres potentiels 
-    # (texte court suivi d'un saut de ligne)
-    text = re.sub(r'([A-Z][^.!?]{0,60})\n\n', r'[TITLE]\1[/TITLE]\n\n', text)
+    text = "\n\n".join(pages)
     
     result = {
       "text": text.strip(),
-      "structured_text": structure_text(text),
-      "chunks": create_semantic_chunks(text),
+      "chunks": chunks,
       "file_type": "pdf"
     }
     
+    if include_structure:
+      result["structured_text"] = structure_text(text)
+    
     # Extraction des métadonnées si demandé
     if extract_metadata:
-      # Note: Dans un système réel, vous utiliseriez PyPDF2 ou PyMuPDF 
-      # pour extraire les métadonnées
       result["metadata"] = {
-          "estimated_page_count": len(re.findall(r'\f', text)) + 1
+          "page_count": len(pages)
       }
         
     return result
@@ -66,19 +203,25 @@ def parse_pdf(file_content: bytes, extract_metadata: bool = True) -> Dict[str, A
   except Exception as e:
     raise ValueError(f"PDF parsing failed: {str(e)}")
 
-def parse_docx(file_content: bytes, extract_metadata: bool = True) -> Dict[str, Any]:
+def parse_docx(
+  source: FileSource,
+  extract_metadata: bool = True,
+  include_structure: bool = False
+) -> Dict[str, Any]:
   """
   Extraction améliorée de texte depuis un fichier DOCX
   
   Args:
-    file_content: Contenu binaire du fichier DOCX
+    source: Contenu binaire ou chemin du fichier DOCX
     extract_metadata: Extraire les métadonnées du document
+    include_structure: Inclure "structured_content" et "sections" dans le résultat
       
   Returns:
     Dict contenant le texte structuré et les métadonnées
   """
   try:
-    doc = DocxDocument(BytesIO(file_content))
+    with _open_source(source) as fp:
+      doc = DocxDocument(fp)
     
     # Extraction du texte avec conservation de la structure
     sections = []
@@ -137,12 +280,14 @@ def parse_docx(file_content: bytes, extract_metadata: bool = True) -> Dict[str,
 
     result = {
       "text": full_text,
-      "structured_content": structured_content,
-      "sections": sections,
-      "chunks": create_semantic_chunks(full_text),
+      "chunks": _text_chunks(full_text),
       "file_type": "docx"
     }
     
+    if include_structure:
+      result["structured_content"] = structured_content
+      result["sections"] = sections
+    
     # Extraction des métadonnées si demandé
     if extract_metadata:
       core_props = doc.core_properties
@@ -158,18 +303,20 @@ def parse_docx(file_content: bytes, extract_metadata: bool = True) -> Dict[str,
   except Exception as e:
     raise ValueError(f"DOCX parsing failed: {str(e)}")
 
-def parse_txt(file_content: bytes) -> Dict[str, Any]:
+def parse_txt(source: FileSource, include_structure: bool = False) -> Dict[str, Any]:
   """
   Extraction robuste de texte depuis un fichier texte
   
   Args:
-      file_content: Contenu binaire du fichier texte
-      filename: Nom du fichier pour contexte
+      source: Contenu binaire ou chemin du fichier texte
+      include_structure: Calculer aussi "structured_text" (non utilisé par l'indexation)
       
   Returns:
       Dict contenant le texte et les informations structurées
   """
   try:
+    file_content = _read_source(source)
+    
     # Détection automatique de l'encodage
     detected = chardet.detect(file_content)
     encoding = detected['encoding'] if detected['confidence'] > 0.7 else 'utf-8'
@@ -201,15 +348,16 @@ def parse_txt(file_content: bytes) -> Dict[str, Any]:
     # Identifier les titres potentiels (lignes courtes suivies de lignes vides)
     text = re.sub(r'\n([A-Z][^\n]{0,50})\n\n', r'\n[TITLE]\1[/TITLE]\n\n', text)
     
-    # Reconstruire structure
-    structured_text = structure_text(text)
-    
+    text = text.strip()
     result = {
-      "text": text.strip(),
-      "structured_text": structured_text,
-      "chunks": create_semantic_chunks(text),
+      "text": text,
+      "chunks": _text_chunks(text),
       "file_type": "txt",
     }
+    
+    # Reconstruire structure
+    if include_structure:
+      result["structured_text"] = structure_text(text)
         
     return result
       
@@ -271,4 +419,86 @@ def structure_text(text: str) -> List[Dict[str, Any]]:
       "text": para.strip()
     })
       
-  return structured_elements
\ No newline at end of file
+  return structured_elements
+
+PDF_MIME_TYPE = 'application/pdf'
+
+# Mappage des types MIME aux parseurs
+FILE_PARSERS = {
+  PDF_MIME_TYPE: parse_pdf,
+  'application/vnd.openxmlformats-officedocument.wordprocessingml.document': parse_docx,
+  'text/plain': parse_txt
+}
+
+def parse_file(content_type: str, source: FileSource) -> Dict[str, Any]:
+  """
+  Analyse un fichier selon son type MIME
+  
+  Fonction de module (sérialisable) destinée à être exécutée dans un
+  ProcessPoolExecutor, hors du processus de l'API
+  
+  Args:
+    content_type: Type MIME du fichier
+    source: Contenu binaire ou chemin du fichier
+      
+  Returns:
+    Document analysé : liste canonique des chunks à embedder et indexer
+  """
+  parse_func = FILE_PARSERS[content_type]
+  return parse_func(source)
+
+def parse_file_batches(
+  executor: Executor,
+  content_type: str,
+  source: FileSource,
+  pages_per_task: int = 16,
+  max_pending: int = 4
+) -> Iterator[Dict[str, Any]]:
+  """
+  Analyse un fichier dans un pool de processus, par lots successifs
+  
+  Les PDF sont découpés en plages de pages_per_task pages analysées en
+  parallèle par les workers ; les lots sont produits dans l'ordre des pages
+  et au plus max_pending plages sont en cours à la fois, ce qui borne la
+  mémoire. Les autres formats produisent un seul lot.
+  
+  Args:
+    executor: Pool de processus (ProcessPoolExecutor)
+    content_type: Type MIME du fichier
+    source: Chemin du fichier (ou contenu binaire)
+    pages_per_task: Nombre de pages analysées par tâche
+    max_pending: Nombre maximal de plages de pages en cours d'analyse
+      
+  Yields:
+    Documents analysés partiels ("chunks", "metadata")
+  """
+  if content_type != PDF_MIME_TYPE:
+    yield executor.submit(parse_file, content_type, source).result()
+    return
+  
+  try:
+    page_count = executor.submit(count_pdf_pages, source).result()
+  except Exception as e:
+    raise ValueError(f"PDF parsing failed: {str(e)}")
+  
+  page_ranges = iter([
+    list(range(start, min(start + pages_per_task, page_count)))
+    for start in range(0, page_count, pages_per_task)
+  ])
+  pending = deque(
+    executor.submit(parse_pdf_pages, source, page_numbers)
+    for page_numbers in islice(page_ranges, max_pending)
+  )
+  
+  try:
+    while pending:
+      batch = pending.popleft().result()
+      next_range = next(page_ranges, None)
+      if next_range is not None:
+        pending.append(executor.submit(parse_pdf_pages, source, next_range))
+      
+      batch["metadata"] = {"page_count": page_count}
+      yield batch
+  finally:
+    for future in pending:
+      future.cancel()
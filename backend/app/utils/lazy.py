@@ -0,0 +1,32 @@
+import threading
+from typing import Callable, Generic, Optional, TypeVar
+
+T = TypeVar("T")
+
+class LazySingleton(Generic[T]):
+  """
+  Instance unique créée au premier accès (et non à l'import du module),
+  utilisable entre threads
+  """
+
+  def __init__(self, factory: Callable[[], T]):
+    """
+    Args:
+      factory: Fonction qui construit l'instance
+    """
+    self._factory = factory
+    self._instance: Optional[T] = None
+    self._lock = threading.Lock()
+
+  def get(self) -> T:
+    """Retourne l'instance, en la créant au premier appel"""
+    if self._instance is None:
+      with self._lock:
+        if self._instance is None:
+          self._instance = self._factory()
+    return self._instance
+
+  @property
+  def loaded(self) -> bool:
+    """Indique si l'instance a déjà été créée"""
+    return self._instance is not None
@@ -1,60 +1,174 @@
-
-from typing import Dict, List, Any
-import nltk
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
+import logging
+import os
 import re
 
-# Télécharger les ressources NLTK nécessaires (à exécuter une fois)
-nltk.download('punkt')
-nltk.download('stopwords')
+from app.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Les données NLTK (punkt) sont fournies avec l'image (voir Dockerfile) ou via NLTK_DATA ;
+# elles ne sont téléchargées à la première utilisation que si NLTK_AUTO_DOWNLOAD=true
+NLTK_AUTO_DOWNLOAD = os.getenv('NLTK_AUTO_DOWNLOAD', 'false').lower() == 'true'
+
+# Taille des chunks en tokens (~1000 / ~100 caractères)
+DEFAULT_MAX_CHUNK_TOKENS = 256
+DEFAULT_OVERLAP_TOKENS = 25
+
+# Fin de phrase pour le découpage de secours (sans NLTK)
+SENTENCE_BREAK_RE = re.compile(r'(?<=[.!?])\s+')
+
+Span = Tuple[int, int]
 
-def create_semantic_chunks(text: str, max_chunk_size: int = 1000, overlap: int = 100) -> List[Dict[str, Any]]:
+def _regex_sentence_spans(text: str) -> List[Span]:
+  """Positions des phrases séparées par une ponctuation finale suivie d'espaces"""
+  spans = []
+  start = 0
+  for match in SENTENCE_BREAK_RE.finditer(text):
+    spans.append((start, match.start()))
+    start = match.end()
+  spans.append((start, len(text)))
+  return spans
+
+@lru_cache(maxsize=1)
+def load_sentence_tokenizer() -> Optional[Callable[[str], List[str]]]:
   """
-  Crée des chunks sémantiques optimisés pour RAG
+  Charge le tokenizer de phrases NLTK, une seule fois par processus
+  
+  Returns:
+    nltk.sent_tokenize, ou None si NLTK ou ses données ne sont pas disponibles
+  """
+  try:
+    import nltk
+  except ImportError:
+    logger.warning("NLTK is not installed, using regex sentence splitting")
+    return None
+  
+  try:
+    nltk.sent_tokenize("Test.")
+    return nltk.sent_tokenize
+  except LookupError:
+    if not NLTK_AUTO_DOWNLOAD:
+      logger.warning("NLTK punkt data not found, using regex sentence splitting")
+      return None
+  
+  # punkt_tab pour NLTK >= 3.8.2, punkt pour les versions antérieures
+  for resource in ('punkt_tab', 'punkt'):
+    nltk.download(resource, quiet=True)
+  try:
+    nltk.sent_tokenize("Test.")
+    return nltk.sent_tokenize
+  except LookupError:
+    logger.warning("NLTK punkt data could not be downloaded, using regex sentence splitting")
+    return None
+
+def _is_blank(text: str, start: int, end: int) -> bool:
+  """Indique si text[start:end] est vide ou ne contient que des espaces"""
+  return start >= end or text[start:end].isspace()
+
+def sentence_spans(text: str) -> List[Span]:
+  """
+  Positions (début, fin) des phrases d'un texte
+  
+  Les phrases de NLTK sont relocalisées dans le texte source en avançant
+  un curseur, ce qui reste linéaire et ne copie pas le texte
   
   Args:
-    text: Texte à découper en chunks
-    max_chunk_size: Taille maximale d'un chunk en caractères
-    overlap: Nombre de caractères de chevauchement entre chunks
+    text: Texte à segmenter
       
   Returns:
-    Liste de chunks avec métadonnées
+    Liste de (début, fin) des phrases non vides (hors espaces), dans l'ordre
   """
-  # Utiliser NLTK pour une segmentation plus précise
-  try:
-    sentences = nltk.sent_tokenize(text)
-  except:
+  sent_tokenize = load_sentence_tokenizer()
+  if sent_tokenize is None:
     # Fallback simple si NLTK n'est pas disponible
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    return [(start, end) for start, end in _regex_sentence_spans(text) if not _is_blank(text, start, end)]
+  sentences = sent_tokenize(text)
+
+  spans = []
+  position = 0
+  for sentence in sentences:
+    start = text.find(sentence, position)
+    if start < 0:
+      # Phrase normalisée par le tokenizer : repli sur le découpage regex
+      return [(start, end) for start, end in _regex_sentence_spans(text) if not _is_blank(text, start, end)]
+    position = start + len(sentence)
+    if not _is_blank(text, start, position):
+      spans.append((start, position))
+  return spans
+
+def create_chunk_spans(
+  text: str,
+  max_chunk_tokens: int = DEFAULT_MAX_CHUNK_TOKENS,
+  overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+  token_counter: Optional[Callable[[str], int]] = None
+) -> List[Span]:
+  """
+  Découpe un texte en chunks de phrases entières, bornés en tokens
+  
+  Chaque phrase est mesurée une seule fois ; les chunks sont des fenêtres
+  glissantes sur la liste des phrases, avec un chevauchement de phrases
+  précédentes. Une phrase plus longue que max_chunk_tokens forme un chunk à elle seule
+  
+  Args:
+    text: Texte à découper
+    max_chunk_tokens: Taille maximale d'un chunk en tokens
+    overlap_tokens: Nombre maximal de tokens de chevauchement entre chunks
+    token_counter: Fonction de comptage des tokens (tiktoken par défaut)
+      
+  Returns:
+    Liste de (début, fin) des chunks dans le texte source
+  """
+  counter = token_counter or count_tokens
+  spans = sentence_spans(text)
+  tokens = [counter(text[start:end]) for start, end in spans]
   
   chunks = []
-  current_chunk = ""
-  current_sentences = []
+  first = 0  # Première phrase du chunk courant
+  chunk_tokens = 0
   
-  for sentence in sentences:
-    if len(current_chunk) + len(sentence) <= max_chunk_size or not current_chunk:
-      current_chunk += " " + sentence if current_chunk else sentence
-      current_sentences.append(sentence)
-    else:
+  for i, sentence_tokens in enumerate(tokens):
+    if chunk_tokens + sentence_tokens > max_chunk_tokens and i > first:
       # Finaliser le chunk courant
-      chunks.append(current_chunk.strip())
+      chunks.append((spans[first][0], spans[i - 1][1]))
       
-      # Commencer un nouveau chunk avec chevauchement
-      overlap_text = ""
-      overlap_sentences = []
-      
-      # Ajouter des phrases précédentes jusqu'à atteindre le chevauchement souhaité
-      for prev_sentence in reversed(current_sentences):
-        if len(overlap_text) + len(prev_sentence) <= overlap:
-          overlap_text = prev_sentence + " " + overlap_text
-          overlap_sentences.insert(0, prev_sentence)
-        else:
-          break
-      
-      current_chunk = overlap_text + sentence
-      current_sentences = overlap_sentences + [sentence]
+      # Commencer un nouveau chunk avec les phrases précédentes qui tiennent dans le chevauchement
+      next_first = i
+      overlap = 0
+      while next_first > first and overlap + tokens[next_first - 1] <= overlap_tokens:
+        next_first -= 1
+        overlap += tokens[next_first]
+      first = next_first
+      chunk_tokens = overlap
+    
+    chunk_tokens += sentence_tokens
   
   # Ajouter le dernier chunk s'il n'est pas vide
-  if current_chunk:
-    chunks.append(current_chunk.strip())
+  if first < len(spans):
+    chunks.append((spans[first][0], spans[-1][1]))
   
   return chunks
+
+def create_semantic_chunks(
+  text: str,
+  max_chunk_tokens: int = DEFAULT_MAX_CHUNK_TOKENS,
+  overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+  token_counter: Optional[Callable[[str], int]] = None
+) -> List[str]:
+  """
+  Crée des chunks sémantiques optimisés pour RAG
+  
+  Args:
+    text: Texte à découper en chunks
+    max_chunk_tokens: Taille maximale d'un chunk en tokens
+    overlap_tokens: Nombre de tokens de chevauchement entre chunks
+    token_counter: Fonction de comptage des tokens (tiktoken par défaut)
+      
+  Returns:
+    Liste des textes des chunks (voir create_chunk_spans pour les positions)
+  """
+  return [
+    text[start:end]
+    for start, end in create_chunk_spans(text, max_chunk_tokens, overlap_tokens, token_counter)
+  ]
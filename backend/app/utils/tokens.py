@@ -0,0 +1,36 @@
+from functools import lru_cache
+from typing import Optional
+
+try:
+  import tiktoken
+except ImportError:  # pragma: no cover - tiktoken est optionnel
+  tiktoken = None
+
+# Ratio moyen caractères/token utilisé quand tiktoken n'est pas installé
+CHARS_PER_TOKEN = 4
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: Optional[str]):
+  """Retourne l'encodage tiktoken du modèle (cl100k_base par défaut)"""
+  if tiktoken is None:
+    return None
+  try:
+    return tiktoken.encoding_for_model(model) if model else tiktoken.get_encoding("cl100k_base")
+  except KeyError:
+    return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+  """
+  Compte le nombre de tokens d'un texte
+  
+  Args:
+    text: Texte à mesurer
+    model: Nom du modèle dont on utilise le tokenizer
+      
+  Returns:
+    Nombre de tokens (estimation si tiktoken n'est pas disponible)
+  """
+  encoding = _get_encoding(model)
+  if encoding is None:
+    return len(text) // CHARS_PER_TOKEN + 1
+  return len(encoding.encode(text, disallowed_special=()))
@@ -0,0 +1,27 @@
+from typing import Any, Optional
+
+import numpy as np
+
+# Type des embeddings échangés entre les services : float32, une ligne par vecteur
+VECTOR_DTYPE = np.float32
+
+def as_matrix(vectors: Any, dimension: Optional[int] = None) -> np.ndarray:
+  """
+  Matrice float32 contiguë, une ligne par vecteur
+
+  Accepte une matrice NumPy, une liste de tableaux ou une liste de listes ;
+  une matrice déjà au bon format est retournée sans copie.
+
+  Args:
+    vectors: Vecteurs à convertir (un seul vecteur donne une matrice d'une ligne)
+    dimension: Nombre de colonnes d'une matrice vide
+
+  Returns:
+    Matrice (nombre de vecteurs, dimension)
+  """
+  if vectors is None or len(vectors) == 0:
+    return np.zeros((0, dimension or 0), dtype=VECTOR_DTYPE)
+  matrix = np.ascontiguousarray(vectors, dtype=VECTOR_DTYPE)
+  if matrix.ndim == 1:
+    matrix = matrix.reshape(1, -1)
+  return matrix
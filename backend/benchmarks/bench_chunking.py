@@ -0,0 +1,89 @@
+"""
+Micro-benchmark du découpage en chunks sur un corpus synthétique
+
+Compare l'ancien découpage (concaténations de chaînes, tailles en caractères)
+à create_chunk_spans (positions de phrases, tailles en tokens).
+
+Usage (depuis backend/) :
+  python -m benchmarks.bench_chunking --pages 500
+"""
+import argparse
+import random
+import re
+import time
+from typing import List
+
+from app.utils.text_processing import create_chunk_spans, sentence_spans
+
+WORDS = (
+  "le la les un une des document recherche modèle réponse question contexte "
+  "données analyse système utilisateur résultat processus méthode valeur "
+  "vecteur index requête texte page section chapitre conclusion"
+).split()
+
+def make_corpus(pages: int, sentences_per_page: int = 30, seed: int = 42) -> str:
+  """Texte synthétique d'environ 3000 caractères par page"""
+  rng = random.Random(seed)
+  page_texts = []
+  for _ in range(pages):
+    sentences = []
+    for _ in range(sentences_per_page):
+      words = rng.choices(WORDS, k=rng.randint(8, 25))
+      sentences.append(" ".join(words).capitalize() + rng.choice([".", ".", ".", "?", "!"]))
+    page_texts.append(" ".join(sentences))
+  return "\n\n".join(page_texts)
+
+def legacy_chunks(text: str, max_chunk_size: int = 1000, overlap: int = 100) -> List[str]:
+  """Ancienne implémentation de create_semantic_chunks (avec le même découpage en phrases)"""
+  sentences = [text[start:end] for start, end in sentence_spans(text)]
+  chunks = []
+  current_chunk = ""
+  current_sentences = []
+
+  for sentence in sentences:
+    if len(current_chunk) + len(sentence) <= max_chunk_size or not current_chunk:
+      current_chunk += " " + sentence if current_chunk else sentence
+      current_sentences.append(sentence)
+    else:
+      chunks.append(current_chunk.strip())
+      overlap_text = ""
+      overlap_sentences = []
+      for prev_sentence in reversed(current_sentences):
+        if len(overlap_text) + len(prev_sentence) <= overlap:
+          overlap_text = prev_sentence + " " + overlap_text
+          overlap_sentences.insert(0, prev_sentence)
+        else:
+          break
+      current_chunk = overlap_text + sentence
+      current_sentences = overlap_sentences + [sentence]
+
+  if current_chunk:
+    chunks.append(current_chunk.strip())
+  return chunks
+
+def bench(name: str, func, repeat: int) -> None:
+  timings = []
+  for _ in range(repeat):
+    start = time.perf_counter()
+    result = func()
+    timings.append(time.perf_counter() - start)
+  print(f"{name:<28} {min(timings) * 1000:10.1f} ms  ({len(result)} éléments)")
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--pages", type=int, default=500)
+  parser.add_argument("--repeat", type=int, default=3)
+  args = parser.parse_args()
+
+  text = make_corpus(args.pages)
+  print(f"Corpus: {args.pages} pages, {len(text)} caractères")
+
+  chars_per_token = lambda sentence: len(sentence) // 4 + 1
+
+  bench("phrases (sentence_spans)", lambda: sentence_spans(text), args.repeat)
+  bench("legacy (caractères)", lambda: legacy_chunks(text), args.repeat)
+  bench("spans (caractères/4)", lambda: create_chunk_spans(text, token_counter=chars_per_token), args.repeat)
+  bench("spans (tokenizer)", lambda: create_chunk_spans(text), args.repeat)
+
+if __name__ == "__main__":
+  main()
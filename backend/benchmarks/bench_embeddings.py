@@ -0,0 +1,56 @@
+"""
+Débit du backend d'embedding local (sentence-transformers, CPU), sans réseau
+
+Usage (depuis backend/, avec le même .env que l'API) :
+  python -m benchmarks.bench_embeddings --texts 2000 --runtime torch --threads 4
+  python -m benchmarks.bench_embeddings --runtime onnx --onnx-file onnx/model_qint8_avx512.onnx
+"""
+import argparse
+import time
+
+from app.core.config import settings
+from app.services.EmbeddingBackends import SentenceTransformerEmbeddingBackend
+from app.services.EmbeddingService import EmbeddingService
+from benchmarks.bench_chunking import make_corpus
+from app.utils.text_processing import create_semantic_chunks
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--texts", type=int, default=2000, help="Nombre de chunks à embedder")
+  parser.add_argument("--model", default=settings.LOCAL_EMBEDDING_MODEL)
+  parser.add_argument("--runtime", default=settings.LOCAL_EMBEDDING_RUNTIME, choices=["torch", "onnx", "openvino"])
+  parser.add_argument("--threads", type=int, default=settings.LOCAL_EMBEDDING_THREADS)
+  parser.add_argument("--batch-size", type=int, default=settings.LOCAL_EMBEDDING_BATCH_SIZE)
+  parser.add_argument("--quantize", action="store_true")
+  parser.add_argument("--onnx-file", default=settings.LOCAL_EMBEDDING_ONNX_FILE)
+  args = parser.parse_args()
+
+  chunks = []
+  pages = 50
+  while len(chunks) < args.texts:
+    chunks = create_semantic_chunks(make_corpus(pages))
+    pages *= 2
+  chunks = chunks[:args.texts]
+
+  backend = SentenceTransformerEmbeddingBackend(
+    model=args.model,
+    batch_size=args.batch_size,
+    threads=args.threads,
+    runtime=args.runtime,
+    quantize=args.quantize,
+    onnx_file=args.onnx_file
+  )
+  start = time.perf_counter()
+  backend.warm_up()
+  print(f"Chargement + warm-up : {time.perf_counter() - start:.2f} s (dimension {backend.dimension})")
+
+  # Sans le cache persistant, pour mesurer le modèle
+  service = EmbeddingService(backend=backend)
+  service.cache = None
+  start = time.perf_counter()
+  embeddings = service.get_embeddings(chunks)
+  elapsed = time.perf_counter() - start
+  print(f"{len(embeddings)} chunks en {elapsed:.2f} s : {len(embeddings) / elapsed:.1f} chunks/s")
+
+if __name__ == "__main__":
+  main()
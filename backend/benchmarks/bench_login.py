@@ -0,0 +1,77 @@
+"""
+Effet d'une vague de connexions sur la boucle d'événements de l'API
+
+Lance --logins vérifications de mot de passe bcrypt simultanées pendant
+qu'une tâche "chat" se réveille toutes les --tick-ms millisecondes, et mesure
+le retard de ses réveils. Compare la vérification dans la boucle (ancien
+comportement des routes de login) au pool de hachage de AuthService.
+
+Usage (depuis backend/, avec le même .env que l'API) :
+  python -m benchmarks.bench_login --logins 50 --rounds 12
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+from passlib.context import CryptContext
+
+from app.core.config import settings
+from app.services.AuthService import AuthService, password_executor
+
+async def heartbeat(stop: asyncio.Event, tick: float, lags: List[float]) -> None:
+  """Trafic de chat simulé : retard de chaque réveil par rapport à l'attendu"""
+  while not stop.is_set():
+    start = time.perf_counter()
+    await asyncio.sleep(tick)
+    lags.append(time.perf_counter() - start - tick)
+
+async def run(mode: str, logins: int, password: str, hashed: str, tick: float) -> Dict[str, float]:
+  async def login() -> None:
+    if mode == "inline":
+      AuthService.verify_password(password, hashed)
+    else:
+      await AuthService.verify_password_async(password, hashed)
+
+  lags: List[float] = []
+  stop = asyncio.Event()
+  ticker = asyncio.create_task(heartbeat(stop, tick, lags))
+  await asyncio.sleep(tick * 5)  # Référence avant la vague
+
+  start = time.perf_counter()
+  await asyncio.gather(*(login() for _ in range(logins)))
+  elapsed = time.perf_counter() - start
+
+  stop.set()
+  await ticker
+  lags_ms = sorted(lag * 1000 for lag in lags)
+  return {
+    "seconds": elapsed,
+    "logins_per_second": logins / elapsed,
+    "lag_p50_ms": statistics.median(lags_ms),
+    "lag_p99_ms": lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))],
+    "lag_max_ms": lags_ms[-1]
+  }
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--logins", type=int, default=50, help="Connexions simultanées")
+  parser.add_argument("--rounds", type=int, default=settings.BCRYPT_ROUNDS, help="Coût bcrypt des hash testés")
+  parser.add_argument("--tick-ms", type=float, default=10.0, help="Période de la tâche de chat simulée")
+  args = parser.parse_args()
+
+  password = "correct horse battery staple"
+  hashed = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=args.rounds).hash(password)
+  print(f"bcrypt coût {args.rounds}, {args.logins} connexions, pool de {password_executor._max_workers} threads")
+
+  for mode in ("inline", "pool"):
+    result = asyncio.run(run(mode, args.logins, password, hashed, args.tick_ms / 1000))
+    print(
+      f"{mode:>6} : {result['seconds']:.2f} s ({result['logins_per_second']:.1f} connexions/s), "
+      f"retard du chat p50 {result['lag_p50_ms']:.1f} ms, p99 {result['lag_p99_ms']:.1f} ms, "
+      f"max {result['lag_max_ms']:.1f} ms"
+    )
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,80 @@
+"""
+Mesure du démarrage à froid de l'API
+
+Chaque mesure lance un nouvel interpréteur (comme un pod qui démarre) et
+chronomètre l'import de app.main ; --first-use chronomètre en plus la
+création des services chargés à la première requête (ChromaDB, clients
+OpenAI, tokenizer NLTK). --importtime affiche les modules les plus lents.
+
+Usage (depuis backend/, avec le même .env que l'API) :
+  python -m benchmarks.bench_startup --runs 5 --first-use
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import app.main
+print(time.perf_counter() - start)
+"""
+
+FIRST_USE_SCRIPT = """
+import time
+import app.main
+start = time.perf_counter()
+app.main.preload_services()
+print(time.perf_counter() - start)
+"""
+
+def run_timed(script: str) -> float:
+  """Exécute un script dans un nouvel interpréteur et retourne la durée qu'il affiche"""
+  output = subprocess.run(
+    [sys.executable, "-c", script],
+    capture_output=True,
+    text=True,
+    check=True
+  ).stdout
+  return float(output.strip().splitlines()[-1])
+
+def report(name: str, timings: list) -> None:
+  print(
+    f"{name:<22} médiane {statistics.median(timings) * 1000:8.1f} ms"
+    f"  min {min(timings) * 1000:8.1f} ms  max {max(timings) * 1000:8.1f} ms"
+  )
+
+def print_slowest_imports(count: int) -> None:
+  """Affiche les modules dont l'import (cumulé) est le plus long"""
+  stderr = subprocess.run(
+    [sys.executable, "-X", "importtime", "-c", "import app.main"],
+    capture_output=True,
+    text=True,
+    check=True
+  ).stderr
+  rows = []
+  for line in stderr.splitlines():
+    if not line.startswith("import time:") or "cumulative" in line:
+      continue
+    _, cumulative, module = line[len("import time:"):].split("|")
+    rows.append((int(cumulative), module.strip()))
+  for cumulative, module in sorted(rows, reverse=True)[:count]:
+    print(f"  {cumulative / 1000:8.1f} ms  {module}")
+
+def main() -> None:
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--runs", type=int, default=5)
+  parser.add_argument("--first-use", action="store_true", help="Mesurer aussi la création des services")
+  parser.add_argument("--importtime", type=int, default=0, metavar="N", help="Afficher les N imports les plus lents")
+  args = parser.parse_args()
+
+  report("import app.main", [run_timed(IMPORT_SCRIPT) for _ in range(args.runs)])
+  if args.first_use:
+    report("services (1er usage)", [run_timed(FIRST_USE_SCRIPT) for _ in range(args.runs)])
+  if args.importtime:
+    print("Imports les plus lents :")
+    print_slowest_imports(args.importtime)
+
+if __name__ == "__main__":
+  main()
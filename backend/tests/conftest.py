@@ -0,0 +1,51 @@
+import hashlib
+import os
+from typing import List
+
+import numpy as np
+import pytest
+
+# Configuration minimale pour importer app.core.config sans .env (avant tout import de l'application)
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "30")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("LLM_TEMPERATURE", "0")
+os.environ.setdefault("LLM_MAX_TOKENS", "256")
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+
+DIMENSION = 8
+
+
+def fake_embeddings(texts: List[str]) -> np.ndarray:
+    """Embeddings déterministes : vecteur normalisé dérivé du hash du texte"""
+    vectors = np.array(
+        [np.frombuffer(hashlib.sha256(text.encode()).digest()[:DIMENSION], dtype=np.uint8) for text in texts],
+        dtype=np.float32
+    ).reshape(len(texts), DIMENSION) + 1.0
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class CountingEmbedder:
+    """embed_texts qui garde les textes embeddés, pour vérifier les vecteurs réutilisés"""
+
+    def __init__(self):
+        self.texts: List[str] = []
+
+    def __call__(self, texts: List[str]) -> np.ndarray:
+        self.texts.extend(texts)
+        return fake_embeddings(texts)
+
+
+@pytest.fixture
+def vector_store(tmp_path):
+    """Stockage vectoriel sur un client ChromaDB persistant propre au test"""
+    pytest.importorskip("chromadb")
+    from app.services.VectorStore import ChromaVectorStoreService
+
+    return ChromaVectorStoreService(
+        persist_directory=str(tmp_path),
+        embedding_dimension=DIMENSION,
+        routing="user"
+    )
@@ -0,0 +1,77 @@
+import asyncio
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("jose")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models.chat  # noqa: F401 (relations de User)
+import app.models.conversation  # noqa: F401
+from app.db.base import Base
+from app.models.user import User as DBUser
+from app.services.AuthService import AuthService, user_cache
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(DBUser(username="alice", email="alice@example.com", hashed_password="x", role="user"))
+    session.commit()
+    user_cache.clear()
+    yield session
+    session.close()
+    user_cache.clear()
+
+
+def authenticate(db, username="alice"):
+    token = AuthService.create_access_token({"sub": username, "role": "user"}, timedelta(minutes=5))
+    request = SimpleNamespace(state=SimpleNamespace())
+    return asyncio.run(AuthService.get_current_user(request, token, db))
+
+
+def test_authenticated_user_is_cached(db):
+    user = authenticate(db)
+    assert len(user_cache) == 1
+
+    # Servi par le cache, rattaché à la session de la requête
+    assert authenticate(db) is user
+    assert user_cache.get_stats()["hits"] == 1
+
+
+def test_deactivation_and_role_change_invalidate_the_cache(db):
+    user = authenticate(db)
+    user.is_active = False
+    db.commit()
+    assert len(user_cache) == 0
+
+    authenticate(db)
+    user.role = "admin"
+    db.commit()
+    assert len(user_cache) == 0
+
+
+def test_unrelated_update_keeps_the_cache(db):
+    user = authenticate(db)
+    user.full_name = "Alice Martin"
+    db.commit()
+    assert len(user_cache) == 1
+
+
+def test_rename_and_delete_invalidate_the_cache(db):
+    user = authenticate(db)
+    user.username = "alice2"
+    db.commit()
+    assert len(user_cache) == 0
+
+    authenticate(db, "alice2")
+    db.delete(user)
+    db.commit()
+    assert len(user_cache) == 0
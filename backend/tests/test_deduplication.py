@@ -0,0 +1,118 @@
+from app.services.VectorStore import SHARED_DOCUMENT_ID, chunk_content_hash, shared_chunk_id
+
+from conftest import fake_embeddings
+
+HEADER = "Conditions générales applicables à tous les contrats."
+
+
+def add(vector_store, document_id, texts, title, start_page=1):
+    chunks = [{"text": text, "page_number": start_page + i} for i, text in enumerate(texts)]
+    return vector_store.add_documents(
+        chunks, fake_embeddings(texts), document_id=document_id, document_metadata={"title": title}
+    )
+
+
+def stored_ids(vector_store):
+    return set(vector_store.get_collection().get()["ids"])
+
+
+def test_second_occurrence_is_promoted_to_a_shared_vector(vector_store):
+    add(vector_store, "A", [HEADER, "Clause propre au contrat A."], "Doc A")
+    assert stored_ids(vector_store) == {"A_chunk_0", "A_chunk_1"}
+
+    add(vector_store, "B", [HEADER, "Clause propre au contrat B."], "Doc B", start_page=5)
+
+    content_hash = chunk_content_hash(HEADER)
+    shared_id = shared_chunk_id(content_hash)
+    assert stored_ids(vector_store) == {shared_id, "A_chunk_1", "B_chunk_1"}
+    shared = vector_store.get_collection().get(ids=[shared_id])
+    assert shared["metadatas"][0]["document_id"] == SHARED_DOCUMENT_ID
+
+    references = vector_store.chunk_refs.references(vector_store.collection_name, [content_hash])
+    assert [(document_id, index) for document_id, index, _ in references[content_hash]] == [("A", 0), ("B", 0)]
+    # Le chunk ordinaire remplacé est aussi retiré de l'index lexical
+    assert vector_store.lexical_index.count(vector_store.collection_name) == 3
+
+
+def test_repeated_content_in_one_batch_is_stored_once(vector_store):
+    add(vector_store, "A", [HEADER, "Milieu.", HEADER], "Doc A")
+    assert stored_ids(vector_store) == {shared_chunk_id(chunk_content_hash(HEADER)), "A_chunk_1"}
+
+
+def test_replayed_batch_promotes_its_own_stored_chunk(vector_store):
+    texts = ["Un.", "Deux.", "Trois.", HEADER]
+    documents = [{"document_id": "A", "chunks": [{"text": t} for t in texts], "metadata": {}}]
+    vector_store.add_documents_bulk(documents, fake_embeddings(texts))
+    assert "A_chunk_3" in stored_ids(vector_store)
+
+    # Lot rejoué, plus long : le contenu stocké en (A, 3) réapparaît en (A, 7)
+    texts = texts + ["Cinq.", "Six.", "Sept.", HEADER]
+    documents = [{"document_id": "A", "chunks": [{"text": t} for t in texts], "metadata": {}}]
+    vector_store.add_documents_bulk(documents, fake_embeddings(texts))
+
+    ids = stored_ids(vector_store)
+    assert "A_chunk_3" not in ids and "A_chunk_7" not in ids
+    assert shared_chunk_id(chunk_content_hash(HEADER)) in ids
+    assert len(ids) == 7
+
+
+def test_search_resolves_shared_vectors_to_the_filtered_document(vector_store):
+    add(vector_store, "A", [HEADER, "Clause propre au contrat A."], "Doc A")
+    add(vector_store, "B", [HEADER, "Clause propre au contrat B."], "Doc B", start_page=5)
+
+    results = vector_store.search(
+        fake_embeddings([HEADER])[0], k=1, filter_criteria=vector_store.document_filter(["B"])
+    )
+    assert results[0]["id"] == shared_chunk_id(chunk_content_hash(HEADER))
+
+    resolved = vector_store.resolve_references(results, document_ids=["B"])[0]
+    # Citation : titre et page de l'occurrence dans le document filtré
+    assert resolved["metadata"]["document_id"] == "B"
+    assert resolved["metadata"]["doc_title"] == "Doc B"
+    assert resolved["metadata"]["page_number"] == 5
+    assert [ref["document_id"] for ref in resolved["references"]] == ["B"]
+
+    lexical = vector_store.lexical_search("conditions générales", k=5, document_ids=["A"])
+    assert [chunk["id"] for chunk in lexical] == [shared_chunk_id(chunk_content_hash(HEADER))]
+
+
+def test_document_chunks_include_shared_occurrences(vector_store):
+    add(vector_store, "A", [HEADER, "Clause propre au contrat A."], "Doc A")
+    add(vector_store, "B", ["Préambule de B.", HEADER], "Doc B", start_page=5)
+
+    chunks = vector_store.get_document_chunks("B")
+    assert [chunk["metadata"]["chunk_index"] for chunk in chunks] == [0, 1]
+    assert chunks[1]["text"] == HEADER
+    assert chunks[1]["metadata"]["doc_title"] == "Doc B"
+    assert chunks[1]["metadata"]["page_number"] == 6
+
+
+def test_shared_vector_is_deleted_with_its_last_reference(vector_store):
+    add(vector_store, "A", [HEADER, "Clause propre au contrat A."], "Doc A")
+    add(vector_store, "B", [HEADER, "Clause propre au contrat B."], "Doc B")
+    shared_id = shared_chunk_id(chunk_content_hash(HEADER))
+
+    assert vector_store.delete_document("A")
+    assert stored_ids(vector_store) == {shared_id, "B_chunk_1"}
+
+    assert vector_store.delete_document("B")
+    assert stored_ids(vector_store) == set()
+    assert vector_store.lexical_index.count(vector_store.collection_name) == 0
+    assert vector_store.chunk_refs.get_stats()["shared_chunks"] == {}
+
+
+def test_shared_chunks_are_isolated_per_collection(vector_store):
+    first, second = vector_store.collection_for(1), vector_store.collection_for(2)
+    for collection in (first, second):
+        for document_id in ("A", "B"):
+            vector_store.add_documents(
+                [{"text": HEADER}], fake_embeddings([HEADER]), document_id=document_id, collection_name=collection
+            )
+
+    vector_store.delete_document("A", second)
+    vector_store.delete_document("B", second)
+
+    assert vector_store.lexical_index.count(first) == 1
+    assert vector_store.lexical_index.count(second) == 0
+    hits = vector_store.lexical_search("contrats", k=5, document_ids=["A"], collection_name=first)
+    assert [chunk["id"] for chunk in hits] == [shared_chunk_id(chunk_content_hash(HEADER))]
@@ -0,0 +1,39 @@
+import itertools
+from types import SimpleNamespace
+
+import numpy as np
+
+import app.services.EmbeddingCache as embedding_cache_module
+from app.services.EmbeddingCache import EmbeddingCache
+
+from conftest import fake_embeddings
+
+MODEL = "fake-model"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, monkeypatch):
+    """Au-delà de max_entries, les vecteurs les moins récemment lus partent en premier"""
+    clock = itertools.count(1)
+    monkeypatch.setattr(embedding_cache_module, "time", SimpleNamespace(time=lambda: float(next(clock))))
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"), max_entries=10)
+    texts = [f"Texte {i}" for i in range(11)]
+    for text in texts[:10]:
+        cache.put_many(MODEL, [text], fake_embeddings([text]))
+
+    # Relire les trois premiers les rend plus récents que les autres
+    assert all(vector is not None for vector in cache.get_many(MODEL, texts[:3]))
+    cache.put_many(MODEL, texts[10:], fake_embeddings(texts[10:]))
+
+    # 11 entrées pour 10 places : retour à 90 %, soit les deux plus anciennes évincées
+    found = cache.get_many(MODEL, texts)
+    assert [i for i, vector in enumerate(found) if vector is None] == [3, 4]
+    assert cache.get_stats()["entries"] == 9
+    np.testing.assert_array_equal(found[0], fake_embeddings(texts[:1])[0])
+
+
+def test_entries_are_shared_by_normalized_text_only_within_a_model(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    cache.put_many(MODEL, ["Un  texte\n"], fake_embeddings(["Un texte"]))
+
+    assert cache.get_many(MODEL, ["Un texte"])[0] is not None
+    assert cache.get_many("other-model", ["Un texte"]) == [None]
@@ -0,0 +1,134 @@
+import asyncio
+import base64
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+openai = pytest.importorskip("openai")
+httpx = pytest.importorskip("httpx")
+
+import app.services.EmbeddingService as embedding_service_module
+from app.services.EmbeddingBackends import EmbeddingBackend, OpenAIEmbeddingBackend
+from app.services.EmbeddingCache import EmbeddingCache
+from app.services.EmbeddingService import EmbeddingService
+
+from conftest import DIMENSION, fake_embeddings
+
+TEXTS = [f"Texte numéro {i}." for i in range(9)]
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """Tokens comptés en mots : pas de téléchargement de l'encodage tiktoken"""
+    monkeypatch.setattr(embedding_service_module, "count_tokens", lambda text, model=None: len(text.split()))
+
+
+class FakeBackend(EmbeddingBackend):
+    """Backend à petits lots, dont les premiers lots répondent en dernier"""
+
+    model = "fake-model"
+    max_batch_tokens = 10000
+    max_batch_inputs = 2
+    max_concurrency = 4
+
+    def __init__(self):
+        self.batches = []
+        self._lock = threading.Lock()
+
+    def embed(self, batch):
+        with self._lock:
+            self.batches.append(list(batch))
+            delay = 0.02 * (10 - len(self.batches))
+        time.sleep(max(delay, 0))
+        return fake_embeddings(batch)
+
+
+def test_batches_are_reassembled_in_input_order():
+    backend = FakeBackend()
+    service = EmbeddingService(backend=backend)
+    texts = TEXTS[:4] + ["  "] + TEXTS[4:]
+
+    embeddings = service.get_embeddings(texts)
+
+    assert len(backend.batches) == 5
+    assert all(len(batch) <= 2 for batch in backend.batches)
+    np.testing.assert_allclose(embeddings[:4], fake_embeddings(TEXTS[:4]), rtol=1e-6)
+    # Texte vide : non envoyé, vecteur nul à sa place
+    assert not embeddings[4].any()
+    np.testing.assert_allclose(embeddings[5:], fake_embeddings(TEXTS[4:]), rtol=1e-6)
+
+
+def test_async_batches_are_reassembled_in_input_order():
+    backend = FakeBackend()
+    service = EmbeddingService(backend=backend)
+
+    embeddings = asyncio.run(service.get_embeddings_async(TEXTS))
+
+    assert len(backend.batches) == 5
+    np.testing.assert_allclose(embeddings, fake_embeddings(TEXTS), rtol=1e-6)
+
+
+def test_cached_vectors_are_merged_in_place(tmp_path):
+    backend = FakeBackend()
+    service = EmbeddingService(backend=backend)
+    service.cache = EmbeddingCache(path=str(tmp_path / "cache.db"))
+    service.get_embeddings(TEXTS[:3])
+    backend.batches.clear()
+
+    texts = [TEXTS[2], "", TEXTS[5], TEXTS[0]]
+    embeddings = service.get_embeddings(texts)
+
+    # Seul le texte absent du cache est embeddé
+    assert backend.batches == [[TEXTS[5]]]
+    assert embeddings.shape == (4, DIMENSION)
+    np.testing.assert_allclose(embeddings[[0, 2, 3]], fake_embeddings([TEXTS[2], TEXTS[5], TEXTS[0]]), rtol=1e-6)
+    assert not embeddings[1].any()
+
+
+class FlakyEmbeddings:
+    """client.embeddings qui répond 429 aux premiers appels"""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    def create(self, model, input, encoding_format):
+        self.calls += 1
+        if self.calls <= self.failures:
+            request = httpx.Request("POST", "https://api.openai.com/v1/embeddings")
+            raise openai.RateLimitError(
+                "Rate limit reached", response=httpx.Response(429, request=request), body=None
+            )
+        data = [
+            SimpleNamespace(embedding=base64.b64encode(vector.astype("<f4").tobytes()).decode())
+            for vector in fake_embeddings(input)
+        ]
+        return SimpleNamespace(data=data)
+
+
+def make_openai_backend(monkeypatch, failures, max_retries):
+    backend = OpenAIEmbeddingBackend(model="text-embedding-3-small")
+    backend.max_retries = max_retries
+    backend.client = SimpleNamespace(embeddings=FlakyEmbeddings(failures))
+    monkeypatch.setattr(backend, "_retry_delay", lambda attempt, error: 0)
+    return backend
+
+
+def test_rate_limited_batch_is_retried(monkeypatch):
+    backend = make_openai_backend(monkeypatch, failures=2, max_retries=3)
+
+    vectors = backend.embed(TEXTS[:3])
+
+    assert backend.client.embeddings.calls == 3
+    np.testing.assert_allclose(vectors, fake_embeddings(TEXTS[:3]), rtol=1e-6)
+
+
+def test_retries_are_bounded(monkeypatch):
+    backend = make_openai_backend(monkeypatch, failures=5, max_retries=2)
+
+    with pytest.raises(openai.RateLimitError):
+        backend.embed(TEXTS[:3])
+    assert backend.client.embeddings.calls == 3
@@ -0,0 +1,66 @@
+import numpy as np
+
+from conftest import CountingEmbedder, fake_embeddings
+
+TEXTS = ["Premier paragraphe.", "Deuxième paragraphe.", "Troisième paragraphe.", "Quatrième paragraphe."]
+
+
+def index(vector_store, texts):
+    chunks = [{"text": text} for text in texts]
+    vector_store.add_documents(chunks, fake_embeddings(texts), document_id="d", document_metadata={"title": "Doc"})
+
+
+def update(vector_store, texts):
+    embedder = CountingEmbedder()
+    ids = vector_store.update_document(
+        "d", [{"text": text} for text in texts], document_metadata={"title": "Doc"}, embed_texts=embedder
+    )
+    return ids, embedder
+
+
+def stored_chunks(vector_store):
+    return vector_store.get_document_chunks("d")
+
+
+def test_edited_chunk_is_the_only_one_embedded(vector_store):
+    index(vector_store, TEXTS)
+    texts = TEXTS[:2] + ["Troisième paragraphe, corrigé."] + TEXTS[3:]
+
+    ids, embedder = update(vector_store, texts)
+
+    assert ids == [f"d_chunk_{i}" for i in range(4)]
+    assert embedder.texts == ["Troisième paragraphe, corrigé."]
+    chunks = stored_chunks(vector_store)
+    assert [chunk["text"] for chunk in chunks] == texts
+    assert [chunk["id"] for chunk in chunks] == ids
+
+
+def test_insertion_shifts_later_ids_and_reuses_their_vectors(vector_store):
+    index(vector_store, TEXTS)
+    texts = TEXTS[:1] + ["Paragraphe inséré."] + TEXTS[1:]
+
+    ids, embedder = update(vector_store, texts)
+
+    # Les IDs sont positionnels : tous les chunks suivants changent d'ID
+    assert ids == [f"d_chunk_{i}" for i in range(5)]
+    assert embedder.texts == ["Paragraphe inséré."]
+    chunks = stored_chunks(vector_store)
+    assert [chunk["text"] for chunk in chunks] == texts
+    # Les chunks décalés gardent le vecteur de leur contenu
+    np.testing.assert_allclose(
+        np.array([chunk["embedding"] for chunk in chunks]), fake_embeddings(texts), rtol=1e-5
+    )
+    assert vector_store.lexical_index.count(vector_store.collection_name) == 5
+
+
+def test_truncation_removes_trailing_chunks_without_embedding(vector_store):
+    index(vector_store, TEXTS)
+
+    ids, embedder = update(vector_store, TEXTS[:2])
+
+    assert ids == ["d_chunk_0", "d_chunk_1"]
+    assert embedder.texts == []
+    assert [chunk["text"] for chunk in stored_chunks(vector_store)] == TEXTS[:2]
+    assert vector_store.get_collection().count() == 2
+    assert vector_store.lexical_index.count(vector_store.collection_name) == 2
+    assert vector_store.lexical_search("troisième", k=5) == []
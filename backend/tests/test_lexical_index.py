@@ -0,0 +1,38 @@
+from app.services.LexicalIndex import LexicalIndex
+
+
+def test_same_chunk_id_in_two_collections():
+    """Un contenu partagé a le même ID dans chaque collection : les deux lignes coexistent"""
+    index = LexicalIndex()
+    index.add_chunks("rag_collection_1", "__shared__", ["shared_abc"], ["mentions légales du contrat"])
+    index.add_chunks("rag_collection_2", "__shared__", ["shared_abc"], ["mentions légales du contrat"])
+
+    assert index.count("rag_collection_1") == 1
+    assert index.count("rag_collection_2") == 1
+    assert [chunk_id for chunk_id, _ in index.search("rag_collection_1", "contrat")] == ["shared_abc"]
+
+    # Supprimer le chunk d'une collection ne touche pas l'autre
+    assert index.delete_chunks("rag_collection_2", ["shared_abc"]) == 1
+    assert index.count("rag_collection_1") == 1
+    assert [chunk_id for chunk_id, _ in index.search("rag_collection_1", "contrat")] == ["shared_abc"]
+    assert index.search("rag_collection_2", "contrat") == []
+
+
+def test_allowed_chunks_are_filtered_before_limit():
+    """Les chunks hors des documents demandés n'occupent pas les k premières places"""
+    index = LexicalIndex()
+    index.add_chunks("c", "__shared__", [f"shared_{i}" for i in range(5)], ["contrat contrat contrat"] * 5)
+    index.add_chunks("c", "doc_a", ["doc_a_chunk_0"], ["un contrat"])
+
+    hits = index.search("c", "contrat", k=2, document_ids=["doc_a"], chunk_ids=["shared_4"])
+    assert sorted(chunk_id for chunk_id, _ in hits) == ["doc_a_chunk_0", "shared_4"]
+
+
+
+def test_document_filter_is_not_truncated():
+    """Au-delà de 500 documents, ceux de la fin de la liste restent cherchables"""
+    index = LexicalIndex()
+    index.add_chunks("c", "doc_999", ["doc_999_chunk_0"], ["un contrat"])
+
+    document_ids = [f"doc_{i}" for i in range(1000)]
+    assert [chunk_id for chunk_id, _ in index.search("c", "contrat", document_ids=document_ids)] == ["doc_999_chunk_0"]
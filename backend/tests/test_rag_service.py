@@ -0,0 +1,88 @@
+import pytest
+
+pytest.importorskip("openai")
+
+import app.services.EmbeddingService as embedding_service_module
+import app.services.RagService as rag_module
+from app.services.EmbeddingBackends import EmbeddingBackend
+from app.services.EmbeddingService import EmbeddingService
+
+from conftest import DIMENSION, fake_embeddings
+
+QUERY = "durée du préavis"
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """Tokens comptés en mots : pas de téléchargement de l'encodage tiktoken"""
+    monkeypatch.setattr(embedding_service_module, "count_tokens", lambda text, model=None: len(text.split()))
+
+
+class FakeBackend(EmbeddingBackend):
+    model = "fake-model"
+    max_batch_tokens = 10000
+    max_batch_inputs = 64
+    max_concurrency = 1
+
+    def __init__(self):
+        self.texts = []
+
+    def embed(self, batch):
+        self.texts.extend(batch)
+        return fake_embeddings(batch)
+
+
+@pytest.fixture
+def rag_service(vector_store, monkeypatch):
+    embedding_service = EmbeddingService(backend=FakeBackend())
+    monkeypatch.setattr(rag_module, "get_embedding_service", lambda: embedding_service)
+    return rag_module.RAGService(vector_store=vector_store, embedding_dimension=DIMENSION)
+
+
+def index(rag_service, document_id, texts):
+    parsed_document = {"chunks": [{"text": text} for text in texts], "metadata": {"title": document_id}}
+    rag_service.process_document(parsed_document, fake_embeddings(texts), document_id)
+
+
+def context_ids(rag_service, document_ids=None):
+    chunks = rag_service.get_relevant_context(
+        QUERY, document_ids=document_ids, num_chunks=5, similarity_threshold=-1.0
+    )
+    return sorted(chunk["id"] for chunk in chunks)
+
+
+def test_repeated_query_is_served_from_the_caches(rag_service):
+    index(rag_service, "A", ["Le préavis est d'un mois."])
+    backend = rag_service.embedding_service.backend
+
+    assert context_ids(rag_service) == ["A_chunk_0"]
+    assert context_ids(rag_service) == ["A_chunk_0"]
+
+    assert backend.texts == [QUERY]
+    assert rag_service.retrieval_cache.get_stats()["hits"] == 1
+
+
+def test_only_searches_touching_changed_documents_are_invalidated(rag_service):
+    index(rag_service, "A", ["Le préavis est d'un mois."])
+    index(rag_service, "B", ["Le préavis est de trois mois."])
+    context_ids(rag_service)
+    context_ids(rag_service, ["A"])
+    context_ids(rag_service, ["B"])
+    assert len(rag_service.retrieval_cache) == 3
+
+    # Recherche sans filtre et recherche filtrée sur A
+    assert rag_service.invalidate_documents(["A"]) == 2
+    assert len(rag_service.retrieval_cache) == 1
+
+
+def test_indexing_and_removal_refresh_cached_results(rag_service):
+    index(rag_service, "A", ["Le préavis est d'un mois."])
+    assert context_ids(rag_service) == ["A_chunk_0"]
+
+    index(rag_service, "B", ["Le préavis est de trois mois."])
+    assert context_ids(rag_service) == ["A_chunk_0", "B_chunk_0"]
+
+    rag_service.remove_document("A")
+    assert context_ids(rag_service) == ["B_chunk_0"]
+    # L'embedding de la requête, indépendant des documents, reste en cache
+    assert rag_service.embedding_service.backend.texts == [QUERY]
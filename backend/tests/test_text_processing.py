@@ -0,0 +1,50 @@
+from app.utils.text_processing import create_chunk_spans, create_semantic_chunks, sentence_spans
+
+
+def word_count(text):
+    return len(text.split())
+
+
+def sentence(index, words):
+    return " ".join([f"phrase{index}"] + ["mot"] * (words - 1)) + "."
+
+
+def test_chunks_are_token_bounded_with_sentence_overlap():
+    text = " ".join(sentence(i, 4) for i in range(6))
+    spans = sentence_spans(text)
+    assert len(spans) == 6
+
+    chunks = create_chunk_spans(text, max_chunk_tokens=10, overlap_tokens=4, token_counter=word_count)
+
+    # Deux phrases de 4 tokens par chunk, la dernière reprise au début du suivant
+    assert chunks == [(spans[i][0], spans[i + 1][1]) for i in range(5)]
+
+
+def test_chunks_cover_the_text_without_exceeding_the_budget():
+    sizes = [3, 7, 2, 9, 5, 1, 6, 4, 8, 2]
+    text = "  ".join(sentence(i, words) for i, words in enumerate(sizes))
+
+    chunks = create_chunk_spans(text, max_chunk_tokens=12, overlap_tokens=3, token_counter=word_count)
+
+    texts = [text[start:end] for start, end in chunks]
+    assert all(word_count(chunk) <= 12 for chunk in texts)
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(text)
+    for (start, end), (next_start, next_end) in zip(chunks, chunks[1:]):
+        # Progression, et chevauchement borné par overlap_tokens
+        assert start < next_start and end < next_end
+        if next_start < end:
+            assert word_count(text[next_start:end]) <= 3
+
+
+def test_long_sentence_is_a_chunk_of_its_own():
+    text = f"{sentence(0, 3)} {sentence(1, 20)} {sentence(2, 3)}"
+    spans = sentence_spans(text)
+
+    chunks = create_chunk_spans(text, max_chunk_tokens=10, overlap_tokens=0, token_counter=word_count)
+
+    assert chunks == spans
+
+
+def test_blank_text_has_no_chunks():
+    assert create_chunk_spans(" \n\t ", token_counter=word_count) == []
+    assert create_semantic_chunks("Une phrase.  \n\n  ", token_counter=word_count) == ["Une phrase."]
@@ -0,0 +1,26 @@
+import threading
+
+
+def test_slow_collection_open_does_not_block_other_collections(vector_store):
+    """La synchronisation lexicale d'une collection n'empêche pas d'ouvrir les autres"""
+    release = threading.Event()
+    sync = vector_store._sync_lexical_index
+
+    def slow_sync(name, collection):
+        if name == "rag_slow":
+            release.wait(timeout=10)
+        sync(name, collection)
+
+    vector_store._sync_lexical_index = slow_sync
+    opener = threading.Thread(target=vector_store.get_collection, args=("rag_slow",))
+    opener.start()
+    try:
+        other = threading.Thread(target=vector_store.get_collection, args=("rag_fast",))
+        other.start()
+        other.join(timeout=5)
+        assert not other.is_alive()
+        assert opener.is_alive()
+    finally:
+        release.set()
+        opener.join()
+    assert vector_store.get_collection("rag_slow").name == "rag_slow"